@@ -1,18 +1,22 @@
+import logging
 import os
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 # Check if dotenv is available, and if so, load environment variables from .env file
+# (reported once logging is set up – see Settings.debug_credentials)
 try:
     from dotenv import load_dotenv
     # Look for .env file in project root (3 directories up from this file)
     env_path = Path(__file__).resolve().parent.parent.parent.parent / '.env'
     if env_path.exists():
-        print(f"Loading environment from: {env_path}")
+        _ENV_STATUS = f"Loading environment from: {env_path}"
         load_dotenv(dotenv_path=env_path)
     else:
-        print(f"No .env file found at {env_path}")
+        _ENV_STATUS = f"No .env file found at {env_path}"
 except ImportError:
-    print("python-dotenv not installed, skipping .env loading")
+    _ENV_STATUS = "python-dotenv not installed, skipping .env loading"
 
 # Simple settings class without pydantic dependency
 class Settings:
@@ -27,30 +31,142 @@ class Settings:
     MODEL_PATH = BASE_DIR / "models" / "column_classifier_model.joblib"
     
     # File settings
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max request (one upload or one chunk)
+
+    # Content-addressed upload store - blobs are collected once idle for
+    # UPLOAD_MAX_AGE seconds or when the store outgrows UPLOAD_STORE_MAX_BYTES.
+    UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", str(BASE_DIR / "app" / "uploads")))
+    UPLOAD_STORE_MAX_BYTES = int(os.getenv("UPLOAD_STORE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    UPLOAD_MAX_AGE = int(os.getenv("UPLOAD_MAX_AGE", str(7 * 24 * 3600)))
+    # Chunked / resumable uploads may assemble files up to this size
+    UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(256 * 1024 * 1024)))
+    UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
     
     # DigiKey API settings (from environment)
     DIGIKEY_CLIENT_ID = os.getenv("DIGIKEY_CLIENT_ID", "")
     DIGIKEY_CLIENT_SECRET = os.getenv("DIGIKEY_CLIENT_SECRET", "")
     DIGIKEY_SANDBOX_MODE = os.getenv("DIGIKEY_SANDBOX_MODE", "True").lower() == "true"
     
+    # Seconds before expiry the shared DigiKey token is refreshed in the
+    # background (0 = only on demand).
+    DIGIKEY_TOKEN_REFRESH_AHEAD = int(os.getenv("DIGIKEY_TOKEN_REFRESH_AHEAD", "300"))
+
     # Mouser API settings (from environment)
     MOUSER_API_KEY = os.getenv("MOUSER_API_KEY", "")
-    
-    # Print DigiKey credentials status for debugging (without revealing secrets)
+
+    # Lookup scheduler - per-vendor worker count and token-bucket rate limits.
+    # Rates are API calls per second; 0 disables throttling for that vendor.
+    LOOKUP_DEFAULT_CONCURRENCY = int(os.getenv("LOOKUP_DEFAULT_CONCURRENCY", "4"))
+    DIGIKEY_MAX_CONCURRENCY = int(os.getenv("DIGIKEY_MAX_CONCURRENCY", "8"))
+    DIGIKEY_RATE_PER_SEC = float(os.getenv("DIGIKEY_RATE_PER_SEC", "2"))
+    DIGIKEY_RATE_BURST = int(os.getenv("DIGIKEY_RATE_BURST", "10"))
+    MOUSER_MAX_CONCURRENCY = int(os.getenv("MOUSER_MAX_CONCURRENCY", "4"))
+    MOUSER_RATE_PER_SEC = float(os.getenv("MOUSER_RATE_PER_SEC", "0.5"))
+    MOUSER_RATE_BURST = int(os.getenv("MOUSER_RATE_BURST", "5"))
+    # MPNs per Mouser part-number search (the API accepts at most 10)
+    MOUSER_BATCH_SIZE = int(os.getenv("MOUSER_BATCH_SIZE", "10"))
+    # Combined stream: rows in flight; each row fans out to every vendor pool.
+    COMBINED_MAX_CONCURRENCY = int(os.getenv("COMBINED_MAX_CONCURRENCY", "8"))
+    ENABLED_VENDORS = [
+        v.strip() for v in os.getenv("ENABLED_VENDORS", "DigiKey,Mouser").split(",") if v.strip()
+    ]
+
+    # Stream execution engine: "threads" (per-vendor pools) or "async"
+    # (one asyncio loop; httpx when installed).  ASYNC_MAX_IN_FLIGHT caps the
+    # concurrent look-ups per vendor, ASYNC_QUEUE_SIZE the buffered events
+    # per stream before producers wait for the client.
+    LOOKUP_ENGINE = os.getenv("LOOKUP_ENGINE", "threads").lower()
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "200"))
+    ASYNC_QUEUE_SIZE = int(os.getenv("ASYNC_QUEUE_SIZE", "256"))
+
+    # Alternate MPNs of a row: "sequential" (stop at the first one in stock)
+    # or "parallel" (look them all up at once; same pick, more vendor calls).
+    # Per-vendor overrides: DIGIKEY_ALTERNATES / MOUSER_ALTERNATES.
+    LOOKUP_ALTERNATES = os.getenv("LOOKUP_ALTERNATES", "sequential").lower()
+    DIGIKEY_ALTERNATES = os.getenv("DIGIKEY_ALTERNATES", LOOKUP_ALTERNATES).lower()
+    MOUSER_ALTERNATES = os.getenv("MOUSER_ALTERNATES", LOOKUP_ALTERNATES).lower()
+
+    # Vendor HTTP transport - pooled keep-alive sessions with retry/backoff.
+    # Per-vendor overrides use the same names prefixed with DIGIKEY_ / MOUSER_.
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+    HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+    HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+
+    # Local on-disk caches (part look-ups, parsed BOMs, ...)
+    CACHE_DIR = Path(os.getenv("CACHE_DIR", str(BASE_DIR / "app" / "cache")))
+
+    # Part look-up cache - static fields (description, manufacturer, MOQ)
+    # outlive volatile ones (stock, price breaks).  TTLs are in seconds.
+    PART_CACHE_ENABLED = os.getenv("PART_CACHE_ENABLED", "True").lower() == "true"
+    PART_CACHE_MAX_ENTRIES = int(os.getenv("PART_CACHE_MAX_ENTRIES", "50000"))
+    PART_CACHE_STATIC_TTL = int(os.getenv("PART_CACHE_STATIC_TTL", str(7 * 24 * 3600)))
+    PART_CACHE_VOLATILE_TTL = int(os.getenv("PART_CACHE_VOLATILE_TTL", str(6 * 3600)))
+    PART_CACHE_SUBSTITUTE_TTL = int(os.getenv("PART_CACHE_SUBSTITUTE_TTL", str(24 * 3600)))
+
+    # Durable look-up jobs (event logs in CACHE_DIR/jobs.sqlite3)
+    JOB_TTL = int(os.getenv("JOB_TTL", str(24 * 3600)))
+    JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "300"))
+    # Cancellation: hard deadline per job, and how long a stream-started job
+    # keeps running with no client attached (time to reconnect)
+    JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", str(2 * 3600)))
+    JOB_DETACH_GRACE = float(os.getenv("JOB_DETACH_GRACE", "30"))
+
+    # Processed BOMs kept server-side (CACHE_DIR/bom_sessions.sqlite3) so the
+    # stream endpoints can take a bom_id; collected once idle this long.
+    BOM_SESSION_TTL = int(os.getenv("BOM_SESSION_TTL", str(24 * 3600)))
+
+    # Speculative cache warm-up after /api/upload: when the ManufacturerPN
+    # column is predicted with at least PREFETCH_MIN_CONFIDENCE, its first
+    # MPNs are looked up in the background - at most PREFETCH_BUDGET vendor
+    # calls per vendor and upload, and only while a vendor's rate bucket is
+    # at least PREFETCH_HEADROOM full (so live streams go first).
+    PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+    PREFETCH_MIN_CONFIDENCE = float(os.getenv("PREFETCH_MIN_CONFIDENCE", "0.8"))
+    PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "200"))
+    PREFETCH_HEADROOM = float(os.getenv("PREFETCH_HEADROOM", "0.5"))
+    PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "1"))
+
+    # Pipelined streams ({upload_id, columns}): rows are read from the sheet
+    # on a separate thread, at most PIPELINE_QUEUE_SIZE ahead of the look-ups.
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "1000"))
+
+    # Stream encoding: progress at most every STREAM_PROGRESS_INTERVAL seconds
+    # or STREAM_PROGRESS_EVERY events; ready events are packed into chunks of
+    # up to STREAM_CHUNK_BYTES; STREAM_GZIP compresses streams for clients
+    # that accept gzip (flushed per chunk).
+    STREAM_PROGRESS_INTERVAL = float(os.getenv("STREAM_PROGRESS_INTERVAL", "0.25"))
+    STREAM_PROGRESS_EVERY = int(os.getenv("STREAM_PROGRESS_EVERY", "50"))
+    STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", str(64 * 1024)))
+    STREAM_GZIP = os.getenv("STREAM_GZIP", "false").lower() == "true"
+    STREAM_GZIP_LEVEL = int(os.getenv("STREAM_GZIP_LEVEL", "6"))
+
+    # Parsed-BOM artifacts (cleaned DataFrames keyed by upload hash)
+    BOM_CACHE_MAX_BYTES = int(os.getenv("BOM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    # Logging (core/logging.py): root level, per-logger overrides
+    # ("name=LEVEL,..."), "text" or "json" lines, bounded record queue, and
+    # the 1-in-N sampling of per-part debug records.
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "werkzeug=WARNING")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+
+    # Log DigiKey credentials status for debugging (without revealing secrets)
     @classmethod
     def debug_credentials(cls):
         has_client_id = bool(cls.DIGIKEY_CLIENT_ID)
         has_client_secret = bool(cls.DIGIKEY_CLIENT_SECRET)
         has_mouser_api_key = bool(cls.MOUSER_API_KEY)
-        
-        print(f"DigiKey Client ID loaded: {has_client_id}")
-        print(f"DigiKey Client Secret loaded: {has_client_secret}")
-        print(f"DigiKey Sandbox Mode: {cls.DIGIKEY_SANDBOX_MODE}")
-        print(f"Mouser API Key loaded: {has_mouser_api_key}")
 
-# Create global settings object
-settings = Settings()
+        logger.info(_ENV_STATUS)
+        logger.info("DigiKey Client ID loaded: %s", has_client_id)
+        logger.info("DigiKey Client Secret loaded: %s", has_client_secret)
+        logger.info("DigiKey Sandbox Mode: %s", cls.DIGIKEY_SANDBOX_MODE)
+        logger.info("Mouser API Key loaded: %s", has_mouser_api_key)
 
-# Debug credentials loading
-settings.debug_credentials()
\ No newline at end of file
+# Create global settings object
+settings = Settings()
\ No newline at end of file
@@ -1,26 +1,138 @@
+"""
+Application logging.
+
+Loggers never write to a stream themselves: the root logger has a single
+non-blocking ``QueueHandler`` and a ``QueueListener`` thread formats and
+writes every record (console, plus errors to ``logs/bom_checker.log``).
+Records with immutable ``%``-style arguments are queued unformatted and only
+rendered on the listener thread; a mutable argument (a dict, a list …) is
+rendered at the call, so the line shows it as it was then.  Records are
+dropped (and counted) if the queue is full, so a hot path never waits on
+console I/O.
+
+    LOG_LEVEL    root level (default INFO)
+    LOG_LEVELS   per-logger levels: "services.digikey_service.parts=DEBUG,werkzeug=WARNING"
+    LOG_FORMAT   "text" (default) or "json" – one object per line, with any
+                 ``extra=`` fields
+    LOG_SAMPLE_EVERY  per-part debug records (``SampledDebug``) keep 1 in N
+"""
+import atexit
+import itertools
+import json
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
 
 from .config import settings
 
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_RECORD_FIELDS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+_IMMUTABLE = (str, bytes, int, float, type(None))
+
+
+def _immutable(value: Any) -> bool:
+    if isinstance(value, tuple):
+        return all(_immutable(v) for v in value)
+    return isinstance(value, _IMMUTABLE)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including ``extra=`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        out.update((k, v) for k, v in vars(record).items() if k not in _RECORD_FIELDS)
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    Enqueue the record without blocking.  Formatting happens on the
+    listener unless an argument could change before then.
+    """
+
+    def __init__(self, q: queue.Queue) -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # same process: no pickling, so only snapshot what the caller may still mutate
+        if record.args and not _immutable(record.args):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SampledDebug:
+    """
+    ``logger.debug`` for per-part records, keeping one call in *every*.
+    Costs a level check when DEBUG is off for the logger.
+    """
+
+    def __init__(self, logger: logging.Logger, every: Optional[int] = None) -> None:
+        self.logger = logger
+        self.every = max(int(every or settings.LOG_SAMPLE_EVERY), 1)
+        self._calls = itertools.count()
+
+    def __call__(self, msg: str, *args: Any) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG) and next(self._calls) % self.every == 0:
+            self.logger.debug(msg, *args, stacklevel=2)
+
+
+def apply_levels(spec: str) -> None:
+    """Set per-logger levels from ``"name=LEVEL,name=LEVEL"``."""
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def queue_stats() -> Dict[str, int]:
+    root_handler = next(
+        (h for h in logging.getLogger().handlers if isinstance(h, _DroppingQueueHandler)), None
+    )
+    if root_handler is None:
+        return {}
+    return {"queued": root_handler.queue.qsize(), "dropped": root_handler.dropped}
+
 
 def setup_logging():
-    """Configure application logging."""
+    """Configure application logging (once per process)."""
+    global _listener
+    root_logger = logging.getLogger()
+    if _listener is not None:
+        return root_logger
+
     log_dir = settings.BASE_DIR / "logs"
     log_dir.mkdir(exist_ok=True)
-    
+
     # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # Create console handler
+    if settings.LOG_FORMAT == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    # Create console handler (levels are decided by the loggers)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
-    
+
     # Create file handler for errors
     file_handler = RotatingFileHandler(
         log_dir / "bom_checker.log",
@@ -29,14 +141,19 @@ def setup_logging():
     )
     file_handler.setFormatter(formatter)
     file_handler.setLevel(logging.ERROR)
-    
+
+    # Loggers only enqueue; the listener thread does the writing
+    records: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = QueueListener(records, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
     # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
-    
-    # Reduce chatty loggers
-    logging.getLogger("werkzeug").setLevel(logging.WARNING)
-    
-    return root_logger
\ No newline at end of file
+    root_logger.setLevel(settings.LOG_LEVEL)
+    root_logger.addHandler(_DroppingQueueHandler(records))
+
+    # Per-logger levels (chatty libraries are quietened by default)
+    apply_levels(settings.LOG_LEVELS)
+
+    settings.debug_credentials()
+    return root_logger
@@ -6,12 +6,8 @@ front-end continues to work out-of-the-box.
 from __future__ import annotations
 
 import io
-import json
 import os
-import threading
-import time
 import datetime
-from queue import Queue
 from typing import Any, Dict, Iterable, List
 
 import pandas as pd
@@ -20,11 +16,24 @@ from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 
 from core.config import settings
-from core.logging import setup_logging
+from core.logging import queue_stats, setup_logging
+from services.allocation import allocator
+from services.bom_cache import bom_cache
+from services.bom_sessions import UnknownBomSession, bom_sessions
+from services.cancellation import cancel_metrics
+from services.costing import costing_engine
 from services.digikey_service import digikey_service
-from services.excel_service import clean_excel_file, create_training_data
+from services.event_encoding import MSGPACK, NDJSON, encode_stream, stream_formats
+from services.excel_service import create_training_data
+from services.jobs import job_manager, lookup_events
 from services.mouser_service import mouser_service
+from services.multi_vendor import multi_vendor
+from services.part_cache import part_cache
 from services.prediction_service import prediction_service
+from services.prefetch import prefetcher
+from services.row_pipeline import RowPipeline
+from services.singleflight import singleflight
+from services.upload_store import Upload, UploadOffsetMismatch, UploadTooLarge, upload_store
 
 # ───────────────────────────────────────────────────────── app ──
 app = Flask(__name__)
@@ -32,8 +41,6 @@ app.config["MAX_CONTENT_LENGTH"] = settings.MAX_CONTENT_LENGTH
 CORS(app)  # local dev
 
 logger = setup_logging()
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # ─────────────────────────────────────────── Swagger config ──
 swagger_template = {
@@ -76,8 +83,36 @@ swagger_template = {
             "properties": {
                 "success":   {"type": "boolean"},
                 "file_name": {"type": "string"},
+                "upload_id": {"type": "string", "description": "Pass back to /api/process-bom"},
+                "file_hash": {"type": "string", "description": "SHA-256 of the uploaded file"},
                 "columns":   {"type": "array", "items": {"$ref": "#/definitions/ColumnData"}},
                 "row_count": {"type": "integer"},
+                "prefetch": {
+                    "type": "object",
+                    "description": "Background cache warm-up for the predicted MPN column (null if none)",
+                },
+            },
+        },
+        "Job": {
+            "type": "object",
+            "properties": {
+                "job_id":  {"type": "string"},
+                "source":  {"type": "string"},
+                "status":  {"type": "string", "enum": ["running", "complete", "failed", "cancelled", "interrupted"]},
+                "total":   {"type": "integer"},
+                "events":  {"type": "integer", "description": "Events logged so far"},
+                "error":   {"type": "string"},
+                "created": {"type": "number"},
+                "updated": {"type": "number"},
+            },
+        },
+        "UploadSession": {
+            "type": "object",
+            "properties": {
+                "session_id": {"type": "string"},
+                "file_name":  {"type": "string"},
+                "size":       {"type": "integer"},
+                "offset":     {"type": "integer", "description": "Bytes received so far"},
             },
         },
         "ColumnMapping": {
@@ -90,10 +125,16 @@ swagger_template = {
         },
         "ProcessBomRequest": {
             "type": "object",
-            "required": ["file_name", "columns"],
+            "required": ["columns"],
             "properties": {
-                "file_name": {"type": "string"},
+                "upload_id": {"type": "string", "description": "Returned by /api/upload"},
+                "file_name": {"type": "string", "description": "Legacy – latest upload with this name"},
                 "columns":   {"type": "array", "items": {"$ref": "#/definitions/ColumnMapping"}},
+                "include_rows": {
+                    "type": "boolean",
+                    "default": True,
+                    "description": "false – return only bom_id / total_rows (rows stay server-side)",
+                },
             },
         },
         "BomRow": {
@@ -108,10 +149,16 @@ swagger_template = {
         "ProcessBomResponse": {
             "type": "object",
             "properties": {
+                "bom_id":     {"type": "string", "description": "Stream this BOM by id"},
                 "rows":       {"type": "array", "items": {"$ref": "#/definitions/BomRow"}},
                 "total_rows": {"type": "integer"},
             },
         },
+        "RowRanges": {
+            "description": "With `bom_id`: only these [start, stop) row positions",
+            "type": "array",
+            "items": {"type": "array", "items": {"type": "integer"}, "minItems": 2, "maxItems": 2},
+        },
         # ──────────────  Part & pricing  ──────────────
         "PriceBreak": {
             "type": "object",
@@ -145,6 +192,13 @@ swagger_template = {
                     "type": "array",
                     "items": {"$ref": "#/definitions/Part"},
                 },
+                # Combined stream (/api/stream-results) only
+                "row_index":  {"type": "integer"},
+                "unit_price": {"type": "number", "format": "float"},
+                "alternatives": {
+                    "type": "array",
+                    "items": {"$ref": "#/definitions/Part"},
+                },
             },
         },
         # ──────────────  NDJSON stream event wrappers  ──────────────
@@ -178,6 +232,23 @@ swagger_template = {
                 "data":  {"$ref": "#/definitions/Part"},
             },
         },
+        "StreamSubstitutes": {
+            "description": "Follows a Digi-Key `not_found` once its substitutes are resolved",
+            "type": "object",
+            "properties": {
+                "event": {"type": "string", "enum": ["substitutes"]},
+                "data": {
+                    "type": "object",
+                    "properties": {
+                        "mpn":         {"type": "string"},
+                        "digikey_pn":  {"type": "string"},
+                        "row_index":   {"type": "integer"},
+                        "source":      {"type": "string"},
+                        "substitutes": {"type": "array", "items": {"$ref": "#/definitions/Part"}},
+                    },
+                },
+            },
+        },
         "StreamComplete": {
             "type": "object",
             "properties": {
@@ -204,6 +275,7 @@ swagger_template = {
                 {"$ref": "#/definitions/StreamProgress"},
                 {"$ref": "#/definitions/StreamFound"},
                 {"$ref": "#/definitions/StreamNotFound"},
+                {"$ref": "#/definitions/StreamSubstitutes"},
                 {"$ref": "#/definitions/StreamComplete"},
             ],
         },
@@ -233,63 +305,148 @@ swagger = Swagger(
 )
 
 # ───────────────────────────────────────────── helpers ──
-def _save_tmp_file(name: str, data: bytes) -> str:
-    path = os.path.join(UPLOAD_FOLDER, name)
-    with open(path, "wb") as fh:
-        fh.write(data)
-    return path
-
-
-def _progress_payload(total: int, found: int, not_found: int) -> Dict[str, Any]:
-    processed = found + not_found
+def _upload_response(upload: Upload) -> Dict[str, Any]:
+    """
+    Column predictions for an upload – computed once per distinct file – and
+    the speculative cache warm-up they allow, if any.
+    """
+    if upload.result is None:
+        df = bom_cache.load(upload.path, upload.sha256)
+        training_df = create_training_data(df, source_file=upload.file_name)
+        preds = prediction_service.get_predictions(training_df["sample_data"].tolist())
+        columns = [
+            {
+                "name": row["column_name"],
+                "sample_values": [str(v) for v in df[row["column_name"]].dropna().head(5)],
+                "prediction": preds[i],
+            }
+            for i, row in training_df.iterrows()
+        ]
+        result = {"columns": columns, "row_count": len(df)}
+        upload_store.set_result(upload.sha256, result)
+    else:
+        logger.info("Upload %s matches a known file – reusing its predictions", upload.upload_id)
+        result = upload.result
     return {
-        "total": total,
-        "processed": processed,
-        "found": found,
-        "not_found": not_found,
-        "percent_complete": round(processed / total * 100, 1) if total else 0,
+        "success": True,
+        "file_name": upload.file_name,
+        "upload_id": upload.upload_id,
+        "file_hash": upload.sha256,
+        **result,
+        "prefetch": prefetcher.start(upload, result["columns"]),
     }
 
 
-def _stream_results(rows: List[Dict[str, Any]], search_fn, svc: str) -> Iterable[str]:
-    from datetime import datetime
-
-    q: Queue = Queue()
-    total = len(rows)
-    logger.info("[%s] Stream starting with %s rows", svc, total)
-
-    def worker() -> None:
-        found = not_found = 0
-        for row in rows:
-            for event, payload in search_fn(row):
-                q.put({"event": event, "data": payload})
-                if event == "found":
-                    found += 1
-                elif event == "not_found":
-                    not_found += 1
-                q.put({"event": "progress", "data": _progress_payload(total, found, not_found)})
-                time.sleep(1)
-        q.put(
-            {
-                "event": "complete",
-                "data": {
-                    **_progress_payload(total, found, not_found),
-                    "source": svc,
-                    "percent_found": round(found / total * 100, 1) if total else 0,
-                },
-            }
+def _apply_refresh(rows: List[Dict[str, Any]], data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Tag every row with ``refresh`` when the request asks to bypass the part cache."""
+    if not data.get("refresh") or isinstance(rows, RowPipeline):
+        return rows  # pipelined rows are tagged as they are read
+    return [{**row, "refresh": True} for row in rows]
+
+
+def _request_rows(data: Dict[str, Any]):
+    """
+    ``(rows, None)`` for a stream request, or ``(None, error response)``.
+    The rows are the inline ``rows``, those of the stored BOM session
+    ``bom_id`` (optionally only ``ranges``), or – pipelined – read lazily
+    from the upload (``upload_id`` + ``columns``) while the look-ups run.
+    """
+    if data.get("rows"):
+        return data["rows"], None
+    if data.get("columns") and (data.get("upload_id") or data.get("file_name")):
+        return _pipeline_rows(data)
+    if not data.get("bom_id"):
+        return None, (jsonify({"error": "Invalid request format"}), 400)
+    try:
+        rows = bom_sessions.rows(str(data["bom_id"]), data.get("ranges"))
+    except UnknownBomSession as exc:
+        return None, (jsonify({"error": str(exc)}), 404)
+    except (TypeError, ValueError) as exc:
+        return None, (jsonify({"error": str(exc)}), 400)
+    if not rows:
+        return None, (jsonify({"error": "No rows selected"}), 400)
+    return rows, None
+
+
+def _pipeline_rows(data: Dict[str, Any]):
+    """``_request_rows`` for an upload + mapping: a ``RowPipeline`` over the sheet."""
+    try:
+        mapping = {m["mapping"]: m["name"] for m in data["columns"]}
+        prefetcher.settle(data.get("upload_id"), mapping)
+        rows = prediction_service.iter_rows_for_stream(
+            data.get("file_name"), data["columns"], upload_id=data.get("upload_id")
+        )
+    except FileNotFoundError as exc:
+        return None, (jsonify({"error": str(exc)}), 404)
+    except (KeyError, TypeError, ValueError) as exc:
+        return None, (jsonify({"error": f"Invalid column mapping: {exc}"}), 400)
+    if data.get("refresh"):
+        rows = ({**row, "refresh": True} for row in rows)
+    return RowPipeline(rows), None
+
+
+def _lookup_handlers(source: str, data: Dict[str, Any]):
+    """
+    ``(row handler, async row handler, batch handler)`` for a stream source,
+    or None if unusable.  Only Mouser has a multi-part search to batch on.
+    """
+    if source == "DigiKey":
+        return digikey_service.row_handler, digikey_service.row_handler_async, None
+    if source == "Mouser":
+        return (
+            mouser_service.row_handler,
+            mouser_service.row_handler_async,
+            mouser_service.batch_row_handler,
         )
-        logger.info("[%s] Worker completed", svc)
+    if source == "Combined":
+        vendors = multi_vendor.vendors(data.get("vendors"))
+        if vendors:
+            return multi_vendor.row_handler(vendors), multi_vendor.row_handler_async(vendors), None
+    return None
+
+
+def _start_job(
+    rows: List[Dict[str, Any]], source: str, data: Dict[str, Any], cancel_on_detach: bool = True
+) -> str:
+    """
+    Start a durable look-up job over *rows*; returns its id.  With
+    *cancel_on_detach* it is cancelled once its stream has been gone for
+    ``JOB_DETACH_GRACE`` seconds.
+    """
+    search_fn, async_fn, batch_fn = _lookup_handlers(source, data)
+    rows = _apply_refresh(rows, data)
+    return job_manager.start(
+        source,
+        len(rows),
+        lambda: lookup_events(rows, search_fn, source, async_fn, batch_fn),
+        cancel_on_detach=cancel_on_detach,
+    )
+
 
-    threading.Thread(target=worker, daemon=True).start()
-    logger.info("[%s] Thread started — yielding dummy event at %s", svc, datetime.now())
-    yield json.dumps({"event": "ready", "data": {}}) + "\n"
+def _stream_job(job_id: str, offset: int = 0, with_offset: bool = False) -> Response:
+    """
+    NDJSON (or, when accepted, MessagePack) response that replays / tails a
+    job's event log – one chunk per batch of ready events, gzip-encoded when
+    enabled and accepted.
+    """
+    mimetype = request.accept_mimetypes.best_match(stream_formats(), default=NDJSON)
+    gzip = settings.STREAM_GZIP and "gzip" in request.accept_encodings
+    headers = {"X-Job-Id": job_id, "Vary": "Accept"}
+    if gzip:
+        headers.update({"Content-Encoding": "gzip", "Vary": "Accept, Accept-Encoding"})
 
-    while True:
-        msg = q.get()
-        yield json.dumps(msg) + "\n"
-        if msg["event"] == "complete":
-            break
+    def generate() -> Iterable[bytes]:
+        batches = job_manager.follow_batches(job_id, offset, raw=True, packed=mimetype == MSGPACK)
+        try:
+            yield from encode_stream(batches, with_offset, gzip, mimetype)
+        finally:  # the client went away: stop following now
+            batches.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers=headers,
+    )
 
 
 # ───────────────────────────────────────────── routes ──
@@ -326,30 +483,143 @@ def upload_file() -> Response:  # noqa: D401
         return jsonify({"error": "File must be .xlsx or .xls"}), 400
 
     try:
-        raw = file.read()
-        _save_tmp_file(file.filename, raw)
-        df = clean_excel_file(raw)
-        training_df = create_training_data(df, source_file=file.filename)
-        preds = prediction_service.get_predictions(training_df["sample_data"].tolist())
+        # streamed to disk in chunks and hashed on the way – never held in memory
+        upload = upload_store.put_stream(file.stream, file.filename)
+        return jsonify(_upload_response(upload))
+    except UploadTooLarge as exc:
+        return jsonify({"error": str(exc)}), 413
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("upload_file failed")
+        return jsonify({"error": f"Error processing file: {exc}"}), 500
 
-        columns = [
+
+# ─────────────────────────────────── resumable uploads ──
+@app.post("/api/uploads")
+@swag_from(
+    {
+        "tags": ["BOM"],
+        "summary": "Start a resumable (chunked) upload for a large BOM",
+        "consumes": ["application/json"],
+        "parameters": [
             {
-                "name": row["column_name"],
-                "sample_values": [str(v) for v in df[row["column_name"]].dropna().head(5)],
-                "prediction": preds[i],
+                "name": "body",
+                "in": "body",
+                "required": True,
+                "schema": {
+                    "type": "object",
+                    "required": ["file_name"],
+                    "properties": {
+                        "file_name": {"type": "string"},
+                        "size": {"type": "integer", "description": "Total bytes, if known"},
+                    },
+                },
             }
-            for i, row in training_df.iterrows()
-        ]
-        return jsonify(
+        ],
+        "responses": {
+            201: {"description": "Session created", "schema": {"$ref": "#/definitions/UploadSession"}},
+            400: {"description": "Bad request"},
+            413: {"description": "File too large"},
+        },
+    }
+)
+def begin_upload() -> Response:
+    """Open an upload session; send chunks with PATCH, then POST …/complete."""
+    data = request.get_json(silent=True) or {}
+    file_name = data.get("file_name") or ""
+    if not file_name.endswith((".xlsx", ".xls")):
+        return jsonify({"error": "File must be .xlsx or .xls"}), 400
+    try:
+        size = int(data["size"]) if data.get("size") is not None else None
+        return jsonify(upload_store.begin(file_name, size)), 201
+    except UploadTooLarge as exc:
+        return jsonify({"error": str(exc)}), 413
+    except ValueError:
+        return jsonify({"error": "size must be an integer"}), 400
+
+
+@app.get("/api/uploads/<session_id>")
+@swag_from(
+    {
+        "tags": ["BOM"],
+        "summary": "Resume point of an upload session",
+        "parameters": [{"name": "session_id", "in": "path", "type": "string", "required": True}],
+        "responses": {
+            200: {"schema": {"$ref": "#/definitions/UploadSession"}},
+            404: {"description": "Unknown session"},
+        },
+    }
+)
+def upload_status(session_id: str) -> Response:
+    try:
+        return jsonify(upload_store.session(session_id))
+    except FileNotFoundError as exc:
+        return jsonify({"error": str(exc)}), 404
+
+
+@app.patch("/api/uploads/<session_id>")
+@swag_from(
+    {
+        "tags": ["BOM"],
+        "summary": "Append one chunk (raw body) at Upload-Offset",
+        "consumes": ["application/octet-stream"],
+        "parameters": [
+            {"name": "session_id", "in": "path", "type": "string", "required": True},
             {
-                "success": True,
-                "file_name": file.filename,
-                "columns": columns,
-                "row_count": len(df),
-            }
-        )
+                "name": "Upload-Offset",
+                "in": "header",
+                "type": "integer",
+                "required": True,
+                "description": "Byte offset the chunk starts at (the session's current offset)",
+            },
+        ],
+        "responses": {
+            200: {"description": "New offset", "schema": {"$ref": "#/definitions/UploadSession"}},
+            404: {"description": "Unknown session"},
+            409: {"description": "Offset mismatch – body carries the expected offset"},
+            413: {"description": "File too large"},
+        },
+    }
+)
+def upload_chunk(session_id: str) -> Response:
+    try:
+        offset = int(request.headers["Upload-Offset"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "Upload-Offset header required"}), 400
+    try:
+        new_offset = upload_store.append(session_id, offset, request.stream)
+        return jsonify({"session_id": session_id, "offset": new_offset})
+    except FileNotFoundError as exc:
+        return jsonify({"error": str(exc)}), 404
+    except UploadOffsetMismatch as exc:
+        return jsonify({"error": str(exc), "offset": exc.offset}), 409
+    except UploadTooLarge as exc:
+        return jsonify({"error": str(exc)}), 413
+
+
+@app.post("/api/uploads/<session_id>/complete")
+@swag_from(
+    {
+        "tags": ["BOM"],
+        "summary": "Finish an upload session and receive column predictions",
+        "parameters": [{"name": "session_id", "in": "path", "type": "string", "required": True}],
+        "responses": {
+            200: {"description": "Success", "schema": {"$ref": "#/definitions/UploadResponse"}},
+            404: {"description": "Unknown session"},
+            409: {"description": "Not all bytes received yet"},
+            500: {"description": "Server error"},
+        },
+    }
+)
+def complete_upload(session_id: str) -> Response:
+    try:
+        upload = upload_store.finish(session_id)
+        return jsonify(_upload_response(upload))
+    except FileNotFoundError as exc:
+        return jsonify({"error": str(exc)}), 404
+    except UploadOffsetMismatch as exc:
+        return jsonify({"error": str(exc), "offset": exc.offset}), 409
     except Exception as exc:  # noqa: BLE001
-        logger.exception("upload_file failed")
+        logger.exception("complete_upload failed")
         return jsonify({"error": f"Error processing file: {exc}"}), 500
 
 
@@ -375,10 +645,18 @@ def upload_file() -> Response:  # noqa: D401
     }
 )
 def process_bom() -> Response:
-    """Step 2 – create the row list the front-end will stream later."""
+    """Step 2 – create the row list to stream later, kept server-side as a BOM session."""
     data = request.get_json(silent=True) or {}
     try:
-        result = prediction_service.prepare_rows_for_stream(data["file_name"], data["columns"])
+        prefetcher.settle(data.get("upload_id"), {m["mapping"]: m["name"] for m in data["columns"]})
+        result = prediction_service.prepare_rows_for_stream(
+            data.get("file_name"),
+            data["columns"],
+            upload_id=data.get("upload_id"),
+        )
+        result["bom_id"] = bom_sessions.create(result["rows"], upload_id=data.get("upload_id"))
+        if data.get("include_rows") is False:
+            del result["rows"]
         return jsonify(result)
     except Exception as exc:  # noqa: BLE001
         logger.exception("process_bom failed")
@@ -391,7 +669,7 @@ def process_bom() -> Response:
         "tags": ["Streaming"],
         "summary": "NDJSON stream of Digi-Key look-ups",
         "consumes": ["application/json"],
-        "produces": ["application/x-ndjson"],
+        "produces": ["application/x-ndjson", "application/x-msgpack"],
         "parameters": [
             {
                 "name": "body",
@@ -400,9 +678,22 @@ def process_bom() -> Response:
                 "schema": {
                     "type": "object",
                     "properties": {
-                        "rows": {"type": "array", "items": {"$ref": "#/definitions/BomRow"}}
+                        "rows": {"type": "array", "items": {"$ref": "#/definitions/BomRow"}},
+                        "bom_id": {
+                            "type": "string",
+                            "description": "Returned by /api/process-bom – instead of `rows`",
+                        },
+                        "ranges": {"$ref": "#/definitions/RowRanges"},
+                        "upload_id": {
+                            "type": "string",
+                            "description": "With `columns`: read the rows from the upload while looking them up",
+                        },
+                        "columns": {"type": "array", "items": {"$ref": "#/definitions/ColumnMapping"}},
+                        "refresh": {
+                            "type": "boolean",
+                            "description": "Bypass the part cache and re-query the vendor",
+                        },
                     },
-                    "required": ["rows"],
                 },
             }
         ],
@@ -426,13 +717,10 @@ def process_bom() -> Response:
 def stream_digikey_results() -> Response:
     """Step 3a – stream Digi-Key search results."""
     data = request.get_json(silent=True) or {}
-    rows = data.get("rows")
-    if not rows:
-        return jsonify({"error": "Invalid request format"}), 400
-    return Response(
-        stream_with_context(_stream_results(rows, digikey_service.row_handler, "DigiKey")),
-        mimetype="application/x-ndjson",
-    )
+    rows, error = _request_rows(data)
+    if error is not None:
+        return error
+    return _stream_job(_start_job(rows, "DigiKey", data))
 
 
 @app.post("/api/stream-mouser-results")
@@ -441,7 +729,7 @@ def stream_digikey_results() -> Response:
         "tags": ["Streaming"],
         "summary": "NDJSON stream of Mouser look-ups",
         "consumes": ["application/json"],
-        "produces": ["application/x-ndjson"],
+        "produces": ["application/x-ndjson", "application/x-msgpack"],
         "parameters": [
             {
                 "name": "body",
@@ -450,9 +738,22 @@ def stream_digikey_results() -> Response:
                 "schema": {
                     "type": "object",
                     "properties": {
-                        "rows": {"type": "array", "items": {"$ref": "#/definitions/BomRow"}}
+                        "rows": {"type": "array", "items": {"$ref": "#/definitions/BomRow"}},
+                        "bom_id": {
+                            "type": "string",
+                            "description": "Returned by /api/process-bom – instead of `rows`",
+                        },
+                        "ranges": {"$ref": "#/definitions/RowRanges"},
+                        "upload_id": {
+                            "type": "string",
+                            "description": "With `columns`: read the rows from the upload while looking them up",
+                        },
+                        "columns": {"type": "array", "items": {"$ref": "#/definitions/ColumnMapping"}},
+                        "refresh": {
+                            "type": "boolean",
+                            "description": "Bypass the part cache and re-query the vendor",
+                        },
                     },
-                    "required": ["rows"],
                 },
             }
         ],
@@ -476,18 +777,382 @@ def stream_digikey_results() -> Response:
 def stream_mouser_results() -> Response:
     """Step 3b – stream Mouser search results."""
     data = request.get_json(silent=True) or {}
-    rows = data.get("rows") or []
-    if not rows:
-        return jsonify({"error": "Invalid request format"}), 400
+    rows, error = _request_rows(data)
+    if error is not None:
+        return error
     try:
-        return Response(
-            stream_with_context(_stream_results(rows, mouser_service.row_handler, "Mouser")),
-            mimetype="application/x-ndjson",
-        )
+        return _stream_job(_start_job(rows, "Mouser", data))
     except Exception as exc:  # noqa: BLE001
         logger.exception("[Mouser] route failed before streaming")
         return jsonify({"error": str(exc)}), 500
 
+
+@app.post("/api/stream-results")
+@swag_from(
+    {
+        "tags": ["Streaming"],
+        "summary": "NDJSON stream of merged look-ups across every enabled vendor",
+        "description": (
+            "Each row is queried at Digi-Key and Mouser in parallel. The row event "
+            "carries the cheapest in-stock offer at the row quantity and the other "
+            "vendors' offers under `alternatives`."
+        ),
+        "consumes": ["application/json"],
+        "produces": ["application/x-ndjson", "application/x-msgpack"],
+        "parameters": [
+            {
+                "name": "body",
+                "in": "body",
+                "required": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "rows": {"type": "array", "items": {"$ref": "#/definitions/BomRow"}},
+                        "bom_id": {
+                            "type": "string",
+                            "description": "Returned by /api/process-bom – instead of `rows`",
+                        },
+                        "ranges": {"$ref": "#/definitions/RowRanges"},
+                        "upload_id": {
+                            "type": "string",
+                            "description": "With `columns`: read the rows from the upload while looking them up",
+                        },
+                        "columns": {"type": "array", "items": {"$ref": "#/definitions/ColumnMapping"}},
+                        "vendors": {
+                            "type": "array",
+                            "items": {"type": "string", "enum": ["DigiKey", "Mouser"]},
+                            "description": "Subset of vendors to query (default: all enabled)",
+                        },
+                        "refresh": {
+                            "type": "boolean",
+                            "description": "Bypass the part cache and re-query the vendor",
+                        },
+                    },
+                },
+            }
+        ],
+        "responses": {
+            200: {
+                "description": "Continuous NDJSON – one **StreamEvent** per line",
+                "schema": {"$ref": "#/definitions/StreamEvent"},
+            },
+            400: {"description": "Bad request – malformed body or no usable vendor"},
+        },
+    }
+)
+def stream_results() -> Response:
+    """Step 3 (combined) – one stream, every vendor queried in parallel per row."""
+    data = request.get_json(silent=True) or {}
+    if _lookup_handlers("Combined", data) is None:  # before any pipeline opens the sheet
+        return jsonify({"error": "No enabled vendor selected"}), 400
+    rows, error = _request_rows(data)
+    if error is not None:
+        return error
+    return _stream_job(_start_job(rows, "Combined", data))
+
+
+# ──────────────────────────────────────────────── jobs ──
+@app.post("/api/jobs")
+@swag_from(
+    {
+        "tags": ["Streaming"],
+        "summary": "Start a durable look-up job (survives client disconnects)",
+        "consumes": ["application/json"],
+        "parameters": [
+            {
+                "name": "body",
+                "in": "body",
+                "required": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "rows": {"type": "array", "items": {"$ref": "#/definitions/BomRow"}},
+                        "bom_id": {
+                            "type": "string",
+                            "description": "Returned by /api/process-bom – instead of `rows`",
+                        },
+                        "ranges": {"$ref": "#/definitions/RowRanges"},
+                        "upload_id": {
+                            "type": "string",
+                            "description": "With `columns`: read the rows from the upload while looking them up",
+                        },
+                        "columns": {"type": "array", "items": {"$ref": "#/definitions/ColumnMapping"}},
+                        "source": {
+                            "type": "string",
+                            "enum": ["DigiKey", "Mouser", "Combined"],
+                            "default": "Combined",
+                        },
+                        "vendors": {"type": "array", "items": {"type": "string"}},
+                        "refresh": {"type": "boolean"},
+                        "cancel_on_disconnect": {
+                            "type": "boolean",
+                            "default": False,
+                            "description": "Cancel the job once no client has followed it for a while",
+                        },
+                    },
+                },
+            }
+        ],
+        "responses": {
+            202: {"description": "Job started", "schema": {"$ref": "#/definitions/Job"}},
+            400: {"description": "Bad request"},
+        },
+    }
+)
+def create_job() -> Response:
+    """Start a look-up job; read its events from /api/jobs/<id>/events."""
+    data = request.get_json(silent=True) or {}
+    source = data.get("source") or "Combined"
+    if _lookup_handlers(source, data) is None:  # before any pipeline opens the sheet
+        return jsonify({"error": f"Unknown or disabled source: {source}"}), 400
+    rows, error = _request_rows(data)
+    if error is not None:
+        return error
+    job_id = _start_job(rows, source, data, bool(data.get("cancel_on_disconnect")))
+    return jsonify(job_manager.get(job_id)), 202
+
+
+@app.get("/api/jobs/<job_id>")
+@swag_from(
+    {
+        "tags": ["Streaming"],
+        "summary": "Status of a look-up job",
+        "parameters": [{"name": "job_id", "in": "path", "type": "string", "required": True}],
+        "responses": {
+            200: {"schema": {"$ref": "#/definitions/Job"}},
+            404: {"description": "Unknown job"},
+        },
+    }
+)
+def job_status(job_id: str) -> Response:
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job)
+
+
+@app.get("/api/jobs/<job_id>/events")
+@swag_from(
+    {
+        "tags": ["Streaming"],
+        "summary": "Attach to a job: replay its events from `offset`, then follow live",
+        "produces": ["application/x-ndjson", "application/x-msgpack"],
+        "parameters": [
+            {"name": "job_id", "in": "path", "type": "string", "required": True},
+            {
+                "name": "offset",
+                "in": "query",
+                "type": "integer",
+                "default": 0,
+                "description": "First event to send – last seen `offset` + 1 to resume",
+            },
+        ],
+        "responses": {
+            200: {"description": "NDJSON StreamEvents, each with its log `offset`"},
+            404: {"description": "Unknown job"},
+        },
+    }
+)
+def job_events(job_id: str) -> Response:
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Unknown job"}), 404
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    return _stream_job(job_id, offset, with_offset=True)
+
+
+@app.post("/api/jobs/<job_id>/cancel")
+@swag_from(
+    {
+        "tags": ["Streaming"],
+        "summary": "Cancel a running look-up job (no further vendor calls are made)",
+        "parameters": [{"name": "job_id", "in": "path", "type": "string", "required": True}],
+        "responses": {
+            202: {"description": "Cancellation requested", "schema": {"$ref": "#/definitions/Job"}},
+            404: {"description": "Unknown job"},
+            409: {"description": "Job is not running"},
+        },
+    }
+)
+def cancel_job(job_id: str) -> Response:
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if not job_manager.cancel(job_id):
+        return jsonify({"error": f"Job is {job['status']}", **job}), 409
+    return jsonify(job_manager.get(job_id)), 202
+
+
+# ───────────────────────────────────────────── costing ──
+@app.post("/api/costing")
+@swag_from(
+    {
+        "tags": ["Costing"],
+        "summary": "BOM cost curve across build quantities (price breaks + MOQ)",
+        "consumes": ["application/json"],
+        "parameters": [
+            {
+                "name": "body",
+                "in": "body",
+                "required": True,
+                "schema": {
+                    "type": "object",
+                    "required": ["lines"],
+                    "properties": {
+                        "lines": {
+                            "type": "array",
+                            "description": "Streamed parts plus `quantity` per board",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "quantity": {"type": "number", "default": 1},
+                                    "price": {"type": "number"},
+                                    "minimum_order_quantity": {"type": "integer"},
+                                    "price_breaks": {
+                                        "type": "array",
+                                        "items": {"$ref": "#/definitions/PriceBreak"},
+                                    },
+                                },
+                            },
+                        },
+                        "build_quantities": {
+                            "type": "array",
+                            "items": {"type": "integer"},
+                            "description": "Board counts to cost (default 1-2-5 series, 1 … 100k)",
+                        },
+                        "include_lines": {"type": "boolean", "default": False},
+                    },
+                },
+            }
+        ],
+        "responses": {
+            200: {"description": "`total_cost` / `cost_per_board` per build quantity"},
+            400: {"description": "Bad request"},
+        },
+    }
+)
+def bom_costing() -> Response:
+    """Extended BOM cost for every requested build quantity in one call."""
+    data = request.get_json(silent=True) or {}
+    lines = data.get("lines")
+    if not isinstance(lines, list):
+        return jsonify({"error": "Invalid request format"}), 400
+    try:
+        result = costing_engine.evaluate(
+            lines, data.get("build_quantities"), bool(data.get("include_lines"))
+        )
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(result)
+
+
+@app.post("/api/allocate")
+@swag_from(
+    {
+        "tags": ["Costing"],
+        "summary": "Cheapest purchase allocation across vendors (stock, MOQ, lead time, splits)",
+        "consumes": ["application/json"],
+        "parameters": [
+            {
+                "name": "body",
+                "in": "body",
+                "required": True,
+                "schema": {
+                    "type": "object",
+                    "required": ["lines"],
+                    "properties": {
+                        "lines": {
+                            "type": "array",
+                            "description": "Quantity to buy per line; `offers` default to the part cache",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "row_index": {"type": "integer"},
+                                    "quantity": {"type": "integer", "default": 1},
+                                    "mpns": {"type": "array", "items": {"type": "string"}},
+                                    "manufacturer": {"type": "string"},
+                                    "offers": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "properties": {
+                                                "vendor": {"type": "string", "example": "DigiKey"},
+                                                "quantity_available": {"type": "integer"},
+                                                "minimum_order_quantity": {"type": "integer"},
+                                                "lead_time_weeks": {"type": "integer"},
+                                                "price_breaks": {
+                                                    "type": "array",
+                                                    "items": {"$ref": "#/definitions/PriceBreak"},
+                                                },
+                                            },
+                                        },
+                                    },
+                                },
+                            },
+                        },
+                        "vendors": {"type": "array", "items": {"type": "string"}},
+                        "max_lead_time_weeks": {"type": "number"},
+                        "allow_backorder": {"type": "boolean", "default": False},
+                        "vendor_fees": {
+                            "type": "object",
+                            "additionalProperties": {"type": "number"},
+                            "description": "Fixed cost per vendor ordered from, e.g. shipping",
+                        },
+                    },
+                },
+            }
+        ],
+        "responses": {
+            200: {"description": "Per-line allocations, vendor totals and unfillable lines"},
+            400: {"description": "Bad request"},
+        },
+    }
+)
+def allocate_purchase() -> Response:
+    """Split the BOM's purchase between vendors at the lowest total cost."""
+    data = request.get_json(silent=True) or {}
+    lines = data.get("lines")
+    if not isinstance(lines, list):
+        return jsonify({"error": "Invalid request format"}), 400
+    try:
+        result = allocator.optimize(
+            lines,
+            vendors=multi_vendor.vendors(data.get("vendors")),
+            max_lead_time_weeks=data.get("max_lead_time_weeks"),
+            allow_backorder=bool(data.get("allow_backorder")),
+            vendor_fees=data.get("vendor_fees"),
+        )
+    except (TypeError, ValueError, AttributeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(result)
+
+
+# ───────────────────────────────────────────── metrics ──
+@app.get("/api/metrics")
+@swag_from(
+    {
+        "tags": ["Health"],
+        "summary": "Look-up pipeline counters (part cache hit / miss, …)",
+        "responses": {200: {"description": "Counters keyed by component"}},
+    }
+)
+def metrics() -> Response:
+    """Expose in-process counters for dashboards and load tests."""
+    return jsonify(
+        {
+            "part_cache": part_cache.stats(),
+            "bom_cache": bom_cache.stats(),
+            "bom_sessions": bom_sessions.stats(),
+            "prefetch": prefetcher.stats(),
+            "upload_store": upload_store.stats(),
+            "jobs": job_manager.stats(),
+            "cancellation": cancel_metrics.stats(),
+            "singleflight": singleflight.stats(),
+            "oauth": {"DigiKey": digikey_service.tokens.stats()},
+            "logging": queue_stats(),
+        }
+    )
+
+
 # ────────────────────────────────────────────── health ──
 @app.get("/health")
 @swag_from(
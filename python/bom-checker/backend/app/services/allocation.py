@@ -0,0 +1,235 @@
+"""
+Cross-vendor purchase allocation.
+
+Given each BOM line's required ``quantity`` and the vendor offers for it
+(``price_breaks``, ``minimum_order_quantity``, ``quantity_available``,
+``lead_time_weeks``), decide how much to order from whom at the lowest
+total cost:
+
+    • an offer supplies up to its stock – or any quantity when back-orders
+      are allowed and its lead time is within ``max_lead_time_weeks``
+    • ordering ``x`` costs ``n × unit(n)`` with ``n = max(x, MOQ)``
+    • a line may be split between two vendors, when neither covers it alone
+      or when the split is simply cheaper
+
+Once the set of vendors ordered from is fixed the lines are independent, so
+every line's options – each vendor alone, each vendor pair at every split
+point where a break, MOQ or stock limit changes a price – are costed in one
+vectorised pass.  Between those points a split's cost is linear, so the best
+split is one of them.  Per-vendor ``vendor_fees`` (shipping, handling) couple
+the lines; they are settled by costing each subset of vendors – there are
+only a handful – and keeping the cheapest.
+
+Offers are taken from the request or, when a line has none, from the part
+cache (stale entries included).
+
+Exports a singleton: allocator
+"""
+from __future__ import annotations
+
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from services.costing import as_floats, pack_price_breaks, price_at
+from services.part_cache import part_cache
+
+VENDOR_PN_FIELDS = {"DigiKey": "digikey_pn", "Mouser": "mouser_pn"}
+
+
+def _vendor_of(offer: Dict[str, Any]) -> Optional[str]:
+    return offer.get("vendor") or offer.get("source")
+
+
+class _Allocator:
+    # ------------------------------------------------------------ offers ---- #
+    @staticmethod
+    def cached_offers(line: Dict[str, Any], vendors: Sequence[str]) -> List[Dict[str, Any]]:
+        """Part-cache records for *line* – the first cached MPN (alternates in order) per vendor."""
+        mpns = line.get("mpns") or [line.get("mpn")]
+        offers = []
+        for vendor in vendors:
+            for mpn in filter(None, mpns):
+                entry = part_cache.get(vendor, mpn, line.get("manufacturer"))
+                if entry is not None and entry.record is not None:
+                    offers.append({**entry.record, "vendor": vendor})
+                    break
+        return offers
+
+    # ----------------------------------------------------------- costing ---- #
+    @staticmethod
+    def _order_cost(bq, bp, moq, rows, x):
+        """``(ordered, unit, cost)`` of buying ``x[i, j]`` from offer ``rows[i]``."""
+        ordered = np.where(x > 0, np.maximum(x, moq[rows][:, None]), 0.0)
+        unit = price_at(bq[rows], bp[rows], ordered)
+        return ordered, unit, ordered * unit
+
+    def optimize(
+        self,
+        lines: Sequence[Dict[str, Any]],
+        vendors: Optional[Sequence[str]] = None,
+        max_lead_time_weeks: Optional[float] = None,
+        allow_backorder: bool = False,
+        vendor_fees: Optional[Dict[str, float]] = None,
+    ) -> Dict[str, Any]:
+        """Cheapest allocation of every line's ``quantity`` across *vendors*."""
+        vendors = list(vendors or settings.ENABLED_VENDORS)
+        if not vendors:
+            raise ValueError("no vendors to allocate across")
+        fees = np.array([float((vendor_fees or {}).get(v) or 0.0) for v in vendors])
+        L, V = len(lines), len(vendors)
+        column = {v: i for i, v in enumerate(vendors)}
+
+        # one (possibly empty) offer per line × vendor, line-major
+        offers: List[Dict[str, Any]] = [{}] * (L * V)
+        for i, line in enumerate(lines):
+            given = line.get("offers")
+            for offer in given if given is not None else self.cached_offers(line, vendors):
+                v = column.get(_vendor_of(offer))
+                if v is not None and offer:
+                    offers[i * V + v] = offer
+
+        need = np.ceil(np.maximum(as_floats([line.get("quantity") for line in lines], 1.0), 0.0))
+        bq, bp, unpriced = pack_price_breaks(offers)
+        moq = np.maximum(as_floats([o.get("minimum_order_quantity") for o in offers]), 0.0)
+        stock = np.maximum(as_floats([o.get("quantity_available") for o in offers]), 0.0)
+        lead = as_floats([o.get("lead_time_weeks") for o in offers], np.nan)
+
+        backorder = np.full(L * V, bool(allow_backorder))
+        if max_lead_time_weeks is not None:
+            backorder &= lead <= float(max_lead_time_weeks)
+        cap = np.where(backorder, np.inf, stock)
+        usable = np.array([bool(o) for o in offers]) & (bp.max(axis=1) > 0) & (cap > 0)
+        usable[unpriced] = False
+        cap = np.where(usable, cap, 0.0).reshape(L, V)
+        usable = usable.reshape(L, V)
+        lines_idx = np.arange(L)
+
+        # options: every vendor alone, then every vendor pair split at its breakpoints
+        opt_cost, opt_mask, opt_split = [], [], []
+        for v in range(V):
+            rows = lines_idx * V + v
+            _, _, cost = self._order_cost(bq, bp, moq, rows, need[:, None])
+            ok = usable[:, v] & (cap[:, v] >= need)
+            opt_cost.append(np.where(ok, cost[:, 0], np.inf))
+            opt_mask.append(1 << v)
+            opt_split.append((v, None, None))
+        for a, b in combinations(range(V), 2):
+            ra, rb = lines_idx * V + a, lines_idx * V + b
+            q = need[:, None]
+            points = np.hstack([
+                cap[:, [a]], q - cap[:, [b]],
+                moq[ra][:, None], moq[ra][:, None] - 1, q - moq[rb][:, None], q - moq[rb][:, None] + 1,
+                bq[ra], bq[ra] - 1, q - bq[rb], q - bq[rb] + 1,
+            ])
+            xa = np.clip(np.nan_to_num(points, posinf=1e18, neginf=-1e18), 1, np.maximum(q - 1, 1))
+            xb = q - xa
+            ok = (
+                (usable[:, a] & usable[:, b] & (need >= 2))[:, None]
+                & (xa <= cap[:, [a]]) & (xb <= cap[:, [b]]) & (xb >= 1)
+            )
+            cost = (
+                self._order_cost(bq, bp, moq, ra, xa)[2] + self._order_cost(bq, bp, moq, rb, xb)[2]
+            )
+            cost = np.where(ok, cost, np.inf)
+            best = cost.argmin(axis=1)
+            opt_cost.append(cost[lines_idx, best])
+            opt_mask.append((1 << a) | (1 << b))
+            opt_split.append((a, b, xa[lines_idx, best]))
+        opt_cost = np.column_stack(opt_cost)                               # (L, O)
+        opt_mask = np.array(opt_mask)
+
+        # vendor fees: cost each vendor subset, keep the cheapest
+        feasible = np.isfinite(opt_cost).any(axis=1)
+        subsets = range(1, 1 << V) if fees.any() else [(1 << V) - 1]
+        best_total, choice = np.inf, None
+        for subset in subsets:
+            allowed = (opt_mask & ~subset) == 0
+            masked = np.where(allowed, opt_cost, np.inf)
+            pick = masked.argmin(axis=1)
+            cost = masked[lines_idx, pick]
+            if not np.isfinite(cost[feasible]).all():
+                continue
+            used = np.bitwise_or.reduce(opt_mask[pick[feasible]]) if feasible.any() else 0
+            total = cost[feasible].sum() + sum(fees[v] for v in range(V) if used >> v & 1)
+            if total < best_total:
+                best_total, choice = total, pick
+
+        # quantities per line × vendor for the winning options
+        take = np.zeros((L, V))
+        if choice is not None:
+            for o, split in enumerate(opt_split):
+                chosen = feasible & (choice == o)
+                a, b, xa = split
+                if b is None:
+                    take[chosen, a] = need[chosen]
+                else:
+                    take[chosen, a] = xa[chosen]
+                    take[chosen, b] = need[chosen] - xa[chosen]
+        ordered, unit, cost = self._order_cost(bq, bp, moq, np.arange(L * V), take.reshape(-1, 1))
+        ordered, unit, cost = (arr.reshape(L, V) for arr in (ordered, unit, cost))
+        return self._report(lines, vendors, offers, need, take, ordered, unit, cost, stock, cap, fees)
+
+    # ------------------------------------------------------------ report ---- #
+    @staticmethod
+    def _report(lines, vendors, offers, need, take, ordered, unit, cost, stock, cap, fees):
+        V = len(vendors)
+        used = take.any(axis=0)
+        parts = float(cost.sum())
+        fee_total = float(fees[used].sum())
+        # plain lists: per-line numpy scalar access dominates otherwise
+        need_l, take_l, ordered_l, unit_l = need.tolist(), take.tolist(), ordered.tolist(), unit.tolist()
+        cost_l, stock_l, cap_l = cost.tolist(), stock.reshape(-1, V).tolist(), cap.tolist()
+        out_lines, unallocated = [], []
+        for i, line in enumerate(lines):
+            row_index = line.get("row_index", i)
+            if need_l[i] and not any(take_l[i]):
+                unallocated.append({
+                    "row_index": row_index,
+                    "quantity": int(need_l[i]),
+                    "available": int(sum(cap_l[i])),  # finite – unlimited offers always fit
+                    "reason": "insufficient stock" if any(cap_l[i]) else "no usable offers",
+                })
+                continue
+            allocations = []
+            for v, qty in enumerate(take_l[i]):
+                if not qty:
+                    continue
+                offer = offers[i * V + v]
+                allocations.append({
+                    "vendor": vendors[v],
+                    "mpn": offer.get("mpn"),
+                    "vendor_pn": offer.get(VENDOR_PN_FIELDS.get(vendors[v], ""), offer.get("vendor_pn")),
+                    "quantity": int(qty),
+                    "order_quantity": int(ordered_l[i][v]),
+                    "unit_price": unit_l[i][v],
+                    "extended_cost": round(cost_l[i][v], 4),
+                    "from_stock": qty <= stock_l[i][v],
+                    "lead_time_weeks": offer.get("lead_time_weeks"),
+                })
+            out_lines.append({
+                "row_index": row_index,
+                "quantity": int(need_l[i]),
+                "cost": round(sum(cost_l[i]), 4),
+                "split": len(allocations) > 1,
+                "allocations": allocations,
+            })
+
+        return {
+            "total_cost": round(parts + fee_total, 4),
+            "parts_cost": round(parts, 4),
+            "fees": round(fee_total, 4),
+            "vendor_totals": {
+                v: round(float(cost[:, j].sum()), 4) for j, v in enumerate(vendors) if used[j]
+            },
+            "line_count": len(lines),
+            "split_lines": sum(1 for line in out_lines if line["split"]),
+            "lines": out_lines,
+            "unallocated": unallocated,
+        }
+
+
+# --------------------------------------------------------------- singleton #
+allocator = _Allocator()
@@ -0,0 +1,222 @@
+"""
+asyncio execution engine for the NDJSON streaming endpoints.
+
+A single event loop runs in a daemon thread and hosts every in-flight look-up
+of every stream, so hundreds of rows can wait on vendors without holding an
+OS thread each.  Per stream, row events flow through a bounded
+``asyncio.Queue``: when the client reads slowly, producers block on ``put``
+and stop starting new rows (backpressure).  A per-vendor semaphore caps
+in-flight look-ups across all streams (``ASYNC_MAX_IN_FLIGHT``); vendor
+quotas are still enforced by the rate limiter inside the async transport.
+
+``run()`` is a plain iterator so Flask's WSGI response can consume it.  The
+caller's cancel token is bound inside the producer (so every row task and
+the async transport see it); when it fires the producer is cancelled and
+``run()`` raises ``LookupCancelled``.
+
+``alternates()`` is the asyncio twin of ``lookup_scheduler.alternates``.
+Deferred events work as in the scheduler: a handler yields ``(event,
+task)`` and the event is queued once the task is done, after the row task
+itself has released its slot.
+
+Exports a singleton: async_engine
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+)
+
+from core.config import settings
+from services.cancellation import CancelToken, LookupCancelled, bind, current_token
+from services.lookup_scheduler import error_event, lookup_scheduler
+from services.row_pipeline import RowPipeline
+from services.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, Dict[str, Any]]
+AsyncRowHandler = Callable[[Dict[str, Any]], AsyncIterator[Event]]
+
+_DONE = object()  # sentinel: producer finished
+
+CANCEL_POLL = 0.25  # seconds between cancel-token checks while waiting for events
+
+
+class _AsyncLookupEngine:
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    # ------------------------------------------------------------- loop ---- #
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="lookup-async-loop", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def call(self, coro) -> Any:
+        """Run *coro* on the engine loop from any other thread and wait for it."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _semaphore(self, vendor: str) -> asyncio.Semaphore:
+        # only touched from the loop thread, so no lock needed
+        if vendor not in self._semaphores:
+            self._semaphores[vendor] = asyncio.Semaphore(settings.ASYNC_MAX_IN_FLIGHT)
+        return self._semaphores[vendor]
+
+    # ------------------------------------------------------- alternates ---- #
+    @staticmethod
+    def alternates(
+        vendor: str, lookup: Callable[[str], Awaitable[Any]], mpns: Sequence[str]
+    ) -> Iterator[Tuple[str, Callable[[], Awaitable[Any]]]]:
+        """
+        ``(mpn, answer)`` pairs in BOM order, for use inside a coroutine:
+        ``await answer()``.  In parallel mode every look-up is already a
+        running task; the ones still pending are cancelled once the caller
+        stops iterating.
+        """
+        if len(mpns) < 2 or not lookup_scheduler.parallel_alternates(vendor):
+            for mpn in mpns:
+                yield mpn, lambda mpn=mpn: lookup(mpn)
+            return
+        tasks = [asyncio.ensure_future(lookup(mpn)) for mpn in mpns]
+        try:
+            for mpn, task in zip(mpns, tasks):
+                yield mpn, lambda task=task: task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # ---------------------------------------------------------- produce ---- #
+    async def _produce(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        handler: AsyncRowHandler,
+        vendor: str,
+        queue: asyncio.Queue,
+        token: Optional[CancelToken] = None,
+        memo: Optional[Dict[Any, Any]] = None,
+    ) -> None:
+        # tasks created below inherit the caller's token and job memo
+        with bind(token), singleflight.scope(memo):
+            await self._produce_rows(rows, handler, vendor, queue)
+
+    async def _produce_rows(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        handler: AsyncRowHandler,
+        vendor: str,
+        queue: asyncio.Queue,
+    ) -> None:
+        sem = self._semaphore(vendor)
+        tasks: set = set()
+        deferred: set = set()
+
+        async def resolve(event: str, pending: asyncio.Future) -> None:
+            try:
+                payload = await pending
+            except (asyncio.CancelledError, LookupCancelled):
+                raise
+            except Exception:  # noqa: BLE001 – deferred events are best-effort extras
+                logger.exception("[%s] deferred look-up failed", vendor)
+                return
+            if payload is not None:
+                await queue.put((event, payload))
+
+        async def one(row: Dict[str, Any]) -> None:
+            try:
+                async for event, payload in handler(row):
+                    if isinstance(payload, asyncio.Future):
+                        deferred.add(asyncio.ensure_future(resolve(event, payload)))
+                    else:
+                        await queue.put((event, payload))
+            except (asyncio.CancelledError, LookupCancelled):
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("[%s] async row handler failed", vendor)
+                await queue.put(error_event(row, exc, vendor))
+
+        def spawned(task: asyncio.Task) -> None:
+            # done-callbacks also fire for tasks cancelled before they start
+            tasks.discard(task)
+            sem.release()
+
+        pending = iter(rows)
+        blocking = isinstance(rows, RowPipeline)  # rows arrive from a reader thread
+        try:
+            while True:
+                row = await asyncio.to_thread(next, pending, None) if blocking else next(pending, None)
+                if row is None:
+                    break
+                await sem.acquire()  # bounds tasks alive at once, not just running
+                task = asyncio.create_task(one(row))
+                tasks.add(task)
+                task.add_done_callback(spawned)
+            if tasks:
+                await asyncio.gather(*tasks)
+            if deferred:
+                await asyncio.gather(*deferred)
+        except asyncio.CancelledError:
+            for task in list(tasks) + list(deferred):
+                task.cancel()
+            if blocking:
+                rows.close()  # also wakes a reader-thread ``next`` waiting for a row
+            raise  # consumer is gone – nobody left to read _DONE
+        except Exception:
+            for task in list(tasks) + list(deferred):
+                task.cancel()
+            await queue.put(_DONE)
+            raise
+        await queue.put(_DONE)
+
+    # -------------------------------------------------------------- run ---- #
+    def run(
+        self, rows: Iterable[Dict[str, Any]], handler: AsyncRowHandler, vendor: str
+    ) -> Iterator[Event]:
+        """Yield ``(event, payload)`` pairs as the async row handlers produce them."""
+
+        async def make_queue() -> asyncio.Queue:
+            return asyncio.Queue(maxsize=settings.ASYNC_QUEUE_SIZE)
+
+        token = current_token()
+        queue = self.call(make_queue())
+        producer = asyncio.run_coroutine_threadsafe(
+            self._produce(rows, handler, vendor, queue, token, singleflight.current_scope()),
+            self.loop,
+        )
+        try:
+            while True:
+                item = self._next(queue, token)
+                if item is _DONE:
+                    break
+                yield item
+            producer.result()  # surface errors raised while iterating *rows*
+        finally:
+            if not producer.done():
+                producer.cancel()  # client went away / job cancelled – stop the look-ups
+
+    def _next(self, queue: asyncio.Queue, token: Optional[CancelToken]) -> Any:
+        """Next queued item, raising ``LookupCancelled`` if *token* fires first."""
+        getter = asyncio.run_coroutine_threadsafe(queue.get(), self.loop)
+        while True:
+            try:
+                return getter.result(timeout=None if token is None else CANCEL_POLL)
+            except concurrent.futures.TimeoutError:
+                if token.cancelled:
+                    getter.cancel()
+                    raise LookupCancelled(token.reason) from None
+
+
+# --------------------------------------------------------------- singleton #
+async_engine = _AsyncLookupEngine()
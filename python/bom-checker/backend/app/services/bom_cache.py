@@ -0,0 +1,139 @@
+"""
+Parsed-BOM artifact cache.
+
+``/api/upload`` parses the workbook once and stores the cleaned DataFrame
+as a pickled artifact under ``CACHE_DIR/boms/<sha256>.pkl``, keyed by the
+SHA-256 of the raw file.  ``/api/process-bom`` (and any later re-mapping of
+the same file) loads that artifact instead of running ``clean_excel_file``
+again – hashing the bytes is far cheaper than decoding the sheet.
+
+The directory is bounded by ``BOM_CACHE_MAX_BYTES``; least-recently-used
+artifacts (by mtime, refreshed on every hit) are deleted first.
+
+Exports a singleton: bom_cache
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(raw: bytes) -> str:
+    """Hex SHA-256 of the uploaded file – the artifact key."""
+    return hashlib.sha256(raw).hexdigest()
+
+
+def file_hash(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """``content_hash`` of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _BomCache:
+    SUFFIX = ".pkl"
+
+    def __init__(
+        self, root: Optional[Union[str, Path]] = None, max_bytes: Optional[int] = None
+    ) -> None:
+        self.root = Path(root) if root else settings.CACHE_DIR / "boms"
+        self.max_bytes = max_bytes or settings.BOM_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _path(self, digest: str) -> Path:
+        if not digest or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid BOM hash: {digest!r}")
+        return self.root / f"{digest}{self.SUFFIX}"
+
+    def _count(self, stat: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[stat] += n
+
+    # ------------------------------------------------------------ public ---- #
+    def get(self, digest: str) -> Optional[pd.DataFrame]:
+        """Cached frame for *digest*, or None when it is missing / unreadable."""
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as fh:
+                df = pickle.load(fh)
+            os.utime(path)  # LRU bookkeeping
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except Exception:  # noqa: BLE001 – corrupt artifact, treat as a miss
+            logger.exception("Dropping unreadable BOM artifact %s", path.name)
+            path.unlink(missing_ok=True)
+            self._count("misses")
+            return None
+        self._count("hits")
+        return df
+
+    def put(self, digest: str, df: pd.DataFrame) -> None:
+        """Store *df* atomically under *digest*, then enforce the size bound."""
+        path = self._path(digest)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as fh:
+                pickle.dump(df, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            logger.exception("BOM artifact write failed")
+            tmp.unlink(missing_ok=True)
+            return
+        self._count("stores")
+        self.evict()
+
+    def load(self, path: Union[str, Path], digest: Optional[str] = None) -> pd.DataFrame:
+        """Frame for an uploaded file on disk; *digest* skips re-hashing it."""
+        from services.excel_service import clean_excel_file  # local import to avoid cycle
+
+        digest = digest or file_hash(path)
+        df = self.get(digest)
+        if df is None:
+            df = clean_excel_file(path)  # parsed straight from disk
+            self.put(digest, df)
+        return df
+
+    def evict(self) -> int:
+        """Delete least-recently-used artifacts beyond ``max_bytes``; return how many."""
+        try:
+            entries = []
+            for p in self.root.glob(f"*{self.SUFFIX}"):
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+        except OSError:
+            return 0
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            self._count("evictions", removed)
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+# --------------------------------------------------------------- singleton #
+bom_cache = _BomCache()
@@ -0,0 +1,175 @@
+"""
+Server-side BOM sessions: the prepared stream rows of a processed BOM.
+
+``/api/process-bom`` stores its rows here under an opaque ``bom_id`` and the
+stream endpoints accept ``{"bom_id": …}`` instead of the whole row array, so
+a large BOM is not sent to the browser and parsed back once per vendor.
+
+Rows live in a local SQLite file (``CACHE_DIR/bom_sessions.sqlite3``), one
+compact JSON text per row keyed by its position, so a stream can ask for
+just some ``ranges`` of positions.  Sessions idle for longer than
+``BOM_SESSION_TTL`` are collected.
+
+Exports a singleton: bom_sessions
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from core.config import settings
+from services.event_encoding import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    bom_id       TEXT PRIMARY KEY,
+    upload_id    TEXT,
+    total_rows   INTEGER NOT NULL,
+    created      REAL NOT NULL,
+    last_access  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_rows (
+    bom_id    TEXT NOT NULL,
+    position  INTEGER NOT NULL,
+    row_json  TEXT NOT NULL,
+    PRIMARY KEY (bom_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+"""
+
+
+class UnknownBomSession(LookupError):
+    """No (unexpired) BOM session with that id."""
+
+
+def parse_ranges(ranges: Any, total: int) -> List[range]:
+    """
+    ``[[start, stop], …]`` (half-open row positions, clipped to the session)
+    as ranges; None means every row.
+    """
+    if ranges is None:
+        return [range(total)]
+    if not isinstance(ranges, list):
+        raise ValueError("ranges must be a list of [start, stop] pairs")
+    out = []
+    for item in ranges:
+        if not isinstance(item, (list, tuple)) or len(item) != 2:
+            raise ValueError(f"Invalid row range: {item!r}")
+        start, stop = int(item[0]), int(item[1])
+        if start < 0 or stop < start:
+            raise ValueError(f"Invalid row range: {item!r}")
+        out.append(range(min(start, total), min(stop, total)))
+    return out
+
+
+class _BomSessionStore:
+    def __init__(self, path: Optional[Union[str, Path]] = None, ttl: Optional[int] = None) -> None:
+        self.path = Path(path) if path else settings.CACHE_DIR / "bom_sessions.sqlite3"
+        self.ttl = ttl if ttl is not None else settings.BOM_SESSION_TTL
+        self._local = threading.local()
+
+    # ------------------------------------------------------------ sqlite ---- #
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "path", None) != self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.path = conn, self.path
+        return conn
+
+    # ------------------------------------------------------------ public ---- #
+    def create(self, rows: Sequence[Dict[str, Any]], upload_id: Optional[str] = None) -> str:
+        """Store *rows* under a new session; returns its ``bom_id``."""
+        bom_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?)", (bom_id, upload_id, len(rows), now, now)
+            )
+            conn.executemany(
+                "INSERT INTO session_rows VALUES (?, ?, ?)",
+                ((bom_id, i, dumps(row).decode()) for i, row in enumerate(rows)),
+            )
+        self.gc()
+        return bom_id
+
+    def get(self, bom_id: str) -> Optional[Dict[str, Any]]:
+        """Session metadata (refreshes its idle timer), or None."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT bom_id, upload_id, total_rows, created FROM sessions "
+            "WHERE bom_id=? AND last_access>?",
+            (bom_id, time.time() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE sessions SET last_access=? WHERE bom_id=?", (time.time(), bom_id))
+        return dict(zip(("bom_id", "upload_id", "total_rows", "created"), row))
+
+    def rows(self, bom_id: str, ranges: Any = None) -> List[Dict[str, Any]]:
+        """
+        The session's rows, or only those in *ranges* (see ``parse_ranges``),
+        in order.  Raises ``UnknownBomSession`` / ``ValueError``.
+        """
+        session = self.get(bom_id)
+        if session is None:
+            raise UnknownBomSession(f"Unknown or expired BOM session: {bom_id}")
+        conn = self._conn()
+        out: List[Dict[str, Any]] = []
+        for span in parse_ranges(ranges, session["total_rows"]):
+            if not span:
+                continue
+            out.extend(
+                loads(text)
+                for (text,) in conn.execute(
+                    "SELECT row_json FROM session_rows WHERE bom_id=? AND position>=? AND position<? "
+                    "ORDER BY position",
+                    (bom_id, span.start, span.stop),
+                )
+            )
+        return out
+
+    def gc(self) -> int:
+        """Drop sessions idle for longer than ``ttl``; return how many."""
+        cutoff = time.time() - self.ttl
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN")
+                doomed = [
+                    bom_id
+                    for (bom_id,) in conn.execute(
+                        "SELECT bom_id FROM sessions WHERE last_access<=?", (cutoff,)
+                    )
+                ]
+                for bom_id in doomed:
+                    conn.execute("DELETE FROM session_rows WHERE bom_id=?", (bom_id,))
+                    conn.execute("DELETE FROM sessions WHERE bom_id=?", (bom_id,))
+        except sqlite3.Error:
+            logger.exception("BOM session GC failed")
+            return 0
+        if doomed:
+            logger.info("BOM session GC removed %d session(s)", len(doomed))
+        return len(doomed)
+
+    def stats(self) -> Dict[str, int]:
+        sessions, rows = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(total_rows), 0) FROM sessions"
+        ).fetchone()
+        return {"sessions": sessions, "rows": rows}
+
+
+# --------------------------------------------------------------- singleton #
+bom_sessions = _BomSessionStore()
@@ -0,0 +1,142 @@
+"""
+Cooperative cancellation for look-up jobs.
+
+A ``CancelToken`` is bound to the running job through a context variable,
+so the scheduler, the row handlers and the vendor transport can all check
+it without threading it through every signature (``check_cancelled()``).
+The scheduler and async engine copy the context into their workers.
+
+A token fires when
+
+    • the client streaming a job disconnects (after a short grace period),
+    • ``POST /api/jobs/<id>/cancel`` is called, or
+    • the job's deadline (``JOB_DEADLINE`` seconds) passes.
+
+``LookupCancelled`` derives from ``BaseException`` – like
+``asyncio.CancelledError`` – so the ``except Exception`` fallbacks in the
+vendor services cannot swallow it.  Savings are tallied in
+``cancel_metrics`` and exposed on ``/api/metrics``.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class LookupCancelled(BaseException):
+    """Raised at a checkpoint once the current job's token has fired."""
+
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """Thread-safe, fire-once cancellation flag with an optional deadline."""
+
+    def __init__(self, deadline: Optional[float] = None) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self._timer: Optional[threading.Timer] = None
+        self.reason: Optional[str] = None
+        if deadline:
+            self._timer = threading.Timer(deadline, self.cancel, args=("deadline",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Fire the token; returns False if it had already fired."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        if self._timer is not None:
+            self._timer.cancel()
+        cancel_metrics.count(f"reason_{reason.replace(' ', '_')}")
+        for cb in callbacks:
+            cb()
+        return True
+
+    def on_cancel(self, cb: Callable[[], None]) -> None:
+        """Run *cb* when the token fires (immediately if it already has)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return
+        cb()
+
+    def close(self) -> None:
+        """Stop the deadline timer once the job has ended."""
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep up to *timeout*; True (early) if the token fired meanwhile."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise LookupCancelled(self.reason or "cancelled")
+
+
+class _CancelMetrics:
+    """Counters for work that cancellation saved."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+cancel_metrics = _CancelMetrics()
+
+_current: contextvars.ContextVar[Optional[CancelToken]] = contextvars.ContextVar(
+    "lookup_cancel_token", default=None
+)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def bind(token: Optional[CancelToken]) -> Iterator[Optional[CancelToken]]:
+    """Make *token* the current one for this thread / task."""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check_cancelled() -> None:
+    """Checkpoint: raise ``LookupCancelled`` if the current job was cancelled."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def sleep(seconds: float) -> None:
+    """``time.sleep`` that wakes up (and raises) when the current job is cancelled."""
+    token = _current.get()
+    if token is None:
+        time.sleep(seconds)
+    elif token.wait(seconds):
+        token.raise_if_cancelled()
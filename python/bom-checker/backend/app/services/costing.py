@@ -0,0 +1,130 @@
+"""
+Vectorised BOM costing across build quantities.
+
+Every line's price breaks are packed into two ``(lines × breaks)`` arrays
+(quantities padded with +inf, so padding is never selected), so one
+broadcast comparison finds the applicable break for every line at every
+board quantity at once:
+
+    need      = qty_per_board × boards
+    order_qty = max(need, MOQ)                    – MOQ-adjusted
+    unit      = price of the largest break ≤ order_qty (first break below all)
+    extended  = order_qty × unit
+
+The break rule is the one ``multi_vendor.unit_price_at`` applies to a single
+line.  Lines without breaks fall back to their ``price``; lines with neither
+are costed at 0 and reported under ``unpriced_lines``.
+
+Exports a singleton: costing_engine
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# 1-2-5 series from 1 to 100k boards
+DEFAULT_BUILD_QUANTITIES = [
+    m * 10 ** e for e in range(6) for m in (1, 2, 5) if m * 10 ** e <= 100_000
+]
+
+
+def as_floats(values: Sequence[Any], default: float = 0.0) -> np.ndarray:
+    """Float array of *values*; missing / non-numeric / non-finite become *default*."""
+    out = np.array(pd.to_numeric(pd.Series(values, dtype=object), errors="coerce"), dtype=float)
+    out[~np.isfinite(out)] = default
+    return out
+
+
+def pack_price_breaks(lines: Sequence[Dict[str, Any]]):
+    """
+    ``(break_qty, break_price, unpriced)`` for the ``price_breaks`` (or flat
+    ``price``) of each item – ``(L, K)`` arrays, quantities padded with +inf.
+    """
+    per_line = [[b for b in (line.get("price_breaks") or []) if b] for line in lines]
+    flat = [b for brs in per_line for b in brs]
+    flat_qty = [b.get("quantity") for b in flat]
+    flat_price = [b.get("price") for b in flat]
+    n = np.fromiter(map(len, per_line), dtype=int, count=len(lines))
+    width = max(int(n.max(initial=0)), 1)
+    qty = np.full((len(lines), width), np.inf)
+    price = np.zeros((len(lines), width))
+
+    # sort each line's breaks by quantity (stable, like unit_price_at)
+    owner = np.repeat(np.arange(len(lines)), n)
+    q = as_floats(flat_qty)
+    order = np.lexsort((q, owner))
+    slot = np.arange(len(order)) - np.repeat(np.cumsum(n) - n, n)
+    qty[owner, slot] = q[order]
+    price[owner, slot] = as_floats(flat_price)[order]
+
+    # no breaks: a single flat price from quantity 0
+    bare = np.flatnonzero(n == 0)
+    bare_prices = [lines[i].get("price") for i in bare]
+    qty[bare, 0] = 0.0
+    price[bare, 0] = as_floats(bare_prices)
+    unpriced = [int(i) for i, p in zip(bare, bare_prices) if p is None]
+    return qty, price, unpriced
+
+
+def price_at(break_qty: np.ndarray, break_price: np.ndarray, order_qty: np.ndarray) -> np.ndarray:
+    """Unit price of the largest break ≤ ``order_qty[i, j]`` for line *i* (first break below all)."""
+    applicable = (break_qty[:, :, None] <= order_qty[:, None, :]).sum(axis=1)
+    return np.take_along_axis(break_price, np.maximum(applicable - 1, 0), axis=1)
+
+
+class _CostingEngine:
+    MAX_BUILD_QUANTITIES = 200  # points per sweep
+
+    def evaluate(
+        self,
+        lines: Sequence[Dict[str, Any]],
+        build_quantities: Optional[Sequence[Any]] = None,
+        include_lines: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Cost *lines* (``quantity`` per board, ``price_breaks``,
+        ``minimum_order_quantity``, ``price``) for every board count in
+        *build_quantities* (default: 1 … 100k).
+        """
+        builds = np.array(
+            sorted({int(b) for b in (build_quantities or DEFAULT_BUILD_QUANTITIES)}), dtype=float
+        )
+        if builds.size == 0 or builds[0] < 1:
+            raise ValueError("build quantities must be positive integers")
+        if builds.size > self.MAX_BUILD_QUANTITIES:
+            raise ValueError(f"at most {self.MAX_BUILD_QUANTITIES} build quantities per call")
+
+        per_board = np.maximum(as_floats([line.get("quantity") for line in lines], 1.0), 0.0)
+        moq = np.maximum(as_floats([line.get("minimum_order_quantity") for line in lines]), 0.0)
+        break_qty, break_price, unpriced = pack_price_breaks(lines)
+
+        need = per_board[:, None] * builds[None, :]                      # (L, N)
+        order_qty = np.maximum(np.ceil(need), moq[:, None])
+        order_qty[per_board == 0] = 0                                    # DNP lines
+        unit = price_at(break_qty, break_price, order_qty)               # (L, N)
+        extended = order_qty * unit
+        total = extended.sum(axis=0)
+
+        out: Dict[str, Any] = {
+            "build_quantities": builds.astype(int).tolist(),
+            "total_cost": np.round(total, 4).tolist(),
+            "cost_per_board": np.round(total / builds, 6).tolist(),
+            "line_count": len(lines),
+            "unpriced_lines": unpriced,
+        }
+        if include_lines:
+            out["lines"] = [
+                {
+                    "unit_price": unit[i].tolist(),
+                    "order_quantity": order_qty[i].astype(int).tolist(),
+                    "extended_cost": np.round(extended[i], 4).tolist(),
+                }
+                for i in range(len(lines))
+            ]
+        return out
+
+
+# --------------------------------------------------------------- singleton #
+costing_engine = _CostingEngine()
@@ -2,26 +2,39 @@
 DigiKey API client – extended with MOQ & lead-time support.
 
 Public surface (unchanged):
-    • get_token()
+    • get_token()     – OAuth token shared by all worker processes (TokenStore)
     • search_by_part_number()
     • search_substitute()
     • process_product()
     • row_handler()
+    • lookup_part()   – cached search + process for one MPN
+    • substitutes_event() – cached substitute list for an out-of-stock row,
+      resolved off the row's critical path (a deferred ``substitutes`` event)
+    • *_async()       – asyncio twins used by services.async_engine
 Exports a singleton: digikey_service
 """
 
 from __future__ import annotations
 
-import json
+import asyncio
+import functools
 import logging
 import os
-import time
 from typing import Any, Dict, List, Optional, Tuple
 
-import requests
 from core.config import settings
+from core.logging import SampledDebug
+from services.async_engine import async_engine
+from services.cancellation import check_cancelled
+from services.http_transport import TRANSPORT_ERRORS, get_async_transport, get_transport
+from services.lookup_scheduler import lookup_scheduler
+from services.part_cache import part_cache
+from services.singleflight import flight_key, singleflight
+from services.token_store import TokenStore
 
 logger = logging.getLogger(__name__)
+# per-part records: LOG_LEVELS=services.digikey_service.parts=DEBUG
+_trace_part = SampledDebug(logging.getLogger(f"{__name__}.parts"))
 
 
 class _DigiKeyService:
@@ -37,112 +50,134 @@ class _DigiKeyService:
 
     # ------------------------------------------------------------------ init #
     def __init__(self) -> None:
-        os.makedirs(os.path.dirname(self.TOKEN_FILE), exist_ok=True)
         self.client_id: str = settings.DIGIKEY_CLIENT_ID or ""
         self.client_secret: str = settings.DIGIKEY_CLIENT_SECRET or ""
-        self._access: Optional[str] = None
-        self._expiry: float = 0.0
-        self._load_cached_token()
-
-    # ----------------------------------------------------------- token cache #
-    def _load_cached_token(self) -> None:
-        try:
-            if os.path.exists(self.TOKEN_FILE):
-                tok = json.loads(open(self.TOKEN_FILE).read())
-                self._access = tok["access_token"]
-                self._expiry = tok["created_at"] + tok["expires_in"]
-        except Exception:  # noqa: BLE001
-            logger.exception("Failed to load cached DigiKey token")
-
-    def _cache_token(self, token: Dict[str, Any]) -> None:
-        token["created_at"] = int(time.time())
-        with open(self.TOKEN_FILE, "w") as fh:
-            json.dump(token, fh, indent=2)
-        self._access = token["access_token"]
-        self._expiry = token["created_at"] + token["expires_in"]
-
-    # --------------------------------------------------------------- public #
-    def get_token(self) -> str:
-        """Return a valid access-token (cached, refreshed or simulated)."""
-        if self._access and time.time() < self._expiry - 300:
-            return self._access
-        if not (self.client_id and self.client_secret):
-            # prototype fallback (no credentials set)
-            self._access = "simulated_token"
-            self._expiry = time.time() + 3600
-            return self._access
+        self._http = get_transport("DigiKey")
+        self._ahttp = get_async_transport("DigiKey")
+        # shared with the other worker processes through TOKEN_FILE
+        self.tokens = TokenStore(
+            self.TOKEN_FILE,
+            self._fetch_token,
+            refresh_ahead=settings.DIGIKEY_TOKEN_REFRESH_AHEAD,
+            name="DigiKey",
+        )
 
+    # ----------------------------------------------------------------- oauth #
+    def _fetch_token(self) -> Dict[str, Any]:
         data = {
             "client_id": self.client_id,
             "client_secret": self.client_secret,
             "grant_type": "client_credentials",
         }
-        r = requests.post(f"{self.BASE}/v1/oauth2/token", data=data, timeout=20)
+        r = self._http.post(f"{self.BASE}/v1/oauth2/token", data=data)
         r.raise_for_status()
-        self._cache_token(r.json())
-        return self._access
+        return r.json()
+
+    # --------------------------------------------------------------- public #
+    def get_token(self) -> str:
+        """Return a valid access-token (shared, refreshed ahead of expiry, or simulated)."""
+        if not (self.client_id and self.client_secret):
+            return "simulated_token"  # prototype fallback (no credentials set)
+        return self.tokens.get()
+
+    def _invalidate_token(self, rejected: str) -> None:
+        """Forget *rejected* after a 401 unless another thread already replaced it."""
+        self.tokens.invalidate(rejected)
+
+    def _authorized(self, method: str, url: str, **kwargs: Any):
+        """Send an authenticated request; on 401 refresh the token once and retry once."""
+        token = self.get_token()
+        r = self._http.request(method, url, headers=self._headers(token), **kwargs)
+        if r.status_code == 401:
+            self._invalidate_token(token)
+            r = self._http.request(method, url, headers=self._headers(self.get_token()), **kwargs)
+        return r
+
+    def _headers(self, token: str) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {token}",
+            "X-DIGIKEY-Client-Id": self.client_id,
+            "Content-Type": "application/json",
+        }
 
     # ---------------------------------------------------------------- search #
     def search_by_part_number(
         self, mpn: str, manufacturer: str | None = None
     ) -> Dict[str, Any]:
         """
-        Exact-match part search (1 API call).  Unchanged behaviour.
+        Exact-match part search (1 API call).  Raises ``requests.HTTPError``
+        for an error status left after the transport's retries.
         """
         if self.get_token() == "simulated_token":
             return self._mock_part_data(mpn, manufacturer)
 
-        payload = {
+        payload = self._search_payload(mpn, manufacturer)
+        r = self._authorized("POST", self.SEARCH_URL, json=payload)
+        logger.debug("Search %s → HTTP %s", mpn, r.status_code)
+        r.raise_for_status()
+        return r.json()
+
+    @staticmethod
+    def _search_payload(mpn: str, manufacturer: str | None) -> Dict[str, Any]:
+        return {
             "Keywords": f"{manufacturer or ''} {mpn}".strip(),
             "RecordCount": 20,
             "ExactManufacturerPartNumber": True,
             "SearchOptions": ["ManufacturerPartSearch"],
         }
-        r = requests.post(
-            self.SEARCH_URL,
-            headers={
-                "Authorization": f"Bearer {self._access}",
-                "X-DIGIKEY-Client-Id": self.client_id,
-                "Content-Type": "application/json",
-            },
-            json=payload,
-            timeout=20,
-        )
-        print(f'Digikey request posted: {r}')
-        if r.status_code == 401:  # token expired – one retry
-            self._access = None
-            return self.search_by_part_number(mpn, manufacturer)
-        return r.json()
 
     # -------------------------------------------------------- substitute api #
     def search_substitute(
         self, digikey_pn: str, max_results: int = 5
     ) -> Optional[List[Dict[str, Any]]]:
-        """Return up to *max_results* substitute parts for the given DK number."""
+        """
+        Return up to *max_results* substitute parts for the given DK number.
+        Lists are cached per *digikey_pn* for ``PART_CACHE_SUBSTITUTE_TTL``.
+        """
         token = self.get_token()
         if token == "simulated_token":
             return self._mock_substitutes(digikey_pn, max_results)
 
+        cached = part_cache.get_substitutes("DigiKey", digikey_pn)
+        if cached is not None:
+            return cached[:max_results]
         try:
-            url = f"{self.BASE}/products/v4/search/{digikey_pn}/substitutions"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "X-DIGIKEY-Client-Id": self.client_id,
-                "Content-Type": "application/json",
-            }
-            r = requests.get(url, headers=headers, timeout=20)
-            if r.status_code == 401:
-                self._access = None
-                return self.search_substitute(digikey_pn, max_results)
+            r = self._authorized("GET", self._substitutes_url(digikey_pn))
             r.raise_for_status()
-            data = r.json()
-            products = (
-                data.get("ProductSubstitutes") or data.get("Products") or []
-            )[:max_results]
-            return [self.process_product(p) for p in products]
+            subs = self._format_substitutes(r.json(), max_results)
         except Exception as exc:  # noqa: BLE001
             logger.exception("DigiKey substitute search failed: %s", exc)
             return None
+        part_cache.put_substitutes("DigiKey", digikey_pn, subs)
+        return subs
+
+    def substitutes_event(
+        self, row: Dict[str, Any], best: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Payload of the deferred ``substitutes`` event for *row* (None on failure)."""
+        subs = self.search_substitute(best["digikey_pn"], max_results=5)
+        return None if subs is None else self._substitutes_payload(row, best, subs)
+
+    @staticmethod
+    def _substitutes_payload(
+        row: Dict[str, Any], best: Dict[str, Any], subs: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        return {
+            "mpn": best.get("mpn"),
+            "digikey_pn": best["digikey_pn"],
+            "row_index": row.get("row_index"),
+            "substitutes": subs,
+            "source": "DigiKey",
+        }
+
+    def _substitutes_url(self, digikey_pn: str) -> str:
+        return f"{self.BASE}/products/v4/search/{digikey_pn}/substitutions"
+
+    def _format_substitutes(self, data: Dict[str, Any], max_results: int) -> List[Dict[str, Any]]:
+        products = (
+            data.get("ProductSubstitutes") or data.get("Products") or []
+        )[:max_results]
+        return [self.process_product(p) for p in products]
 
     # ------------------------------------------------ helper: price breaks #
     def _extract_price_breaks(
@@ -215,38 +250,95 @@ class _DigiKeyService:
             "product_status": p.get("ProductStatus", {}).get("Status", ""),
         }
 
-        print(result)
-
+        _trace_part("Processed DigiKey product %s", result)
         return result
 
+    # ---------------------------------------------------------- cached lookup #
+    def lookup_part(
+        self, mpn: str, manufacturer: str | None = None, refresh: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Processed record for the first exact match of *mpn*, or None.
+
+        Live results go through ``part_cache``; *refresh* bypasses the read
+        side.  If the vendor call fails while a stale entry is cached, the
+        stale record is served instead of raising.  Identical look-ups share
+        one vendor call (``singleflight``).
+        """
+        if self.get_token() == "simulated_token":
+            return self._format_first(self._mock_part_data(mpn, manufacturer), mpn)
+
+        entry = None if refresh else part_cache.get("DigiKey", mpn, manufacturer)
+        if entry and entry.fresh:
+            return entry.record
+
+        def fetch() -> Optional[Dict[str, Any]]:
+            record = self._format_first(self.search_by_part_number(mpn, manufacturer), mpn)
+            part_cache.put("DigiKey", mpn, manufacturer, record)
+            return record
+
+        try:
+            return singleflight.do(flight_key("DigiKey", mpn, manufacturer), fetch)
+        except TRANSPORT_ERRORS:
+            if entry is None:
+                raise
+            logger.warning("DigiKey lookup for %s failed – serving stale cache entry", mpn)
+            return entry.record
+
+    def _format_first(self, res: Dict[str, Any], mpn: str) -> Optional[Dict[str, Any]]:
+        product = (res.get("Products") or [None])[0]
+        if not product:
+            return None
+        formatted = self.process_product(product)
+        formatted["mpn"] = mpn
+        formatted["source"] = "DigiKey"
+        return formatted
+
     # ------------------------------------------------------------ row helper #
     def row_handler(self, row: Dict[str, Any]):
-        """Yield ('found' | 'not_found', data) for a single BOM spreadsheet row."""
+        """
+        Yield ('found' | 'not_found', data) for a single BOM spreadsheet row.
+        Alternates are tried in BOM order (all at once when DIGIKEY_ALTERNATES
+        is "parallel"); the first one in stock wins.
+        """
         mpns: list[str] = row["mpns"]
         manufacturer = row.get("manufacturer")
+        refresh = bool(row.get("refresh"))
         best: Optional[Dict[str, Any]] = None
 
-        for mpn in mpns:
-            res = self.search_by_part_number(mpn, manufacturer)
-            print(f'Digikey request : {res}')
-            product = (res.get("Products") or [None])[0]
-            if not product:
+        lookup = functools.partial(self.lookup_part, manufacturer=manufacturer, refresh=refresh)
+        for _, answer in lookup_scheduler.alternates("DigiKey", lookup, mpns):
+            check_cancelled()
+            formatted = answer()
+            if not formatted:
                 continue
-            formatted = self.process_product(product)
-            formatted["mpn"] = mpn
-            formatted["source"] = "DigiKey"
             if formatted["status"] == "In Stock":
                 yield "found", formatted
                 return
             if best is None:
                 best = formatted  # remember first OOS candidate
 
-        # nothing in-stock → fetch substitutes for *best*
+        # nothing in-stock → report now, substitutes for *best* follow later
+        yield "not_found", self._not_found_payload(row, best)
         if best and best.get("digikey_pn"):
-            subs = self.search_substitute(best["digikey_pn"], max_results=5) or []
-            best["substitutes"] = subs
+            yield "substitutes", lookup_scheduler.defer(
+                "DigiKey", self.substitutes_event, row, best
+            )
+
+    def _not_found_payload(
+        self, row: Dict[str, Any], best: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        ``not_found`` data: *best* (or a placeholder) tagged with the row's
+        ``row_index``, which the later ``substitutes`` event is matched on.
+        *best* may be shared with other rows, so it is copied, not updated.
+        """
+        payload = best or self._not_found(row["mpns"], row.get("manufacturer"))
+        return {**payload, "row_index": row.get("row_index")}
 
-        yield "not_found", best or {
+    @staticmethod
+    def _not_found(mpns: List[str], manufacturer: str | None) -> Dict[str, Any]:
+        return {
             "mpn": mpns[0] if mpns else "Unknown",
             "manufacturer": manufacturer or "",
             "status": "Not Found",
@@ -257,6 +349,101 @@ class _DigiKeyService:
             "source": "DigiKey",
         }
 
+    # ------------------------------------------------------------- async api #
+    async def _get_token_async(self) -> str:
+        if not (self.client_id and self.client_secret):
+            return "simulated_token"
+        return self.tokens.peek() or await asyncio.to_thread(self.get_token)  # rare; keeps the loop free
+
+    async def _authorized_async(self, method: str, url: str, **kwargs: Any):
+        token = await self._get_token_async()
+        r = await self._ahttp.request(method, url, headers=self._headers(token), **kwargs)
+        if r.status_code == 401:
+            await asyncio.to_thread(self._invalidate_token, token)
+            token = await self._get_token_async()
+            r = await self._ahttp.request(method, url, headers=self._headers(token), **kwargs)
+        return r
+
+    async def lookup_part_async(
+        self, mpn: str, manufacturer: str | None = None, refresh: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Async ``lookup_part`` – same cache, same stale fallback."""
+        if await self._get_token_async() == "simulated_token":
+            return self._format_first(self._mock_part_data(mpn, manufacturer), mpn)
+
+        # the cache is SQLite – keep its (possibly contended) I/O off the loop
+        entry = None
+        if not refresh:
+            entry = await asyncio.to_thread(part_cache.get, "DigiKey", mpn, manufacturer)
+        if entry and entry.fresh:
+            return entry.record
+
+        async def fetch() -> Optional[Dict[str, Any]]:
+            r = await self._authorized_async(
+                "POST", self.SEARCH_URL, json=self._search_payload(mpn, manufacturer)
+            )
+            r.raise_for_status()
+            record = self._format_first(r.json(), mpn)
+            await asyncio.to_thread(part_cache.put, "DigiKey", mpn, manufacturer, record)
+            return record
+
+        try:
+            return await singleflight.do_async(flight_key("DigiKey", mpn, manufacturer), fetch)
+        except TRANSPORT_ERRORS:
+            if entry is None:
+                raise
+            logger.warning("DigiKey lookup for %s failed – serving stale cache entry", mpn)
+            return entry.record
+
+    async def search_substitute_async(
+        self, digikey_pn: str, max_results: int = 5
+    ) -> Optional[List[Dict[str, Any]]]:
+        if await self._get_token_async() == "simulated_token":
+            return self._mock_substitutes(digikey_pn, max_results)
+        cached = await asyncio.to_thread(part_cache.get_substitutes, "DigiKey", digikey_pn)
+        if cached is not None:
+            return cached[:max_results]
+        try:
+            r = await self._authorized_async("GET", self._substitutes_url(digikey_pn))
+            r.raise_for_status()
+            subs = self._format_substitutes(r.json(), max_results)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("DigiKey substitute search failed: %s", exc)
+            return None
+        await asyncio.to_thread(part_cache.put_substitutes, "DigiKey", digikey_pn, subs)
+        return subs
+
+    async def substitutes_event_async(
+        self, row: Dict[str, Any], best: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        subs = await self.search_substitute_async(best["digikey_pn"], max_results=5)
+        return None if subs is None else self._substitutes_payload(row, best, subs)
+
+    async def row_handler_async(self, row: Dict[str, Any]):
+        """Async generator twin of ``row_handler`` for the asyncio engine."""
+        mpns: list[str] = row["mpns"]
+        manufacturer = row.get("manufacturer")
+        refresh = bool(row.get("refresh"))
+        best: Optional[Dict[str, Any]] = None
+
+        lookup = functools.partial(
+            self.lookup_part_async, manufacturer=manufacturer, refresh=refresh
+        )
+        for _, answer in async_engine.alternates("DigiKey", lookup, mpns):
+            check_cancelled()
+            formatted = await answer()
+            if not formatted:
+                continue
+            if formatted["status"] == "In Stock":
+                yield "found", formatted
+                return
+            if best is None:
+                best = formatted
+
+        yield "not_found", self._not_found_payload(row, best)
+        if best and best.get("digikey_pn"):
+            yield "substitutes", asyncio.ensure_future(self.substitutes_event_async(row, best))
+
     # ---------------------------------------------------- misc helpers ---- #
     @staticmethod
     def _extract_mpn(p: Dict[str, Any]) -> str:
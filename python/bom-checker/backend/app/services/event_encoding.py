@@ -0,0 +1,199 @@
+"""
+Event encoding for the stream endpoints – NDJSON (default) or MessagePack.
+
+Job events are kept as JSON text in the job log, so a stream line is
+spliced together from the stored payload – never parsed and re-serialised.
+``encode_stream`` turns each batch of ready events into one response chunk
+(at most ``STREAM_CHUNK_BYTES``) and with *gzip* compresses the stream,
+flushing at every chunk so the client still sees events as they arrive.
+(``progress`` itself is throttled where it is produced – ``lookup_events``
+– so offsets on the wire stay contiguous.)
+
+Clients sending ``Accept: application/x-msgpack`` get the same events as
+length-prefixed MessagePack frames (4-byte big-endian length, then a map
+``{"event", "data"[, "offset"]}``) when msgpack is installed. The job log
+keeps ``pack_payload`` bytes next to the JSON text, so those frames are
+spliced the same way; only a row without them is parsed and re-packed.
+
+A ``PreEncoded`` record carries its own JSON text (the part cache builds
+hits from the stored text), so ``encode_payload`` skips serialisation for
+it; any mutation drops the cached text.
+
+``dumps`` / ``loads`` use orjson when it is installed.
+"""
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional stream format
+    msgpack = None
+
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/x-msgpack"
+
+RawEvent = Tuple[int, str, Union[str, bytes]]  # (offset, event, payload JSON or MessagePack)
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def loads(data: Any) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def stream_formats() -> List[str]:
+    """Mimetypes the stream endpoints can produce, preferred first."""
+    return [NDJSON, MSGPACK] if msgpack is not None else [NDJSON]
+
+
+class PreEncoded(dict):
+    """A dict that remembers its JSON text until it is modified."""
+
+    __slots__ = ("json",)
+
+    def __init__(self, data: Dict[str, Any], json_text: str) -> None:
+        super().__init__(data)
+        self.json: Optional[str] = json_text
+
+    def __setitem__(self, key, value):
+        self.json = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.json = None
+        super().__delitem__(key)
+
+    def __ior__(self, other):
+        self.json = None
+        return super().__ior__(other)
+
+    def update(self, *args, **kwargs):
+        self.json = None
+        super().update(*args, **kwargs)
+
+    def pop(self, *args):
+        self.json = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self.json = None
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.json = None
+        return super().setdefault(key, default)
+
+    def clear(self):
+        self.json = None
+        super().clear()
+
+
+def encode_payload(payload: Any) -> str:
+    """JSON text for a job-log payload – reused as-is for an unmodified ``PreEncoded``."""
+    if isinstance(payload, PreEncoded) and payload.json is not None:
+        return payload.json
+    return dumps(payload).decode()
+
+
+def _plain(obj: Any) -> Any:
+    if hasattr(obj, "tolist"):  # numpy scalars / arrays, as orjson serialises them
+        return obj.tolist()
+    raise TypeError(f"cannot pack {type(obj).__name__}")
+
+
+def pack_payload(payload: Any) -> Optional[bytes]:
+    """MessagePack bytes for a job-log payload; None without msgpack or for an unpackable value."""
+    if msgpack is None:
+        return None
+    try:
+        return msgpack.packb(payload, use_bin_type=True, default=_plain)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class _Encoder:
+    def __init__(self, with_offset: bool) -> None:
+        self.with_offset = with_offset
+        self._prefix: Dict[str, bytes] = {}
+
+    def line(self, seq: int, event: str, payload: str) -> bytes:
+        prefix = self._prefix.get(event)
+        if prefix is None:
+            prefix = self._prefix[event] = b'{"event":' + dumps(event) + b',"data":'
+        if self.with_offset:
+            return b"%s%s,\"offset\":%d}\n" % (prefix, payload.encode(), seq)
+        return b"%s%s}\n" % (prefix, payload.encode())
+
+
+class _MsgpackEncoder:
+    def __init__(self, with_offset: bool) -> None:
+        self.with_offset = with_offset
+        self._packer = msgpack.Packer(use_bin_type=True)
+        self._map = b"\x83" if with_offset else b"\x82"  # fixmap of 3 / 2 entries
+        self._offset = self._packer.pack("offset")
+        self._prefix: Dict[str, bytes] = {}
+
+    def line(self, seq: int, event: str, payload: Union[str, bytes]) -> bytes:
+        prefix = self._prefix.get(event)
+        if prefix is None:
+            pack = self._packer.pack
+            prefix = self._prefix[event] = self._map + pack("event") + pack(event) + pack("data")
+        if not isinstance(payload, bytes):  # logged without its packed form
+            payload = self._packer.pack(loads(payload))
+        body = prefix + payload
+        if self.with_offset:
+            body += self._offset + self._packer.pack(seq)
+        return struct.pack(">I", len(body)) + body
+
+
+def encode_stream(
+    batches: Iterable[Sequence[RawEvent]],
+    with_offset: bool = False,
+    gzip: bool = False,
+    mimetype: str = NDJSON,
+) -> Iterator[bytes]:
+    """One (optionally gzip-flushed) chunk per batch of ready events."""
+    if mimetype == MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed")
+        encoder: Any = _MsgpackEncoder(with_offset)
+    else:
+        encoder = _Encoder(with_offset)
+    limit = settings.STREAM_CHUNK_BYTES
+    zipper = zlib.compressobj(settings.STREAM_GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None
+
+    def chunks(batch: Sequence[RawEvent]) -> Iterator[bytes]:
+        pending: List[bytes] = []
+        size = 0
+        for seq, event, payload in batch:
+            line = encoder.line(seq, event, payload)
+            if pending and size + len(line) > limit:
+                yield b"".join(pending)
+                pending, size = [], 0
+            pending.append(line)
+            size += len(line)
+        if pending:
+            yield b"".join(pending)
+
+    for batch in batches:
+        for chunk in chunks(batch):
+            yield zipper.compress(chunk) + zipper.flush(zlib.Z_SYNC_FLUSH) if zipper else chunk
+    if zipper is not None:
+        yield zipper.flush(zlib.Z_FINISH)
@@ -1,117 +1,232 @@
-import pandas as pd
 import io
 import logging
+import os
+from itertools import chain, islice
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # optional – faster Rust reader for .xlsx
+    CalamineWorkbook = None
 
 logger = logging.getLogger(__name__)
 
-def clean_excel_file(file_content):
-    """
-    Clean Excel files with improved handling for multiple sheets.
-    Keeps everything in memory without writing to disk.
-    
-    Args:
-        file_content (bytes): The raw Excel file content
-        
-    Returns:
-        pandas.DataFrame: Cleaned DataFrame with appropriate headers
-    """
-    # Get sheet names using pandas
-    try:
-        xl = pd.ExcelFile(io.BytesIO(file_content))
-        all_sheets = xl.sheet_names
-        logger.info(f"Available sheets: {', '.join(all_sheets)}")
-    except Exception as e:
-        logger.error(f"Error reading Excel file: {e}")
-        raise
+# Cell strings pandas.read_excel treats as missing by default.
+_NA_STRINGS = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+})
+
+# Only this many leading rows are scored when looking for the header row.
+HEADER_SCAN_ROWS = 20
+
+# Typical "header-ish" words often seen in BOM column headers
+HEADER_KEYWORDS = {
+    'part', 'qty', 'quantity', 'reference', 'ref des', 'vendor',
+    'manufacturer', 'mfr', 'description', 'desc', 'value', 'footprint',
+    'package', 'comment', 'designation', 'designator', 'item', 'number',
+    'pn', 'manf', 'manf#', 'refs', 'unit', 'cost', 'total'
+}
+
+_XLSX_MAGIC = b"PK\x03\x04"
+
+
+def _convert_cell(value):
+    """Normalise one raw cell the way pandas' Excel readers do."""
+    if value is None:
+        return np.nan
+    if isinstance(value, float):
+        if value != value:
+            return np.nan
+        return int(value) if value.is_integer() else value
+    if isinstance(value, str) and value in _NA_STRINGS:
+        return np.nan
+    return value
 
+
+def _convert_row(row):
+    """Convert a raw row, dropping trailing empty cells first (as pandas does)."""
+    end = len(row)
+    while end and (row[end - 1] is None or row[end - 1] == ""):
+        end -= 1
+    return [_convert_cell(v) for v in row[:end]]
+
+
+def _source(file_content):
+    """(file-like or path, leading bytes) for raw bytes, a path or a binary file."""
+    if isinstance(file_content, (bytes, bytearray, memoryview)):
+        data = bytes(file_content)
+        return io.BytesIO(data), data[:8]
+    if isinstance(file_content, (str, os.PathLike)):
+        with open(file_content, "rb") as fh:
+            return file_content, fh.read(8)
+    pos = file_content.tell()
+    head = file_content.read(8)
+    file_content.seek(pos)
+    return file_content, head
+
+
+def _select_sheet(all_sheets):
+    """Pick the sheet most likely to hold the BOM (by name), else the first one."""
     # Prioritize sheets based on name
     priority_sheet_keywords = ['bom', 'parts', 'component', 'material', 'assembly']
     priority_modifiers = ['updated', 'final', 'latest', 'rev', 'current']
-    
-    # Select the best sheet
-    selected_sheet = None
-    
+
     # First priority: sheets with both modifier and keyword
     for sheet_name in all_sheets:
         sheet_name_lower = str(sheet_name).lower()
         if any(modifier in sheet_name_lower for modifier in priority_modifiers) and \
            any(keyword in sheet_name_lower for keyword in priority_sheet_keywords):
-            selected_sheet = sheet_name
-            logger.info(f"Selected sheet '{selected_sheet}' based on priority name containing both modifier and keyword")
-            break
-    
+            logger.info(f"Selected sheet '{sheet_name}' based on priority name containing both modifier and keyword")
+            return sheet_name
+
     # Second priority: sheets with just a BOM keyword
-    if not selected_sheet:
-        for sheet_name in all_sheets:
-            sheet_name_lower = str(sheet_name).lower()
-            if any(keyword in sheet_name_lower for keyword in priority_sheet_keywords):
-                selected_sheet = sheet_name
-                logger.info(f"Selected sheet '{selected_sheet}' based on priority keyword in name")
-                break
-    
+    for sheet_name in all_sheets:
+        sheet_name_lower = str(sheet_name).lower()
+        if any(keyword in sheet_name_lower for keyword in priority_sheet_keywords):
+            logger.info(f"Selected sheet '{sheet_name}' based on priority keyword in name")
+            return sheet_name
+
     # Default to first sheet if no priority match
-    if not selected_sheet and all_sheets:
-        selected_sheet = all_sheets[0]
-        logger.info(f"Selected first available sheet: '{selected_sheet}'")
-    
-    # Read the selected sheet without a header first
-    if selected_sheet:
-        logger.info(f"Reading sheet: '{selected_sheet}'")
-        df_raw = pd.read_excel(io.BytesIO(file_content), sheet_name=selected_sheet, header=None)
-    else:
-        # If somehow we couldn't determine the sheet, read the first sheet by position
-        logger.info("Reading first sheet by position")
-        df_raw = pd.read_excel(io.BytesIO(file_content), header=None)
-    
-    # Typical "header-ish" words often seen in BOM column headers
-    header_keywords = {
-        'part', 'qty', 'quantity', 'reference', 'ref des', 'vendor',
-        'manufacturer', 'mfr', 'description', 'desc', 'value', 'footprint',
-        'package', 'comment', 'designation', 'designator', 'item', 'number',
-        'pn', 'manf', 'manf#', 'refs', 'unit', 'cost', 'total'
-    }
-    
-    # Find the best header row
+    if all_sheets:
+        logger.info(f"Selected first available sheet: '{all_sheets[0]}'")
+        return all_sheets[0]
+    return None
+
+
+def iter_sheet_rows(file_content):
+    """
+    Lazily yield the raw rows (tuples) of the BOM sheet, reading the file once.
+
+    ``.xlsx`` is streamed with python-calamine when it is installed, otherwise
+    with openpyxl in read-only mode; anything else (``.xls``) goes through a
+    single ``pd.read_excel`` call.  Cells are *not* normalised here.
+    """
+    source, head = _source(file_content)
+
+    if isinstance(source, (str, os.PathLike)) and not (
+        head.startswith(_XLSX_MAGIC) and CalamineWorkbook is not None
+    ):
+        # openpyxl / pandas judge a path by its extension; blobs have none
+        with open(source, "rb") as fh:
+            yield from iter_sheet_rows(fh)
+        return
+
+    if head.startswith(_XLSX_MAGIC) and CalamineWorkbook is not None:
+        if isinstance(source, (str, os.PathLike)):
+            wb = CalamineWorkbook.from_path(str(source))
+        else:
+            wb = CalamineWorkbook.from_filelike(source)
+        logger.info(f"Available sheets: {', '.join(wb.sheet_names)}")
+        selected_sheet = _select_sheet(wb.sheet_names)
+        logger.info(f"Reading sheet: '{selected_sheet}' (calamine)")
+        sheet = wb.get_sheet_by_name(selected_sheet)
+        # calamine reports empty cells as ""
+        for row in sheet.iter_rows():
+            yield tuple(None if v == "" else v for v in row)
+        return
+
+    if head.startswith(_XLSX_MAGIC):
+        wb = openpyxl.load_workbook(source, read_only=True, data_only=True, keep_links=False)
+        try:
+            logger.info(f"Available sheets: {', '.join(wb.sheetnames)}")
+            selected_sheet = _select_sheet(wb.sheetnames)
+            logger.info(f"Reading sheet: '{selected_sheet}' (openpyxl read-only)")
+            ws = wb[selected_sheet]
+            ws.reset_dimensions()
+            yield from ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+
+    xl = pd.ExcelFile(source)
+    logger.info(f"Available sheets: {', '.join(map(str, xl.sheet_names))}")
+    selected_sheet = _select_sheet(xl.sheet_names)
+    logger.info(f"Reading sheet: '{selected_sheet}'")
+    df_raw = xl.parse(selected_sheet, header=None)
+    yield from df_raw.itertuples(index=False, name=None)
+
+
+def _detect_header(head_rows):
+    """Index (and score) of the row with most header-like words."""
     best_row = 0
     best_score = -1.0
-    
+
     # Loop over each row to see how many header-like words appear
-    for i in range(min(20, len(df_raw))):  # Check first 20 rows at most
+    for i, row in enumerate(head_rows):
         try:
-            row_values = df_raw.iloc[i].dropna().astype(str)
             # Lowercase each cell and see if it contains a known header keyword
             score = 0
-            for cell in row_values:
-                cell_lc = cell.lower()
-                if any(kw in cell_lc for kw in header_keywords):
+            for cell in row:
+                if pd.isna(cell):
+                    continue
+                cell_lc = str(cell).lower()
+                if any(kw in cell_lc for kw in HEADER_KEYWORDS):
                     score += 1
-            
+
             if score > best_score:
                 best_score = score
                 best_row = i
         except Exception as e:
             logger.error(f"Error processing row {i}: {e}")
             continue
-    
+
+    return best_row, best_score
+
+
+def clean_excel_file(file_content):
+    """
+    Clean Excel files with improved handling for multiple sheets.
+
+    The selected sheet is read exactly once: the first ``HEADER_SCAN_ROWS``
+    rows are scored to find the header, then the remaining rows are streamed
+    straight into the data frame.
+
+    Args:
+        file_content (bytes | str | PathLike | file): The Excel file
+
+    Returns:
+        pandas.DataFrame: Cleaned DataFrame with appropriate headers
+    """
+    try:
+        rows = iter_sheet_rows(file_content)
+        head = [_convert_row(row) for row in islice(rows, HEADER_SCAN_ROWS)]
+    except Exception as e:
+        logger.error(f"Error reading Excel file: {e}")
+        raise
+
+    best_row, best_score = _detect_header(head)
     logger.info(f"Selected header row {best_row} with score {best_score}")
-    
-    # Now read the file again, but with no header
-    if selected_sheet:
-        df_no_header = pd.read_excel(io.BytesIO(file_content), sheet_name=selected_sheet, header=None)
-    else:
-        df_no_header = pd.read_excel(io.BytesIO(file_content), header=None)
+
+    data = head
+    data.extend(_convert_row(row) for row in rows)
+
+    # Like pandas: drop trailing empty rows, pad to a common width and infer
+    # dtypes over whole columns (rows above the header included)
+    while data and not data[-1]:
+        data.pop()
+    if len(data) <= best_row:
+        return pd.DataFrame()
+    width = max(len(row) for row in data)
+    df_raw = pd.DataFrame(
+        [row + [np.nan] * (width - len(row)) for row in data],
+        columns=range(width), dtype=object,
+    ).infer_objects()
 
     # Extract the header row values as a list by converting to strings first
-    header_values = [str(x) for x in df_no_header.iloc[best_row]]
+    header_values = [str(x) for x in df_raw.iloc[best_row]]
 
     # Get data rows (everything after the header row)
-    data_df = df_no_header.iloc[best_row+1:].reset_index(drop=True)
+    data_df = df_raw.iloc[best_row + 1:].reset_index(drop=True)
 
     # Create a new DataFrame with the exact column names
     df = pd.DataFrame()
     for i, col_name in enumerate(header_values):
-        if i < len(data_df.columns):  # Make sure we don't go out of bounds
-            df[col_name] = data_df[i]
+        df[col_name] = data_df[i]
 
     # Drop wholly empty "Unnamed" columns
     unnamed_cols = [
@@ -119,10 +234,10 @@ def clean_excel_file(file_content):
         if str(col).startswith('Unnamed:') and df[col].isna().all()
     ]
     df.drop(columns=unnamed_cols, inplace=True, errors='ignore')
-        
+
     # Also remove any fully blank rows
     df.dropna(how='all', inplace=True)
-    
+
     return df
 
 def create_training_data(clean_df, source_file=""):
@@ -158,4 +273,136 @@ def create_training_data(clean_df, source_file=""):
         'source_file': source_files
     })
     
-    return training_df
\ No newline at end of file
+    return training_df
+
+def build_stream_rows(df, mpn_col, manu_col=None, qty_col=None, ref_col=None):
+    """
+    Turn a cleaned BOM into the row dicts streamed to the vendor look-ups.
+
+    Column-wise (vectorised) equivalent of walking ``df.iterrows()``:
+
+        • rows with an empty MPN cell are skipped
+        • ``mpns``         – the MPN cell split on "," (blanks dropped)
+        • ``manufacturer`` – stripped text, None when blank
+        • ``quantity``     – numeric part truncated to int, 1 when blank/invalid/0
+        • ``reference``    – raw cell value, None when blank
+
+    Args:
+        df (pd.DataFrame): Output of ``clean_excel_file``
+        mpn_col, manu_col, qty_col, ref_col (str | None): Mapped column names
+
+    Returns:
+        list[dict]: ``{"row_index", "mpns", "manufacturer", "quantity", "reference"}``
+    """
+    if mpn_col not in df.columns:
+        return []
+    df = df[df[mpn_col].notna()]
+    n = len(df)
+    if not n:
+        return []
+
+    # MPNs – split / strip / drop blanks on the exploded series, then regroup
+    parts = df[mpn_col].astype(str).reset_index(drop=True).str.split(",").explode().str.strip()
+    parts = parts[parts != ""]
+    owners = parts.index.to_numpy()
+    values = parts.tolist()
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else []
+    ends = list(starts[1:]) + [len(values)]
+    mpns = [[] for _ in range(n)]
+    for start, end in zip(starts, ends):
+        mpns[owners[start]] = values[start:end]
+
+    if manu_col and manu_col in df.columns:
+        raw = df[manu_col]
+        text = raw.astype(str).str.strip()
+        keep = raw.notna() & raw.astype(bool) & (text != "")
+        manufacturers = text.astype(object).where(keep, None).tolist()
+    else:
+        manufacturers = [None] * n
+
+    if qty_col and qty_col in df.columns:
+        qty = pd.to_numeric(df[qty_col], errors="coerce").astype(float)
+        qty = np.trunc(qty.where(np.isfinite(qty), 0).fillna(0)).astype(np.int64)
+        quantities = qty.where(qty != 0, 1).tolist()
+    else:
+        quantities = [1] * n
+
+    if ref_col and ref_col in df.columns:
+        ref = df[ref_col].astype(object)
+        references = ref.where(ref.notna(), None).tolist()
+    else:
+        references = [None] * n
+
+    return [
+        {
+            "row_index": idx,
+            "mpns": m,
+            "manufacturer": manuf,
+            "quantity": qty_val,
+            "reference": ref_val,
+        }
+        for idx, m, manuf, qty_val, ref_val in zip(
+            df.index.astype(int).tolist(), mpns, manufacturers, quantities, references
+        )
+    ]
+
+
+def iter_stream_rows(file_content, mpn_col, manu_col=None, qty_col=None, ref_col=None, max_chunk=256):
+    """
+    Lazy ``build_stream_rows`` straight from the workbook – no DataFrame of
+    the whole sheet.  The header is detected like ``clean_excel_file`` and
+    ``row_index`` matches its index; rows are built in chunks that grow from
+    1 to *max_chunk*, so the first row comes out as soon as it is read.
+
+    The header is read (and the mapping checked) right away; the data rows
+    only as the returned iterator is consumed.
+
+    Args:
+        file_content (bytes | str | PathLike | file): The Excel file
+        mpn_col, manu_col, qty_col, ref_col (str | None): Mapped column names
+
+    Returns:
+        Iterator[dict]: the rows ``build_stream_rows`` returns, in sheet order
+
+    Raises:
+        ValueError: if *mpn_col* is not in the detected header
+    """
+    rows = iter_sheet_rows(file_content)
+    try:
+        head = [_convert_row(row) for row in islice(rows, HEADER_SCAN_ROWS)]
+        best_row, best_score = _detect_header(head)
+        if len(head) <= best_row:
+            raise ValueError("No header row found in the sheet")
+        logger.info(f"Selected header row {best_row} with score {best_score}")
+
+        # like clean_excel_file: blank header cells become "nan", duplicates keep the last
+        positions = {str(name): i for i, name in enumerate(head[best_row])}
+        if mpn_col not in positions:
+            raise ValueError(f"Column '{mpn_col}' not found in the sheet header")
+    except BaseException:
+        rows.close()
+        raise
+    wanted = dict.fromkeys(c for c in (mpn_col, manu_col, qty_col, ref_col) if c)
+    picked = [(name, positions.get(name)) for name in wanted]
+    data = chain(head[best_row + 1:], (_convert_row(row) for row in rows))
+    return _stream_row_chunks(data, rows, picked, (mpn_col, manu_col, qty_col, ref_col), max_chunk)
+
+
+def _stream_row_chunks(data, source, picked, columns, max_chunk):
+    """``iter_stream_rows``' generator: build rows chunk by chunk, close *source* when done."""
+    try:
+        index, size = 0, 1
+        while True:
+            chunk = list(islice(data, size))
+            if not chunk:
+                return
+            frame = {
+                name: [row[pos] if pos is not None and pos < len(row) else np.nan for row in chunk]
+                for name, pos in picked
+            }
+            df = pd.DataFrame(frame, index=range(index, index + len(chunk)), dtype=object)
+            yield from build_stream_rows(df, *columns)
+            index += len(chunk)
+            size = min(size * 2, max_chunk)
+    finally:
+        source.close()
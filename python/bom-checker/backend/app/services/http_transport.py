@@ -0,0 +1,242 @@
+"""
+Shared HTTP transport for the vendor API clients.
+
+One pooled, keep-alive ``requests.Session`` per vendor so look-ups reuse
+TCP + TLS connections.  Every attempt:
+
+    • waits for a token from the vendor's rate-limit bucket
+    • uses (connect, read) timeouts from settings
+    • is retried on connection errors, 429 and 5xx with jittered
+      exponential back-off, honouring ``Retry-After`` when the vendor sends it
+    • is skipped once the current job is cancelled – checked before each
+      attempt, while waiting for a rate-limit token and during back-off
+
+``AsyncVendorTransport`` applies the same policy on an asyncio loop through
+httpx.  Without httpx installed it runs the pooled sync transport in a
+worker thread instead.
+
+Pool size, timeouts and retry policy come from ``HTTP_*`` settings and can be
+overridden per vendor (``DIGIKEY_HTTP_POOL_SIZE``, ``MOUSER_HTTP_READ_TIMEOUT``…).
+"""
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.config import settings
+from services import cancellation
+from services.cancellation import LookupCancelled, cancel_metrics
+from services.rate_limit import rate_limiter
+
+try:
+    import httpx
+except ImportError:  # optional – async engine falls back to threads
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+RATE_WAIT_SLICE = 0.5  # max seconds blocked on the bucket between cancel checks
+
+# Errors callers may treat as "vendor unreachable" (for stale-cache fallback).
+TRANSPORT_ERRORS: tuple = (requests.RequestException,) + (
+    (httpx.HTTPError,) if httpx is not None else ()
+)
+
+
+def _vendor_setting(vendor: str, name: str) -> Any:
+    """``<VENDOR>_<name>`` from the environment / settings, else the global ``<name>``."""
+    default = getattr(settings, name)
+    key = f"{vendor.upper()}_{name}"
+    raw = os.getenv(key)
+    if raw:
+        return type(default)(raw)
+    return getattr(settings, key, default)
+
+
+def _checkpoint() -> None:
+    """Raise ``LookupCancelled`` (and count the avoided call) if the job was cancelled."""
+    try:
+        cancellation.check_cancelled()
+    except LookupCancelled:
+        cancel_metrics.count("requests_avoided")
+        raise
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+class VendorTransport:
+    """Pooled session + retry policy for a single vendor."""
+
+    def __init__(self, vendor: str) -> None:
+        self.vendor = vendor
+        self.pool_size = int(_vendor_setting(vendor, "HTTP_POOL_SIZE"))
+        self.timeout = (
+            float(_vendor_setting(vendor, "HTTP_CONNECT_TIMEOUT")),
+            float(_vendor_setting(vendor, "HTTP_READ_TIMEOUT")),
+        )
+        self.max_retries = int(_vendor_setting(vendor, "HTTP_MAX_RETRIES"))
+        self.backoff_base = float(_vendor_setting(vendor, "HTTP_BACKOFF_BASE"))
+        self.backoff_max = float(_vendor_setting(vendor, "HTTP_BACKOFF_MAX"))
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.pool_size,
+                    pool_maxsize=self.pool_size,
+                    max_retries=0,  # retries are handled below, with back-off
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry *attempt* (0-based): Retry-After, else full jitter."""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send with rate limiting and retries; the last response / error wins."""
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            _checkpoint()
+            while not rate_limiter.acquire(self.vendor, timeout=RATE_WAIT_SLICE):
+                _checkpoint()
+            try:
+                r = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(
+                    "[%s] %s %s failed (%s) – retry %d in %.2fs",
+                    self.vendor, method, url, exc, attempt + 1, delay,
+                )
+            else:
+                if r.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return r
+                delay = self.backoff(attempt, parse_retry_after(r.headers.get("Retry-After")))
+                logger.warning(
+                    "[%s] %s %s returned %s – retry %d in %.2fs",
+                    self.vendor, method, url, r.status_code, attempt + 1, delay,
+                )
+                r.close()
+            cancellation.sleep(delay)
+            attempt += 1
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+class AsyncVendorTransport:
+    """asyncio counterpart of ``VendorTransport``; bind one per event loop."""
+
+    def __init__(self, sync: VendorTransport) -> None:
+        self.sync = sync
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            connect, read = self.sync.timeout
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read, connect=connect),
+                limits=httpx.Limits(
+                    max_connections=self.sync.pool_size,
+                    max_keepalive_connections=self.sync.pool_size,
+                ),
+            )
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs: Any):
+        if httpx is None:
+            return await asyncio.to_thread(self.sync.request, method, url, **kwargs)
+
+        vendor = self.sync.vendor
+        attempt = 0
+        while True:
+            _checkpoint()  # the engine also cancels the task outright
+            await rate_limiter.acquire_async(vendor)
+            try:
+                r = await self._get_client().request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                if attempt >= self.sync.max_retries:
+                    raise
+                delay = self.sync.backoff(attempt)
+                logger.warning(
+                    "[%s] %s %s failed (%s) – retry %d in %.2fs",
+                    vendor, method, url, exc, attempt + 1, delay,
+                )
+            else:
+                if r.status_code not in RETRY_STATUSES or attempt >= self.sync.max_retries:
+                    return r
+                delay = self.sync.backoff(
+                    attempt, parse_retry_after(r.headers.get("Retry-After"))
+                )
+                logger.warning(
+                    "[%s] %s %s returned %s – retry %d in %.2fs",
+                    vendor, method, url, r.status_code, attempt + 1, delay,
+                )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get(self, url: str, **kwargs: Any):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any):
+        return await self.request("POST", url, **kwargs)
+
+
+_transports: Dict[str, VendorTransport] = {}
+_async_transports: Dict[str, AsyncVendorTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(vendor: str) -> VendorTransport:
+    """Process-wide transport for *vendor* (created on first use)."""
+    with _transports_lock:
+        if vendor not in _transports:
+            _transports[vendor] = VendorTransport(vendor)
+        return _transports[vendor]
+
+
+def get_async_transport(vendor: str) -> AsyncVendorTransport:
+    """Async transport for *vendor*; only use it from the async engine's loop."""
+    sync = get_transport(vendor)
+    with _transports_lock:
+        if vendor not in _async_transports:
+            _async_transports[vendor] = AsyncVendorTransport(sync)
+        return _async_transports[vendor]
@@ -0,0 +1,393 @@
+"""
+Durable BOM look-up jobs.
+
+A look-up runs as a *job*: a background thread drives the scheduler (or the
+async engine) and appends every NDJSON event – ``ready``, row events,
+``progress``, ``complete`` – to an append-only SQLite log, numbered from 0.
+HTTP streams are only readers of that log, so a client can detach at any
+time (the look-ups keep going), re-attach from the last offset it saw, or
+replay a finished job instantly without a single vendor call.
+
+Each job owns a ``CancelToken`` bound for its whole run.  It fires on
+``cancel()`` (the cancel endpoint), when the job's ``JOB_DEADLINE`` passes,
+or – for jobs started by a stream endpoint – once no client has been
+attached for ``JOB_DETACH_GRACE`` seconds.  A cancelled job logs a final
+``cancelled`` event instead of ``complete``.
+
+The runner heart-beats (refreshes ``updated``) a few times per
+``JOB_STALE_AFTER`` even while no event is logged – rows waiting on quota
+or Retry-After, a slow pipelined sheet.  Jobs whose runner stopped
+heart-beating for ``JOB_STALE_AFTER`` seconds (e.g. the server restarted)
+are reported as ``interrupted``; finished jobs are purged after ``JOB_TTL``.
+
+Exports a singleton: job_manager
+"""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sized, Tuple, Union
+
+from core.config import settings
+from services.async_engine import async_engine
+from services.cancellation import CancelToken, LookupCancelled, bind, cancel_metrics
+from services.event_encoding import encode_payload, loads, pack_payload
+from services.lookup_scheduler import lookup_scheduler
+from services.row_pipeline import RowPipeline
+from services.singleflight import singleflight
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, Dict[str, Any]]
+
+RUNNING, COMPLETE, FAILED, CANCELLED, INTERRUPTED = (
+    "running", "complete", "failed", "cancelled", "interrupted"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id   TEXT PRIMARY KEY,
+    source   TEXT NOT NULL,
+    status   TEXT NOT NULL,
+    total    INTEGER NOT NULL,
+    error    TEXT,
+    created  REAL NOT NULL,
+    updated  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id   TEXT NOT NULL,
+    seq      INTEGER NOT NULL,
+    event    TEXT NOT NULL,
+    payload  TEXT NOT NULL,
+    packed   BLOB,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+# ----------------------------------------------------------------- events #
+def progress_payload(total: int, found: int, not_found: int) -> Dict[str, Any]:
+    processed = found + not_found
+    return {
+        "total": total,
+        "processed": processed,
+        "found": found,
+        "not_found": not_found,
+        "percent_complete": round(processed / total * 100, 1) if total else 0,
+    }
+
+
+def lookup_events(
+    rows: Sized, search_fn, svc: str, async_fn=None, batch_fn=None
+) -> Iterator[Event]:
+    """
+    Row events interleaved with ``progress``, closed by ``complete`` (or
+    ``cancelled``).  A *batch_fn* takes precedence on the threads engine.
+
+    ``progress`` follows the first event, then at most every
+    ``STREAM_PROGRESS_INTERVAL`` seconds or ``STREAM_PROGRESS_EVERY`` events,
+    and always right before the closing event.  *rows* may be a
+    ``RowPipeline``: its total grows as the sheet is read.
+    """
+    use_async = async_fn is not None and settings.LOOKUP_ENGINE == "async"
+    logger.info(
+        "[%s] Stream starting with %s rows (%s engine)",
+        svc,
+        "pipelined" if isinstance(rows, RowPipeline) else len(rows),
+        "async" if use_async else "threads",
+    )
+    if use_async:
+        events = async_engine.run(rows, async_fn, svc)
+    elif batch_fn is not None:
+        events = lookup_scheduler.run_batched(rows, batch_fn, svc)
+    else:
+        events = lookup_scheduler.run(rows, search_fn, svc)
+    found = not_found = unsent = 0
+    last_sent = float("-inf")
+    try:
+        for event, payload in events:
+            yield event, payload
+            if event == "found":
+                found += 1
+            elif event == "not_found":
+                not_found += 1
+            unsent += 1
+            now = time.monotonic()
+            if (
+                unsent >= settings.STREAM_PROGRESS_EVERY
+                or now - last_sent >= settings.STREAM_PROGRESS_INTERVAL
+            ):
+                yield "progress", progress_payload(len(rows), found, not_found)
+                unsent, last_sent = 0, now
+    except LookupCancelled as exc:
+        if unsent:
+            yield "progress", progress_payload(len(rows), found, not_found)
+        skipped = len(rows) - found - not_found
+        cancel_metrics.count("rows_skipped", skipped)
+        logger.info("[%s] Stream cancelled (%s) – %d rows skipped", svc, exc.reason, skipped)
+        yield "cancelled", {
+            **progress_payload(len(rows), found, not_found),
+            "source": svc,
+            "reason": exc.reason,
+        }
+        return
+
+    if unsent:
+        yield "progress", progress_payload(len(rows), found, not_found)
+    yield "complete", {
+        **progress_payload(len(rows), found, not_found),
+        "source": svc,
+        "percent_found": round(found / len(rows) * 100, 1) if len(rows) else 0,
+    }
+    logger.info("[%s] Stream completed", svc)
+
+
+# ------------------------------------------------------------------- jobs #
+class _JobManager:
+    POLL_INTERVAL = 1.0  # followers re-check the log at least this often
+    HEARTBEATS = 3       # runner heart-beats per JOB_STALE_AFTER
+
+    def __init__(self, path: Optional[Union[str, Path]] = None) -> None:
+        self.path = Path(path) if path else settings.CACHE_DIR / "jobs.sqlite3"
+        self._local = threading.local()
+        self._changed = threading.Condition()
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, CancelToken] = {}  # jobs running in this process
+        self._followers: Dict[str, int] = {}
+        self._auto_cancel: set = set()
+
+    # ------------------------------------------------------------ sqlite ---- #
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "path", None) != self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(job_events)")}
+            if "packed" not in columns:  # a log written before the column existed
+                try:
+                    conn.execute("ALTER TABLE job_events ADD COLUMN packed BLOB")
+                except sqlite3.OperationalError:  # another thread added it first
+                    pass
+            self._local.conn, self._local.path = conn, self.path
+        return conn
+
+    def _notify(self) -> None:
+        with self._changed:
+            self._changed.notify_all()
+
+    # ----------------------------------------------------------- writing ---- #
+    def start(
+        self,
+        source: str,
+        total: int,
+        events: Callable[[], Iterable[Event]],
+        cancel_on_detach: bool = False,
+    ) -> str:
+        """
+        Create a job and run *events()* into its log on a background thread.
+        With *cancel_on_detach* the job is cancelled once nobody follows it.
+        """
+        self.gc()
+        job_id = uuid.uuid4().hex
+        token = CancelToken(deadline=settings.JOB_DEADLINE)
+        with self._lock:
+            self._tokens[job_id] = token
+            if cancel_on_detach:
+                self._auto_cancel.add(job_id)
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs VALUES (?, ?, ?, ?, NULL, ?, ?)",
+            (job_id, source, RUNNING, total, now, now),
+        )
+        self._append(job_id, 0, "ready", {"job_id": job_id})
+        threading.Thread(
+            target=self._run, args=(job_id, events, token), name=f"job-{job_id[:8]}", daemon=True
+        ).start()
+        if cancel_on_detach:
+            self._schedule_reap(job_id)  # in case no client ever attaches
+        return job_id
+
+    def cancel(self, job_id: str, reason: str = "cancelled by client") -> bool:
+        """Fire the job's cancel token; False if it is not running in this process."""
+        with self._lock:
+            token = self._tokens.get(job_id)
+        return token is not None and token.cancel(reason)
+
+    def _append(self, job_id: str, seq: int, event: str, payload: Dict[str, Any]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.execute(
+            "INSERT INTO job_events VALUES (?, ?, ?, ?, ?)",
+            (job_id, seq, event, encode_payload(payload), pack_payload(payload)),
+        )
+        if event == "progress":  # a pipelined job's total grows while its rows are read
+            conn.execute(
+                "UPDATE jobs SET updated=?, total=? WHERE job_id=?",
+                (time.time(), payload["total"], job_id),
+            )
+        else:
+            conn.execute("UPDATE jobs SET updated=? WHERE job_id=?", (time.time(), job_id))
+        conn.execute("COMMIT")
+        self._notify()
+
+    def _finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status=?, error=?, updated=? WHERE job_id=?",
+            (status, error, time.time(), job_id),
+        )
+        self._notify()
+
+    def _run(self, job_id: str, events: Callable[[], Iterable[Event]], token: CancelToken) -> None:
+        seq = 1
+        alive = threading.Event()
+        threading.Thread(
+            target=self._heartbeat, args=(job_id, alive), name=f"job-{job_id[:8]}-hb", daemon=True
+        ).start()
+        try:
+            with bind(token), singleflight.scope():  # one call per repeated part
+                for event, payload in events():
+                    self._append(job_id, seq, event, payload)
+                    seq += 1
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("Job %s failed", job_id)
+            self._append(job_id, seq, "error", {"error": str(exc)})
+            self._finish(job_id, FAILED, str(exc))
+        else:
+            self._finish(job_id, CANCELLED if token.cancelled else COMPLETE, token.reason)
+        finally:
+            alive.set()
+            token.close()
+            with self._lock:
+                self._tokens.pop(job_id, None)
+                self._auto_cancel.discard(job_id)
+            if token.cancelled:
+                cancel_metrics.count("jobs_cancelled")
+
+    def _heartbeat(self, job_id: str, stop: threading.Event) -> None:
+        """Refresh the job's ``updated`` until *stop* is set (the runner ended)."""
+        interval = max(settings.JOB_STALE_AFTER / self.HEARTBEATS, 0.05)
+        while not stop.wait(interval):
+            try:
+                self._conn().execute(
+                    "UPDATE jobs SET updated=? WHERE job_id=?", (time.time(), job_id)
+                )
+            except sqlite3.Error:
+                logger.exception("Heartbeat for job %s failed", job_id)
+
+    # --------------------------------------------------------- followers ---- #
+    def _schedule_reap(self, job_id: str) -> None:
+        timer = threading.Timer(settings.JOB_DETACH_GRACE, self._reap, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _reap(self, job_id: str) -> None:
+        with self._lock:
+            orphaned = job_id in self._auto_cancel and not self._followers.get(job_id)
+        if orphaned:
+            self.cancel(job_id, "client disconnected")
+
+    # ----------------------------------------------------------- reading ---- #
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Job status (``interrupted`` once a running job stops heart-beating –
+        never while its runner is alive in this process).
+        """
+        row = self._conn().execute(
+            "SELECT j.job_id, j.source, j.status, j.total, j.error, j.created, j.updated, "
+            "(SELECT COUNT(*) FROM job_events e WHERE e.job_id = j.job_id) "
+            "FROM jobs j WHERE j.job_id=?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(
+            zip(("job_id", "source", "status", "total", "error", "created", "updated", "events"), row)
+        )
+        if job["status"] == RUNNING and time.time() - job["updated"] > settings.JOB_STALE_AFTER:
+            with self._lock:
+                live = job_id in self._tokens
+            if not live:
+                job["status"] = INTERRUPTED
+        return job
+
+    def events(
+        self, job_id: str, offset: int = 0, limit: int = 500, raw: bool = False, packed: bool = False
+    ) -> List[Tuple[int, str, Any]]:
+        """
+        Logged ``(seq, event, payload)`` from *offset* on – payload as JSON
+        text with *raw*, as its MessagePack bytes (where logged) with *packed*.
+        """
+        column = "COALESCE(packed, payload)" if packed else "payload"
+        rows = self._conn().execute(
+            f"SELECT seq, event, {column} FROM job_events WHERE job_id=? AND seq>=? "
+            "ORDER BY seq LIMIT ?",
+            (job_id, offset, limit),
+        ).fetchall()
+        if raw or packed:
+            return rows
+        return [(seq, event, loads(payload)) for seq, event, payload in rows]
+
+    def follow(self, job_id: str, offset: int = 0) -> Iterator[Tuple[int, str, Dict]]:
+        """Replay the log from *offset*, then tail it until the job ends."""
+        batches = self.follow_batches(job_id, offset)
+        try:
+            for batch in batches:
+                yield from batch
+        finally:
+            batches.close()
+
+    def follow_batches(
+        self, job_id: str, offset: int = 0, raw: bool = False, packed: bool = False
+    ) -> Iterator[List[Tuple[int, str, Any]]]:
+        """``follow``, one list per read of the log – everything logged so far."""
+        with self._lock:
+            self._followers[job_id] = self._followers.get(job_id, 0) + 1
+        try:
+            while True:
+                job = self.get(job_id)  # read status *before* the log, so no tail is lost
+                batch = self.events(job_id, offset, raw=raw, packed=packed)
+                if batch:
+                    yield batch
+                    offset = batch[-1][0] + 1
+                    continue
+                if job is None or job["status"] != RUNNING:
+                    return
+                with self._changed:
+                    self._changed.wait(self.POLL_INTERVAL)
+        finally:  # also runs on GeneratorExit when the client disconnects
+            with self._lock:
+                left = self._followers[job_id] = self._followers[job_id] - 1
+                if not left:
+                    del self._followers[job_id]
+                watch = not left and job_id in self._auto_cancel
+            if watch:
+                self._schedule_reap(job_id)
+
+    # ------------------------------------------------------------ upkeep ---- #
+    def gc(self) -> int:
+        """Purge finished (or abandoned) jobs older than ``JOB_TTL``."""
+        cutoff = time.time() - settings.JOB_TTL
+        conn = self._conn()
+        doomed = [
+            job_id
+            for (job_id,) in conn.execute("SELECT job_id FROM jobs WHERE updated < ?", (cutoff,))
+        ]
+        for job_id in doomed:
+            conn.execute("DELETE FROM job_events WHERE job_id=?", (job_id,))
+            conn.execute("DELETE FROM jobs WHERE job_id=?", (job_id,))
+        return len(doomed)
+
+    def stats(self) -> Dict[str, int]:
+        counts = dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return {s: counts.get(s, 0) for s in (RUNNING, COMPLETE, FAILED, CANCELLED)}
+
+
+# --------------------------------------------------------------- singleton #
+job_manager = _JobManager()
@@ -0,0 +1,288 @@
+"""
+Concurrent per-row lookup scheduler for the streaming endpoints.
+
+Each vendor owns a bounded thread pool (``<VENDOR>_MAX_CONCURRENCY``
+workers).  A stream keeps at most that many of its rows in flight and tops
+the window up as rows finish, so several concurrent streams share a vendor's
+workers fairly and a long BOM never floods the pool queue.  Events are
+forwarded the moment a row handler yields them; per-call quotas are enforced
+separately by ``services.rate_limit``.  Rows are pulled on a feeder thread,
+so a row source that blocks – a ``RowPipeline`` still reading the sheet –
+never holds back finished events or a cancel.
+
+``run_batched`` does the same for vendors with a multi-part search: pending
+rows are grouped ``<VENDOR>_BATCH_SIZE`` at a time and each group goes to a
+batch handler, which answers with the usual per-row events.
+
+``alternates`` serves a row handler's alternate MPNs in BOM order.  With
+``LOOKUP_ALTERNATES=parallel`` every alternate is looked up at once on a
+side pool and the handler still walks the answers in BOM order, so the
+chosen part is the same as in sequential mode – only the latency changes.
+
+A row handler may also yield ``(event, future)`` with a future from
+``defer()``: the row's worker is released right away and ``event`` is
+streamed once the future resolves (skipped if it resolves to None) – used
+for work that should stay off a row's critical path, such as substitutes.
+
+Workers run in a copy of the caller's context, so the job's cancel token
+(``services.cancellation``) is visible to row handlers and the transport.
+Once it fires no further rows are started and ``run`` raises
+``LookupCancelled``.
+
+Exports a singleton: lookup_scheduler
+"""
+from __future__ import annotations
+
+import contextvars
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Queue
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from core.config import settings
+from services.cancellation import LookupCancelled, current_token
+
+logger = logging.getLogger(__name__)
+
+Event = Tuple[str, Dict[str, Any]]
+RowHandler = Callable[[Dict[str, Any]], Iterable[Event]]
+BatchHandler = Callable[[List[Dict[str, Any]]], Iterable[Event]]
+
+_ROW_DONE = object()  # sentinel: one row handler has finished
+_CANCELLED = object()  # sentinel: the job's cancel token fired
+_NO_ROW = object()  # sentinel: the rows are exhausted
+
+
+class _Fetched(NamedTuple):
+    """The feeder pulled the next row (``_NO_ROW`` at the end) or failed to."""
+
+    row: Any
+    error: Optional[BaseException] = None
+
+
+class _Resolved(NamedTuple):
+    """A deferred event's future has finished."""
+
+    event: str
+    future: Future
+
+
+def error_event(row: Dict[str, Any], exc: BaseException, vendor: str) -> Event:
+    """The ``error`` event streamed when a row handler raises."""
+    mpns = row.get("mpns") or ["Unknown"]
+    return "error", {"mpn": mpns[0], "error": str(exc), "source": vendor}
+
+
+class _LookupScheduler:
+    def __init__(self) -> None:
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------- config ---- #
+    @staticmethod
+    def concurrency(vendor: str) -> int:
+        """Worker count for *vendor* (falls back to LOOKUP_DEFAULT_CONCURRENCY)."""
+        value = getattr(
+            settings,
+            f"{vendor.upper()}_MAX_CONCURRENCY",
+            settings.LOOKUP_DEFAULT_CONCURRENCY,
+        )
+        return max(int(value), 1)
+
+    @staticmethod
+    def batch_size(vendor: str) -> int:
+        """Rows per batch for *vendor* (1 when it has no ``<VENDOR>_BATCH_SIZE``)."""
+        return max(int(getattr(settings, f"{vendor.upper()}_BATCH_SIZE", 1)), 1)
+
+    @staticmethod
+    def parallel_alternates(vendor: str) -> bool:
+        """True when *vendor* looks up a row's alternate MPNs all at once."""
+        mode = getattr(settings, f"{vendor.upper()}_ALTERNATES", settings.LOOKUP_ALTERNATES)
+        return str(mode).lower() == "parallel"
+
+    def _pool(self, vendor: str, kind: str = "") -> ThreadPoolExecutor:
+        name = f"{vendor}-{kind}" if kind else vendor
+        with self._lock:
+            if name not in self._pools:
+                self._pools[name] = ThreadPoolExecutor(
+                    max_workers=self.concurrency(vendor),
+                    thread_name_prefix=f"lookup-{name.lower()}",
+                )
+            return self._pools[name]
+
+    def defer(self, vendor: str, fn: Callable[..., Any], *args: Any) -> Future:
+        """Run ``fn(*args)`` on *vendor*'s side pool; yield ``(event, future)`` to stream it."""
+        return self._pool(vendor, "deferred").submit(contextvars.copy_context().run, fn, *args)
+
+    def alternates(
+        self, vendor: str, lookup: Callable[[str], Any], mpns: Sequence[str]
+    ) -> Iterator[Tuple[str, Callable[[], Any]]]:
+        """
+        ``(mpn, answer)`` pairs in BOM order; ``answer()`` returns (or raises)
+        ``lookup(mpn)``.  In parallel mode all look-ups are already running –
+        on their own pool, since the caller occupies a row worker – and those
+        not yet started are dropped once the caller stops iterating.
+        """
+        if len(mpns) < 2 or not self.parallel_alternates(vendor):
+            for mpn in mpns:
+                yield mpn, lambda mpn=mpn: lookup(mpn)
+            return
+        pool = self._pool(vendor, "alternates")
+        futures = [pool.submit(contextvars.copy_context().run, lookup, mpn) for mpn in mpns]
+        try:
+            for mpn, future in zip(mpns, futures):
+                yield mpn, future.result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def collect(
+        self, vendor: str, handler: RowHandler, row: Dict[str, Any]
+    ) -> "Future[List[Event]]":
+        """Run one row on *vendor*'s pool; the future holds all of its events."""
+
+        def task() -> List[Event]:
+            try:
+                return list(handler(row))
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("[%s] row handler failed", vendor)
+                return [error_event(row, exc, vendor)]
+
+        return self._pool(vendor).submit(contextvars.copy_context().run, task)
+
+    # -------------------------------------------------------------- run ---- #
+    def run(
+        self, rows: Iterable[Dict[str, Any]], handler: RowHandler, vendor: str
+    ) -> Iterator[Event]:
+        """
+        Run *handler* over *rows* on *vendor*'s pool, yielding every
+        ``(event, payload)`` in completion order.  *rows* is consumed lazily.
+        """
+        pool = self._pool(vendor)
+        window = self.concurrency(vendor)
+        out: Queue = Queue()
+        wanted: Queue = Queue()  # one item per row the window has room for; None stops the feeder
+        pending = iter(rows)
+        in_flight = deferred = fetching = 0
+        exhausted = False
+        token = current_token()
+        if token is not None:
+            token.raise_if_cancelled()
+            token.on_cancel(lambda: out.put(_CANCELLED))
+
+        def feed() -> None:
+            try:
+                while wanted.get() is not None:
+                    try:
+                        row = next(pending, _NO_ROW)
+                    except BaseException as exc:  # noqa: BLE001 - re-raised by run()
+                        out.put(_Fetched(_NO_ROW, exc))
+                        return
+                    out.put(_Fetched(row))
+                    if row is _NO_ROW:
+                        return
+            finally:
+                close = getattr(pending, "close", None)
+                if close is not None:
+                    close()  # e.g. stop a RowPipeline's reader
+
+        def task(row: Dict[str, Any]) -> None:
+            try:
+                if token is not None and token.cancelled:
+                    return  # queued before the cancel – skip the row
+                for event in handler(row):
+                    out.put(event)
+            except LookupCancelled:
+                pass  # stopped at a checkpoint; run() reports the cancellation
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("[%s] row handler failed", vendor)
+                out.put(error_event(row, exc, vendor))
+            finally:
+                out.put(_ROW_DONE)
+
+        def fetch_next() -> None:
+            nonlocal fetching
+            if not exhausted and (token is None or not token.cancelled):
+                wanted.put(True)
+                fetching += 1
+
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(feed,),
+            name=f"lookup-{vendor.lower()}-rows",
+            daemon=True,
+        ).start()
+        try:
+            for _ in range(window):
+                fetch_next()
+            while in_flight or deferred or fetching:
+                item = out.get()
+                if item is _CANCELLED:
+                    raise LookupCancelled(token.reason)
+                if item is _ROW_DONE:
+                    in_flight -= 1
+                    fetch_next()
+                    continue
+                if isinstance(item, _Fetched):
+                    fetching -= 1
+                    if item.error is not None:
+                        raise item.error
+                    if item.row is _NO_ROW:
+                        exhausted, fetching = True, 0  # the feeder has stopped
+                    elif token is None or not token.cancelled:
+                        pool.submit(contextvars.copy_context().run, task, item.row)
+                        in_flight += 1
+                    continue
+                if isinstance(item, _Resolved):
+                    deferred -= 1
+                    payload = self._deferred_result(item.future, vendor)
+                    if payload is not None:
+                        yield item.event, payload
+                    continue
+                event, payload = item
+                if isinstance(payload, Future):
+                    deferred += 1
+                    payload.add_done_callback(lambda f, event=event: out.put(_Resolved(event, f)))
+                    continue
+                yield item
+        finally:
+            wanted.put(None)  # the feeder stops after the row it may be waiting on
+
+        if token is not None and token.cancelled:
+            raise LookupCancelled(token.reason)  # fired while the last rows drained
+
+    @staticmethod
+    def _deferred_result(future: Future, vendor: str) -> Any:
+        if future.cancelled():
+            return None
+        try:
+            return future.result()
+        except LookupCancelled:
+            return None
+        except Exception:  # noqa: BLE001 – deferred events are best-effort extras
+            logger.exception("[%s] deferred look-up failed", vendor)
+            return None
+
+    def run_batched(
+        self, rows: Iterable[Dict[str, Any]], handler: BatchHandler, vendor: str
+    ) -> Iterator[Event]:
+        """``run`` over groups of ``batch_size(vendor)`` rows, still consumed lazily."""
+        size = self.batch_size(vendor)
+        pending = iter(rows)
+        batches = iter(lambda: list(itertools.islice(pending, size)), [])
+
+        def batch_task(batch: List[Dict[str, Any]]) -> Iterator[Event]:
+            try:
+                yield from handler(batch)
+            except Exception as exc:  # noqa: BLE001 – one error event per row
+                logger.exception("[%s] batch handler failed", vendor)
+                for row in batch:
+                    yield error_event(row, exc, vendor)
+
+        return self.run(batches, batch_task, vendor)
+
+
+# --------------------------------------------------------------- singleton #
+lookup_scheduler = _LookupScheduler()
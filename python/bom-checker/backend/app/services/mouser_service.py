@@ -3,25 +3,59 @@ Mouser API client – **patched 2025-04-26**
   • robust Availability parsing (handles 'None', '', etc.)
   • exceptions inside row_handler no longer kill the worker thread
 
+Mouser API client – asyncio twins (lookup_part_async / row_handler_async)
+  • used by services.async_engine when LOOKUP_ENGINE=async
+
 Mouser API client – **extended 2025-05-14**
   • keeps prior behaviour / helpers untouched
   • adds three fields:
         · minimum_order_quantity
         · lead_time_weeks
         · product_status
+
+Mouser API client – batched part-number search
+  • search_by_part_numbers / lookup_parts pack up to MOUSER_BATCH_SIZE MPNs
+    ("A|B|C") into one quota-counted request
+  • batch_row_handler answers a group of BOM rows, used by
+    lookup_scheduler.run_batched for the Mouser stream
+  • MOUSER_ALTERNATES=parallel fetches all alternates of a row (or batch)
+    up front – in one part-number search where possible – and keeps the
+    sequential pick
+  • every look-up – lookup_part(_async), lookup_parts, so every engine,
+    mode, the combined stream and the prefetch – uses the same exact
+    part-number search, so a part-cache entry means the same thing whichever
+    path filled it.  search_by_keyword stays for ad-hoc searches.
 """
 from __future__ import annotations
 
+import asyncio
+import functools
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
-import requests
+from core.config import settings
+from core.logging import SampledDebug
+from services.async_engine import async_engine
+from services.cancellation import LookupCancelled, check_cancelled
+from services.http_transport import TRANSPORT_ERRORS, get_async_transport, get_transport
+from services.lookup_scheduler import lookup_scheduler
+from services.part_cache import part_cache
+from services.singleflight import flight_key, singleflight
 
 logger = logging.getLogger(__name__)
+# per-part records: LOG_LEVELS=services.mouser_service.parts=DEBUG
+_trace_part = SampledDebug(logging.getLogger(f"{__name__}.parts"))
 
 
 # ───────────────────────────────────────────────────────── helpers ──
+def _unwrap(answer: Any) -> Any:
+    """Return a ``lookup_parts`` answer, raising it if it is an exception."""
+    if isinstance(answer, Exception):
+        raise answer
+    return answer
+
+
 def _safe_int(val: str | int | None, default: int = 0) -> int:
     """Cast *val* to int; on failure return *default*."""
     try:
@@ -44,9 +78,13 @@ def _parse_lead_weeks(raw: str | None) -> Optional[int]:
 class _MouserService:
     BASE = "https://api.mouser.com/api/v1"
     SEARCH_URL = f"{BASE}/search/keyword"
+    PART_SEARCH_URL = f"{BASE}/search/partnumber"
+    PART_NUMBER_LIMIT = 10  # part numbers Mouser accepts per request
 
     def __init__(self) -> None:
         self.api_key = os.getenv("MOUSER_API_KEY", "")
+        self._http = get_transport("Mouser")
+        self._ahttp = get_async_transport("Mouser")
         if not self.api_key:
             logger.warning("MOUSER_API_KEY env var missing – using mock data")
 
@@ -57,7 +95,17 @@ class _MouserService:
         if not self.api_key:
             return self._mock_search(mpn, manufacturer)
 
-        payload = {
+        r = self._http.post(
+            f"{self.SEARCH_URL}?apiKey={self.api_key}",
+            headers={"Content-Type": "application/json"},
+            json=self._keyword_payload(mpn),
+        )
+        r.raise_for_status()
+        return r.json()
+
+    @staticmethod
+    def _keyword_payload(mpn: str) -> Dict[str, Any]:
+        return {
             "SearchByKeywordRequest": {
                 "keyword": mpn,
                 "records": 10,
@@ -66,13 +114,55 @@ class _MouserService:
                 "searchWithYourSignUpLanguage": "false",
             }
         }
-        url = f"{self.SEARCH_URL}?apiKey={self.api_key}"
-        r = requests.post(
-            url, headers={"Content-Type": "application/json"}, json=payload
+
+    def search_by_part_numbers(self, mpns: Sequence[str]) -> Dict[str, Any]:
+        """One exact part-number search for up to ``PART_NUMBER_LIMIT`` MPNs."""
+        r = self._http.post(
+            f"{self.PART_SEARCH_URL}?apiKey={self.api_key}",
+            headers={"Content-Type": "application/json"},
+            json=self._part_number_payload(mpns),
+        )
+        r.raise_for_status()
+        return r.json()
+
+    async def search_by_part_numbers_async(self, mpns: Sequence[str]) -> Dict[str, Any]:
+        r = await self._ahttp.post(
+            f"{self.PART_SEARCH_URL}?apiKey={self.api_key}",
+            headers={"Content-Type": "application/json"},
+            json=self._part_number_payload(mpns),
         )
         r.raise_for_status()
         return r.json()
 
+    def _part_number_payload(self, mpns: Sequence[str]) -> Dict[str, Any]:
+        if len(mpns) > self.PART_NUMBER_LIMIT:
+            raise ValueError(f"at most {self.PART_NUMBER_LIMIT} part numbers per request")
+        return {
+            "SearchByPartRequest": {
+                "mouserPartNumber": "|".join(mpns),
+                "partSearchOptions": "Exact",
+            }
+        }
+
+    def _split_batch(
+        self, raw: Dict[str, Any], mpns: Sequence[str]
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Map each requested MPN to its processed record (None when absent)."""
+        parts = (raw.get("SearchResults") or {}).get("Parts") or []
+        by_pn: Dict[str, Dict[str, Any]] = {}
+        for p in parts:
+            for field in ("ManufacturerPartNumber", "MouserPartNumber"):
+                key = str(p.get(field) or "").strip().upper()
+                if key:
+                    by_pn.setdefault(key, p)  # first hit wins, as in _format_first
+        out: Dict[str, Optional[Dict[str, Any]]] = {}
+        for mpn in mpns:
+            part = by_pn.get(mpn.strip().upper())
+            out[mpn] = (
+                {**self.process_product(part), "mpn": mpn, "source": "Mouser"} if part else None
+            )
+        return out
+
     # ─────────────────────────────────────────────────────── format ──
     def process_product(self, p: Dict[str, Any]) -> Dict[str, Any]:
         # stock qty (robust)
@@ -90,8 +180,6 @@ class _MouserService:
         ]
         price = price_breaks[0]["price"] if price_breaks else 0.0
 
-        print(p)
-
         # NEW additions
         moq = _safe_int(p.get("Min"))
         lead_weeks = _parse_lead_weeks(p.get("LeadTime"))
@@ -112,44 +200,189 @@ class _MouserService:
             "product_status": status,
         }
 
-        print(f'MOUSER RESULT: {result}')
-
+        _trace_part("Processed Mouser product %s → %s", p, result)
         return result
 
+    # ──────────────────────────────────────────────── cached lookup ──
+    def lookup_part(
+        self, mpn: str, manufacturer: str | None = None, refresh: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Processed record for the exact part-number match of *mpn*, or None.
+        Live results are cached in ``part_cache``; *refresh* skips the read.
+        Identical look-ups share one vendor call (``singleflight``).
+        """
+        if not self.api_key:
+            return self._format_first(self._mock_search(mpn, manufacturer), mpn)
+
+        entry = None if refresh else part_cache.get("Mouser", mpn, manufacturer)
+        if entry and entry.fresh:
+            return entry.record
+
+        def fetch() -> Optional[Dict[str, Any]]:
+            record = self._split_batch(self.search_by_part_numbers([mpn]), [mpn])[mpn]
+            part_cache.put("Mouser", mpn, manufacturer, record)
+            return record
+
+        try:
+            return singleflight.do(flight_key("Mouser", mpn, manufacturer), fetch)
+        except TRANSPORT_ERRORS:
+            if entry is None:
+                raise
+            logger.warning("[Mouser] lookup for %s failed – serving stale cache entry", mpn)
+            return entry.record
+
+    async def lookup_part_async(
+        self, mpn: str, manufacturer: str | None = None, refresh: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Async ``lookup_part`` – same cache, same stale fallback."""
+        if not self.api_key:
+            return self._format_first(self._mock_search(mpn, manufacturer), mpn)
+
+        # the cache is SQLite – keep its (possibly contended) I/O off the loop
+        entry = None
+        if not refresh:
+            entry = await asyncio.to_thread(part_cache.get, "Mouser", mpn, manufacturer)
+        if entry and entry.fresh:
+            return entry.record
+
+        async def fetch() -> Optional[Dict[str, Any]]:
+            raw = await self.search_by_part_numbers_async([mpn])
+            record = self._split_batch(raw, [mpn])[mpn]
+            await asyncio.to_thread(part_cache.put, "Mouser", mpn, manufacturer, record)
+            return record
+
+        try:
+            return await singleflight.do_async(flight_key("Mouser", mpn, manufacturer), fetch)
+        except TRANSPORT_ERRORS:
+            if entry is None:
+                raise
+            logger.warning("[Mouser] lookup for %s failed – serving stale cache entry", mpn)
+            return entry.record
+
+    def lookup_parts(
+        self, queries: Sequence[Tuple[str, Optional[str], bool]]
+    ) -> Dict[Tuple[str, Optional[str]], Any]:
+        """
+        ``lookup_part`` for many ``(mpn, manufacturer, refresh)`` queries.
+        Cache hits are served locally; the misses go out
+        ``MOUSER_BATCH_SIZE`` part numbers per request.  Each
+        ``(mpn, manufacturer)`` maps to a record, None (no hit) or the
+        exception that sank its request.  Keys this job already resolved
+        (``singleflight`` memo) are not sent again, and keys another call is
+        already fetching are waited for instead (``singleflight.claim``).
+        """
+        results: Dict[Tuple[str, Optional[str]], Any] = {}
+        stale: Dict[Tuple[str, Optional[str]], Any] = {}
+        misses: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+        leading: Dict[Tuple[str, Optional[str]], Tuple[Any, Any]] = {}
+        following: Dict[Tuple[str, Optional[str]], Tuple[Any, Any, bool]] = {}
+        for mpn, manufacturer, refresh in queries:
+            key = (mpn, manufacturer)
+            if key in results or key in stale:
+                continue
+            if not self.api_key:
+                results[key] = self._format_first(self._mock_search(mpn, manufacturer), mpn)
+                continue
+            fkey = flight_key("Mouser", mpn, manufacturer)
+            hit, record = singleflight.recall(fkey)
+            if hit:
+                results[key] = record
+                continue
+            entry = None if refresh else part_cache.get("Mouser", mpn, manufacturer)
+            if entry and entry.fresh:
+                results[key] = entry.record
+                continue
+            stale[key] = entry
+            leader, flight = singleflight.claim(fkey)
+            if leader:
+                leading[key] = (fkey, flight)
+                misses.setdefault(mpn, []).append(key)
+            else:
+                following[key] = (fkey, flight, refresh)
+
+        size = min(max(settings.MOUSER_BATCH_SIZE, 1), self.PART_NUMBER_LIMIT)
+        wanted = list(misses)
+        try:
+            for start in range(0, len(wanted), size):
+                chunk = wanted[start:start + size]
+                check_cancelled()
+                try:
+                    found = self._split_batch(self.search_by_part_numbers(chunk), chunk)
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("[Mouser] batch lookup for %s failed: %s", "|".join(chunk), exc)
+                    for mpn in chunk:
+                        for key in misses[mpn]:
+                            singleflight.land(*leading.pop(key), error=exc)
+                            results[key] = self._stale_or(stale[key], exc)
+                    continue
+                for mpn in chunk:
+                    for key in misses[mpn]:
+                        record = dict(found[mpn]) if found[mpn] else None
+                        part_cache.put("Mouser", key[0], key[1], record)
+                        singleflight.land(*leading.pop(key), record)
+                        results[key] = record
+        finally:
+            for fkey, flight in leading.values():  # never sent: followers retry on their own
+                singleflight.land(fkey, flight, error=LookupCancelled("batch abandoned"))
+
+        for key, (fkey, flight, refresh) in following.items():
+            try:
+                shared, record = singleflight.wait(flight)
+                if shared:
+                    singleflight.remember(fkey, record)
+                else:  # its leader was cancelled
+                    record = self.lookup_part(key[0], key[1], refresh=refresh)
+            except Exception as exc:  # noqa: BLE001
+                results[key] = self._stale_or(stale[key], exc)
+                continue
+            results[key] = record
+        return results
+
+    @staticmethod
+    def _stale_or(entry: Any, exc: Exception) -> Any:
+        """The stale record for a failed transport call, else the exception itself."""
+        return entry.record if entry is not None and isinstance(exc, TRANSPORT_ERRORS) else exc
+
+    def _format_first(self, raw: Dict[str, Any], mpn: str) -> Optional[Dict[str, Any]]:
+        parts = (
+            raw.get("SearchResults", {}).get("Parts")
+            if "SearchResults" in raw
+            else raw.get("Parts")
+        ) or []
+        if not parts:
+            return None
+        payload = self.process_product(parts[0])
+        payload.update({"mpn": mpn, "source": "Mouser"})
+        return payload
+
     # ───────────────────────────────────────────── row handler (stream) ──
     def row_handler(self, row: Dict[str, Any]):
         """
-        Generator for one BOM line.  Behaviour unchanged.
+        Yield ('found' | 'not_found' | 'error', data) for one BOM line.
+        Alternates are tried in BOM order and the first in stock wins.  With
+        MOUSER_ALTERNATES "parallel" the whole row is one part-number batch
+        search (``lookup_parts``), which also fills the part cache; otherwise
+        each alternate is a cached ``lookup_part``.  Errors are reported per
+        alternate and the remaining ones still tried.
         """
         mpns: List[str] = row.get("mpns", [])
         manufacturer: Optional[str] = row.get("manufacturer")
+        refresh = bool(row.get("refresh"))
 
         if not mpns:
-            yield "not_found", {
-                "mpn": "Unknown",
-                "manufacturer": manufacturer,
-                "status": "No MPN in BOM row",
-                "source": "Mouser",
-            }
+            yield "not_found", self._no_mpn(manufacturer)
             return
 
         best_match: Optional[Dict[str, Any]] = None
 
-        for mpn in mpns:
+        for mpn, answer in self._alternates(mpns, manufacturer, refresh):
+            check_cancelled()
             try:
-                raw = self.search_by_keyword(mpn, manufacturer)
-                parts = (
-                    raw.get("SearchResults", {}).get("Parts")
-                    if "SearchResults" in raw
-                    else raw.get("Parts")
-                ) or []
-
-                if not parts:
+                payload = answer()
+                if not payload:
                     continue
 
-                payload = self.process_product(parts[0])
-                payload.update({"mpn": mpn, "source": "Mouser"})
-
                 if payload["status"] == "In Stock":
                     yield "found", payload
                     return
@@ -161,7 +394,115 @@ class _MouserService:
                 yield "error", {"mpn": mpn, "error": str(exc), "source": "Mouser"}
 
         # nothing in-stock or every attempt errored
-        yield "not_found", best_match or {
+        yield "not_found", best_match or self._not_found(mpns, manufacturer)
+
+    def _alternates(self, mpns: List[str], manufacturer: Optional[str], refresh: bool):
+        """
+        ``(mpn, answer)`` in BOM order.  In parallel mode the whole row goes
+        out as one part-number search instead of one request per alternate;
+        ``lookup_part`` runs the same exact search, so the pick is unchanged.
+        """
+        if len(mpns) < 2 or not self.api_key or not lookup_scheduler.parallel_alternates("Mouser"):
+            for mpn in mpns:
+                yield mpn, functools.partial(self.lookup_part, mpn, manufacturer, refresh=refresh)
+            return
+        answers = self.lookup_parts([(mpn, manufacturer, refresh) for mpn in mpns])
+        for mpn in mpns:
+            yield mpn, functools.partial(_unwrap, answers[(mpn, manufacturer)])
+
+    async def row_handler_async(self, row: Dict[str, Any]):
+        """Async generator twin of ``row_handler`` for the asyncio engine."""
+        mpns: List[str] = row.get("mpns", [])
+        manufacturer: Optional[str] = row.get("manufacturer")
+        refresh = bool(row.get("refresh"))
+
+        if not mpns:
+            yield "not_found", self._no_mpn(manufacturer)
+            return
+
+        best_match: Optional[Dict[str, Any]] = None
+
+        lookup = functools.partial(
+            self.lookup_part_async, manufacturer=manufacturer, refresh=refresh
+        )
+        for mpn, answer in async_engine.alternates("Mouser", lookup, mpns):
+            check_cancelled()
+            try:
+                payload = await answer()
+                if not payload:
+                    continue
+
+                if payload["status"] == "In Stock":
+                    yield "found", payload
+                    return
+
+                best_match = payload
+
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("[Mouser] error for %s", mpn)
+                yield "error", {"mpn": mpn, "error": str(exc), "source": "Mouser"}
+
+        yield "not_found", best_match or self._not_found(mpns, manufacturer)
+
+    def batch_row_handler(self, rows: List[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        ``row_handler`` for a group of BOM lines.  Round *k* looks up the
+        *k*-th MPN of every row still without stock in as few requests as
+        possible; each row then yields the same events ``row_handler`` would.
+        """
+        best: Dict[int, Optional[Dict[str, Any]]] = {}
+        open_rows: List[int] = []
+        for i, row in enumerate(rows):
+            if row.get("mpns"):
+                best[i] = None
+                open_rows.append(i)
+            else:
+                yield "not_found", self._no_mpn(row.get("manufacturer"))
+
+        def query(i: int, attempt: int) -> Tuple[str, Optional[str], bool]:
+            row = rows[i]
+            return row["mpns"][attempt], row.get("manufacturer"), bool(row.get("refresh"))
+
+        prefetched = None
+        if lookup_scheduler.parallel_alternates("Mouser"):  # every alternate, one pass
+            prefetched = self.lookup_parts(
+                [query(i, k) for i in open_rows for k in range(len(rows[i]["mpns"]))]
+            )
+
+        attempt = 0
+        while open_rows:
+            queries = [query(i, attempt) for i in open_rows]
+            answers = prefetched if prefetched is not None else self.lookup_parts(queries)
+            still_open: List[int] = []
+            for i, (mpn, manufacturer, _) in zip(open_rows, queries):
+                payload = answers[(mpn, manufacturer)]
+                if isinstance(payload, Exception):
+                    yield "error", {"mpn": mpn, "error": str(payload), "source": "Mouser"}
+                elif payload and payload["status"] == "In Stock":
+                    yield "found", dict(payload)
+                    continue
+                elif payload:
+                    best[i] = dict(payload)
+                if attempt + 1 < len(rows[i]["mpns"]):
+                    still_open.append(i)
+                else:
+                    row = rows[i]
+                    yield "not_found", best[i] or self._not_found(row["mpns"], row.get("manufacturer"))
+            open_rows = still_open
+            attempt += 1
+
+    @staticmethod
+    def _no_mpn(manufacturer: Optional[str]) -> Dict[str, Any]:
+        return {
+            "mpn": "Unknown",
+            "manufacturer": manufacturer,
+            "status": "No MPN in BOM row",
+            "source": "Mouser",
+        }
+
+    @staticmethod
+    def _not_found(mpns: List[str], manufacturer: Optional[str]) -> Dict[str, Any]:
+        return {
             "mpn": mpns[0],
             "manufacturer": manufacturer,
             "status": "Not Found",
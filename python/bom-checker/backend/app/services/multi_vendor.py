@@ -0,0 +1,116 @@
+"""
+Multi-vendor look-ups for the combined ``/api/stream-results`` endpoint.
+
+Each BOM row is fanned out to every enabled vendor at the same time (each on
+its own pool / quota) and the per-vendor answers are merged into a single
+row event:
+
+    • ``found``     – cheapest in-stock offer at the row quantity, with the
+                      other vendors' offers under ``alternatives``
+    • ``not_found`` – no vendor has stock; best out-of-stock candidate
+                      (vendor order breaks ties) plus ``alternatives``
+
+Vendor ``error`` events are forwarded unchanged, so the UI can still show
+which vendor failed.  A row therefore costs the slowest vendor, not the sum.
+
+Exports a singleton: multi_vendor
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from services.digikey_service import digikey_service
+from services.lookup_scheduler import error_event, lookup_scheduler
+from services.mouser_service import mouser_service
+
+Event = Tuple[str, Dict[str, Any]]
+
+VENDORS = {"DigiKey": digikey_service, "Mouser": mouser_service}
+
+
+def unit_price_at(price_breaks: Sequence[Dict[str, Any]], quantity: int, default: float = 0.0) -> float:
+    """Unit price of the largest break ≤ *quantity* (first break if below all)."""
+    best: Optional[Dict[str, Any]] = None
+    for br in sorted(price_breaks or [], key=lambda b: b.get("quantity") or 0):
+        if best is None or (br.get("quantity") or 0) <= quantity:
+            best = br
+    return float(best["price"]) if best else float(default or 0.0)
+
+
+def merge_offers(row: Dict[str, Any], results: Dict[str, List[Event]]) -> List[Event]:
+    """Fold each vendor's row events into one merged row event (+ forwarded extras)."""
+    quantity = int(row.get("quantity") or 1)
+    finals: Dict[str, Event] = {}
+    passthrough: List[Event] = []
+    for vendor, events in results.items():
+        for event, payload in events:
+            if event in ("found", "not_found"):
+                finals[vendor] = (event, payload)  # last answer per vendor wins
+            else:
+                passthrough.append((event, payload))
+
+    offers = [payload for _, payload in finals.values()]
+    in_stock = [payload for event, payload in finals.values() if event == "found"]
+    if in_stock:
+        best = min(
+            in_stock,
+            key=lambda p: unit_price_at(p.get("price_breaks"), quantity, p.get("price")),
+        )
+        event = "found"
+    elif offers:
+        # prefer a real (out-of-stock) part over a "Part not found" placeholder
+        best = next((p for p in offers if p.get("status") != "Not Found"), offers[0])
+        event = "not_found"
+    else:
+        return passthrough
+
+    merged = {
+        **best,
+        "row_index": row.get("row_index"),
+        "unit_price": unit_price_at(best.get("price_breaks"), quantity, best.get("price")),
+        "alternatives": [p for p in offers if p is not best],
+    }
+    return passthrough + [(event, merged)]
+
+
+class _MultiVendorLookup:
+    @staticmethod
+    def vendors(requested: Optional[Sequence[str]] = None) -> List[str]:
+        """Requested vendors that are known and enabled (all enabled by default)."""
+        enabled = [v for v in settings.ENABLED_VENDORS if v in VENDORS]
+        if not requested:
+            return enabled
+        return [v for v in enabled if v in set(requested)]
+
+    def row_handler(self, vendors: Sequence[str]):
+        """Sync row handler that runs every vendor on its own pool in parallel."""
+
+        def handler(row: Dict[str, Any]) -> Iterator[Event]:
+            futures = {
+                v: lookup_scheduler.collect(v, VENDORS[v].row_handler, row) for v in vendors
+            }
+            yield from merge_offers(row, {v: f.result() for v, f in futures.items()})
+
+        return handler
+
+    def row_handler_async(self, vendors: Sequence[str]):
+        """Async twin for ``async_engine``: vendors are gathered on the loop."""
+
+        async def collect(vendor: str, row: Dict[str, Any]) -> List[Event]:
+            try:
+                return [e async for e in VENDORS[vendor].row_handler_async(row)]
+            except Exception as exc:  # noqa: BLE001
+                return [error_event(row, exc, vendor)]
+
+        async def handler(row: Dict[str, Any]):
+            answers = await asyncio.gather(*(collect(v, row) for v in vendors))
+            for event in merge_offers(row, dict(zip(vendors, answers))):
+                yield event
+
+        return handler
+
+
+# --------------------------------------------------------------- singleton #
+multi_vendor = _MultiVendorLookup()
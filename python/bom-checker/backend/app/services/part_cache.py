@@ -0,0 +1,311 @@
+"""
+Persistent part-lookup cache shared by the Digi-Key and Mouser services.
+
+Entries are keyed by ``(vendor, normalised MPN, normalised manufacturer)``
+and stored in a local SQLite file.  Each processed part record is split in
+two halves with their own TTL:
+
+    • static   – description, manufacturer, MOQ, vendor part numbers …
+    • volatile – stock, price / price breaks, lead time
+
+A lookup is a *hit* only while both halves are fresh.  When just the
+volatile half has expired the entry is still returned (``fresh=False``) so
+callers can fall back to it if the vendor call fails.  ``None`` records are
+cached too (negative caching, volatile TTL) so unknown MPNs are not re-queried
+on every BOM.  Least-recently-used rows are evicted past
+``PART_CACHE_MAX_ENTRIES``.
+
+A hit's record is a ``PreEncoded`` dict: its JSON text is spliced from the
+two stored halves, so writing it to a job log costs no serialisation.
+
+Substitute lists are cached in a second table keyed by ``(vendor, vendor
+part number)`` with their own TTL (``PART_CACHE_SUBSTITUTE_TTL``).
+
+Exports a singleton: part_cache
+"""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from core.config import settings
+from services.event_encoding import PreEncoded, dumps
+
+logger = logging.getLogger(__name__)
+
+STATIC_FIELDS = frozenset(
+    {
+        "mpn",
+        "manufacturer",
+        "description",
+        "digikey_pn",
+        "mouser_pn",
+        "minimum_order_quantity",
+        "product_status",
+        "source",
+    }
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parts (
+    vendor           TEXT NOT NULL,
+    mpn_key          TEXT NOT NULL,
+    manufacturer_key TEXT NOT NULL,
+    static_json      TEXT NOT NULL,
+    static_expires   REAL NOT NULL,
+    volatile_json    TEXT NOT NULL,
+    volatile_expires REAL NOT NULL,
+    last_access      REAL NOT NULL,
+    PRIMARY KEY (vendor, mpn_key, manufacturer_key)
+);
+CREATE INDEX IF NOT EXISTS parts_last_access ON parts (last_access);
+CREATE TABLE IF NOT EXISTS substitutes (
+    vendor      TEXT NOT NULL,
+    vendor_pn   TEXT NOT NULL,
+    subs_json   TEXT NOT NULL,
+    expires     REAL NOT NULL,
+    PRIMARY KEY (vendor, vendor_pn)
+);
+"""
+
+
+class CacheEntry(NamedTuple):
+    record: Optional[Dict[str, Any]]  # None → vendor reported no match
+    fresh: bool                       # False → volatile half has expired
+
+
+def _join_objects(left: str, right: str) -> str:
+    """Merge two JSON object texts with disjoint keys."""
+    if right == "{}":
+        return left
+    if left == "{}":
+        return right
+    return f"{left[:-1]},{right[1:]}"
+
+
+def normalize_mpn(mpn: Any) -> str:
+    """Upper-case *mpn* and drop whitespace so trivially different spellings share an entry."""
+    return "".join(str(mpn or "").split()).upper()
+
+
+def normalize_manufacturer(manufacturer: Any) -> str:
+    return " ".join(str(manufacturer or "").split()).lower()
+
+
+class _PartCache:
+    EVICT_EVERY = 200  # check the size bound once per this many writes
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        max_entries: Optional[int] = None,
+        static_ttl: Optional[int] = None,
+        volatile_ttl: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        substitute_ttl: Optional[int] = None,
+    ) -> None:
+        self.path = Path(path) if path else settings.CACHE_DIR / "part_cache.sqlite3"
+        self.max_entries = max_entries or settings.PART_CACHE_MAX_ENTRIES
+        self.static_ttl = static_ttl if static_ttl is not None else settings.PART_CACHE_STATIC_TTL
+        self.volatile_ttl = (
+            volatile_ttl if volatile_ttl is not None else settings.PART_CACHE_VOLATILE_TTL
+        )
+        self.substitute_ttl = (
+            substitute_ttl if substitute_ttl is not None else settings.PART_CACHE_SUBSTITUTE_TTL
+        )
+        self.enabled = settings.PART_CACHE_ENABLED if enabled is None else enabled
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "stale": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "substitute_hits": 0,
+            "substitute_misses": 0,
+        }
+        self._writes = 0
+
+    # ------------------------------------------------------------ sqlite ---- #
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "path", None) != self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.path = conn, self.path
+        return conn
+
+    def _count(self, stat: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[stat] += n
+
+    @staticmethod
+    def _key(vendor: str, mpn: Any, manufacturer: Any):
+        return vendor, normalize_mpn(mpn), normalize_manufacturer(manufacturer)
+
+    # ------------------------------------------------------------ public ---- #
+    def get(self, vendor: str, mpn: Any, manufacturer: Any = None) -> Optional[CacheEntry]:
+        """Return the cached entry for the key, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = self._key(vendor, mpn, manufacturer)
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT static_json, static_expires, volatile_json, volatile_expires "
+                "FROM parts WHERE vendor=? AND mpn_key=? AND manufacturer_key=?",
+                key,
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self._count("misses")
+                return None
+            conn.execute(
+                "UPDATE parts SET last_access=? WHERE vendor=? AND mpn_key=? AND manufacturer_key=?",
+                (now, *key),
+            )
+        except sqlite3.Error:
+            logger.exception("Part cache read failed")
+            self._count("misses")
+            return None
+
+        static, volatile = json.loads(row[0]), json.loads(row[2])
+        fresh = row[3] > now
+        self._count("hits" if fresh else "stale")
+        if static is None:
+            return CacheEntry(None, fresh)
+        if volatile is None:
+            return CacheEntry(PreEncoded(static, row[0]), fresh)
+        return CacheEntry(PreEncoded({**static, **volatile}, _join_objects(row[0], row[2])), fresh)
+
+    def is_fresh(self, vendor: str, mpn: Any, manufacturer: Any = None) -> bool:
+        """True if a fresh entry exists – no stats, no LRU touch (for warm-up)."""
+        if not self.enabled:
+            return False
+        now = time.time()
+        try:
+            row = self._conn().execute(
+                "SELECT 1 FROM parts WHERE vendor=? AND mpn_key=? AND manufacturer_key=? "
+                "AND static_expires>? AND volatile_expires>?",
+                (*self._key(vendor, mpn, manufacturer), now, now),
+            ).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None
+
+    def put(
+        self, vendor: str, mpn: Any, manufacturer: Any, record: Optional[Dict[str, Any]]
+    ) -> None:
+        """Store *record* (or a negative ``None`` result) under the key."""
+        if not self.enabled:
+            return
+        now = time.time()
+        if record is None:
+            static_json = volatile_json = "null"
+            static_expires = volatile_expires = now + self.volatile_ttl
+        else:
+            static = {k: v for k, v in record.items() if k in STATIC_FIELDS}
+            volatile = {k: v for k, v in record.items() if k not in STATIC_FIELDS}
+            static_json, volatile_json = dumps(static).decode(), dumps(volatile).decode()
+            static_expires = now + self.static_ttl
+            volatile_expires = now + self.volatile_ttl
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO parts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    *self._key(vendor, mpn, manufacturer),
+                    static_json,
+                    static_expires,
+                    volatile_json,
+                    volatile_expires,
+                    now,
+                ),
+            )
+        except sqlite3.Error:
+            logger.exception("Part cache write failed")
+            return
+        self._count("stores")
+        with self._stats_lock:
+            self._writes += 1
+            check = self._writes % self.EVICT_EVERY == 0
+        if check:
+            self.evict()
+
+    def get_substitutes(self, vendor: str, vendor_pn: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached substitute list for *vendor_pn*, or None on a miss / expiry."""
+        if not self.enabled:
+            return None
+        try:
+            row = self._conn().execute(
+                "SELECT subs_json FROM substitutes WHERE vendor=? AND vendor_pn=? AND expires>?",
+                (vendor, normalize_mpn(vendor_pn), time.time()),
+            ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Substitute cache read failed")
+            row = None
+        self._count("substitute_hits" if row else "substitute_misses")
+        return json.loads(row[0]) if row else None
+
+    def put_substitutes(self, vendor: str, vendor_pn: str, subs: List[Dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO substitutes VALUES (?, ?, ?, ?)",
+                (vendor, normalize_mpn(vendor_pn), json.dumps(subs), now + self.substitute_ttl),
+            )
+            conn.execute("DELETE FROM substitutes WHERE expires<=?", (now,))
+        except sqlite3.Error:
+            logger.exception("Substitute cache write failed")
+
+    def evict(self) -> int:
+        """Drop least-recently-used rows beyond ``max_entries``; return how many."""
+        try:
+            conn = self._conn()
+            (count,) = conn.execute("SELECT COUNT(*) FROM parts").fetchone()
+            excess = count - self.max_entries
+            if excess <= 0:
+                return 0
+            conn.execute(
+                "DELETE FROM parts WHERE rowid IN "
+                "(SELECT rowid FROM parts ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+        except sqlite3.Error:
+            logger.exception("Part cache eviction failed")
+            return 0
+        self._count("evictions", excess)
+        return excess
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM parts")
+        self._conn().execute("DELETE FROM substitutes")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit / miss counters since start-up plus the current entry count."""
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        lookups = out["hits"] + out["stale"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        out["enabled"] = self.enabled
+        if self.enabled:
+            try:
+                (out["entries"],) = self._conn().execute("SELECT COUNT(*) FROM parts").fetchone()
+            except sqlite3.Error:
+                out["entries"] = None
+        return out
+
+
+# --------------------------------------------------------------- singleton #
+part_cache = _PartCache()
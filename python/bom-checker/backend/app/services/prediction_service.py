@@ -13,11 +13,10 @@ import logging
 import os
 import sys
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Union
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
 
 import joblib
 import numpy as np
-import pandas as pd
 
 from core.config import settings
 from utils.model_compat import simple_tokenizer, standard_preprocessor  # keep legacy helpers
@@ -127,7 +126,10 @@ class _PredictionService:
         return results
         # ---------------------------------------------------------------- public helper for /process-bom
     def prepare_rows_for_stream(
-        self, file_name: str, columns: List[Dict[str, str]]
+        self,
+        file_name: Optional[str],
+        columns: List[Dict[str, str]],
+        upload_id: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Build the compact row-array the front-end will later stream to
@@ -135,68 +137,78 @@ class _PredictionService:
 
         Args
         ----
-        file_name : name of the uploaded Excel file (already saved in uploads/)
+        file_name : original upload name (legacy – latest upload with that name)
         columns   : [{name:str, mapping:str}, …] – mapping chosen by the user
+        upload_id : id returned by /upload (preferred over file_name)
 
         Returns
         -------
         {
           "rows": [
-             {"row_index": int, "mpns": [str,…], "manufacturer": str|None},
+             {"row_index": int, "mpns": [str,…], "manufacturer": str|None,
+              "quantity": int, "reference": Any|None},
              …
           ],
           "total_rows": int
         }
         """
-        from services.excel_service import clean_excel_file  # local import to avoid cycle
-
-        path = Path(__file__).parent.parent / "uploads" / file_name
-        if not path.exists():
-            raise FileNotFoundError(f"Uploaded file not found at {path}")
-
-        df = clean_excel_file(path.read_bytes())
+        from services.bom_cache import bom_cache  # local import to avoid cycle
+        from services.excel_service import build_stream_rows
+
+        upload = self._find_upload(file_name, upload_id)
+        mapping = self._mapping(columns)
+        df = bom_cache.load(upload.path, upload.sha256)
+        rows = build_stream_rows(
+            df,
+            mapping["ManufacturerPN"],
+            manu_col=mapping.get("Manufacturer"),
+            qty_col=mapping.get("Quantity"),
+            ref_col=mapping.get("Reference"),
+        )
+        return {"rows": rows, "total_rows": len(rows)}
 
-        # Build lookup of canonical → original column names
-        mapping = {m["mapping"]: m["name"] for m in columns}
+    def iter_rows_for_stream(
+        self,
+        file_name: Optional[str],
+        columns: List[Dict[str, str]],
+        upload_id: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        ``prepare_rows_for_stream`` as a lazy iterator read straight from the
+        workbook (pipelined streams).  The upload and mapping are checked
+        right away; the sheet is only read as rows are consumed.
+        """
+        from services.excel_service import iter_stream_rows
+
+        upload = self._find_upload(file_name, upload_id)
+        mapping = self._mapping(columns)
+        return iter_stream_rows(
+            upload.path,
+            mapping["ManufacturerPN"],
+            manu_col=mapping.get("Manufacturer"),
+            qty_col=mapping.get("Quantity"),
+            ref_col=mapping.get("Reference"),
+        )
 
-        print(f'Mapping: {mapping}')
+    @staticmethod
+    def _find_upload(file_name: Optional[str], upload_id: Optional[str]):
+        from services.upload_store import upload_store  # local import to avoid cycle
 
-        mpn_col = mapping.get("ManufacturerPN")
-        manu_col = mapping.get("Manufacturer")
-        qty_col  = mapping.get("Quantity")  
-        ref_col  = mapping.get("Reference")
+        upload = upload_store.get(upload_id) if upload_id else None
+        if upload is None and file_name:
+            upload = upload_store.latest(file_name)
+        if upload is None or not upload.path.exists():
+            raise FileNotFoundError(f"Uploaded file not found: {upload_id or file_name}")
+        return upload
 
-        if not mpn_col:
+    @staticmethod
+    def _mapping(columns: List[Dict[str, str]]) -> Dict[str, str]:
+        """Canonical → original column names; requires a ManufacturerPN column."""
+        mapping = {m["mapping"]: m["name"] for m in columns}
+        logger.debug("Column mapping: %s", mapping)
+        if not mapping.get("ManufacturerPN"):
             raise ValueError("No ManufacturerPN column in mapping")
-
-        rows = []
-        for idx, row in df.iterrows():
-            mpn_cell = row.get(mpn_col)
-            if mpn_cell is None or (isinstance(mpn_cell, float) and np.isnan(mpn_cell)):
-                continue
-
-            # Allow multiple MPNs separated by comma / space
-            mpns = [m.strip() for m in str(mpn_cell).split(",") if m.strip()]
-            manuf = str(row.get(manu_col)).strip() if manu_col and row.get(manu_col) else None
-
-            qty_val = None
-            if qty_col and qty_col in row and pd.notna(row[qty_col]):
-                try:
-                    qty_val = int(float(row[qty_col]))
-                except ValueError:
-                    qty_val = None          # fall back if “10 pcs” etc.
-            
-            rows.append({
-                "row_index":   int(idx),
-                "mpns":        mpns,
-                "manufacturer": manuf,
-                "quantity":     qty_val or 1,   # default to 1 if blank/unparseable
-                "reference":    (row[ref_col] if ref_col and row.get(ref_col) is not None else None)
-            })
-
-            print(f'rows are: {rows}')
-
-        return {"rows": rows, "total_rows": len(rows)}
+        return mapping
 
 
 
@@ -0,0 +1,212 @@
+"""
+Speculative part-cache warm-up right after an upload.
+
+While the user confirms the column mapping, the column predictions already
+say which column is most likely ``ManufacturerPN``.  When that prediction is
+confident enough (``PREFETCH_MIN_CONFIDENCE``), ``prefetcher.start`` builds
+the stream rows the predicted mapping would produce and looks their MPNs up
+in the background, so most rows are cache hits once the BOM is processed:
+
+    • same keys as the real stream – ``build_stream_rows``, the first MPN of
+      each row and the predicted Manufacturer column – warmed in BOM order
+    • low priority – a small pool (``PREFETCH_WORKERS``), and a vendor is
+      only asked while its rate bucket is at least ``PREFETCH_HEADROOM``
+      full, so live streams keep the quota
+    • budgeted – at most ``PREFETCH_BUDGET`` vendor look-ups per vendor and
+      upload; MPNs already fresh in the cache cost nothing
+    • cancellable – ``settle`` cancels the warm-up when ``/api/process-bom``
+      maps a different MPN / Manufacturer column.  The warm-up's cancel token
+      is bound like a job's, so a look-up waiting on quota stops at once.
+
+Exports a singleton: prefetcher
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from services import cancellation
+from services.bom_cache import bom_cache
+from services.cancellation import CancelToken, LookupCancelled
+from services.excel_service import build_stream_rows
+from services.multi_vendor import VENDORS, multi_vendor
+from services.part_cache import part_cache
+from services.rate_limit import rate_limiter
+from services.upload_store import Upload
+
+logger = logging.getLogger(__name__)
+
+HEADROOM_POLL = 0.05  # seconds between rate-bucket checks
+MAX_TRACKED = 100     # warm-ups kept for ``status`` (oldest finished ones go first)
+
+
+class _Warmup:
+    def __init__(
+        self, upload_id: str, mpn_col: str, manu_col: Optional[str], vendors: List[str]
+    ) -> None:
+        self.upload_id = upload_id
+        self.mpn_col = mpn_col
+        self.manu_col = manu_col
+        self.vendors = vendors
+        self.token = CancelToken()
+        self.state = "queued"
+        self.counts = {"keys": 0, "cached": 0, "looked_up": 0, "errors": 0}
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "cancelled", "failed")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "upload_id": self.upload_id,
+            "column": self.mpn_col,
+            "manufacturer_column": self.manu_col,
+            "vendors": self.vendors,
+            "state": self.state,
+            **self.counts,
+        }
+
+
+class _Prefetcher:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._warmups: Dict[str, _Warmup] = {}
+        self._stats = {"started": 0, "done": 0, "cancelled": 0, "failed": 0, "looked_up": 0}
+
+    # ------------------------------------------------------------ public ---- #
+    @staticmethod
+    def pick_columns(columns: Sequence[Dict[str, Any]]) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        ``(MPN column, Manufacturer column or None)`` from the upload's column
+        predictions, or None unless the MPN column clears the threshold.
+        """
+        def best(category: str) -> Optional[str]:
+            scored = [
+                (float(c["prediction"].get("primary_confidence") or 0.0), c["name"])
+                for c in columns
+                if (c.get("prediction") or {}).get("primary_category") == category
+            ]
+            top = max(scored, default=None)
+            return top[1] if top and top[0] >= settings.PREFETCH_MIN_CONFIDENCE else None
+
+        mpn_col = best("ManufacturerPN")
+        return (mpn_col, best("Manufacturer")) if mpn_col else None
+
+    def start(self, upload: Upload, columns: Sequence[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Warm the cache for *upload* in the background; None when not worth it."""
+        if not settings.PREFETCH_ENABLED:
+            return None
+        picked = self.pick_columns(columns)
+        vendors = multi_vendor.vendors()
+        if picked is None or not vendors:
+            return None
+        warmup = _Warmup(upload.upload_id, *picked, vendors)
+        with self._lock:
+            previous = self._warmups.pop(upload.upload_id, None)
+            self._warmups[upload.upload_id] = warmup
+            self._prune()
+            self._stats["started"] += 1
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=max(settings.PREFETCH_WORKERS, 1), thread_name_prefix="prefetch"
+                )
+            pool = self._pool
+        if previous is not None:
+            previous.token.cancel("replaced")
+        pool.submit(self._run, warmup, upload)
+        logger.info(
+            "Prefetching %s for upload %s (%s)", picked[0], upload.upload_id, ", ".join(vendors)
+        )
+        return warmup.summary()
+
+    def settle(self, upload_id: Optional[str], mapping: Dict[str, str]) -> None:
+        """The user's mapping is final: cancel the warm-up if it guessed other columns."""
+        with self._lock:
+            warmup = self._warmups.get(upload_id) if upload_id else None
+        if warmup is None or warmup.finished:
+            return
+        if (mapping.get("ManufacturerPN"), mapping.get("Manufacturer")) != (
+            warmup.mpn_col,
+            warmup.manu_col,
+        ):
+            self.cancel(upload_id, "mapping changed")
+
+    def cancel(self, upload_id: str, reason: str = "cancelled") -> bool:
+        with self._lock:
+            warmup = self._warmups.get(upload_id)
+        return warmup is not None and warmup.token.cancel(reason)
+
+    def status(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            warmup = self._warmups.get(upload_id)
+        return warmup.summary() if warmup else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = sum(not w.finished for w in self._warmups.values())
+            return {**self._stats, "active": active}
+
+    # ----------------------------------------------------------- worker ---- #
+    def _run(self, warmup: _Warmup, upload: Upload) -> None:
+        try:
+            with cancellation.bind(warmup.token):
+                warmup.token.raise_if_cancelled()
+                warmup.state = "running"
+                df = bom_cache.load(upload.path, upload.sha256)
+                rows = build_stream_rows(df, warmup.mpn_col, manu_col=warmup.manu_col)
+                keys = list(dict.fromkeys((r["mpns"][0], r.get("manufacturer")) for r in rows))
+                warmup.counts["keys"] = len(keys)
+                self._warm(warmup, keys)
+            warmup.state = "done"
+        except LookupCancelled:
+            warmup.state = "cancelled"
+        except Exception:  # noqa: BLE001
+            logger.exception("Prefetch for upload %s failed", warmup.upload_id)
+            warmup.state = "failed"
+        finally:
+            warmup.token.close()
+            with self._lock:
+                self._stats[warmup.state] += 1
+                self._stats["looked_up"] += warmup.counts["looked_up"]
+            logger.info("Prefetch for upload %s %s: %s", warmup.upload_id, warmup.state, warmup.counts)
+
+    def _warm(self, warmup: _Warmup, keys: List[Tuple[str, Optional[str]]]) -> None:
+        budget = {vendor: settings.PREFETCH_BUDGET for vendor in warmup.vendors}
+        for mpn, manufacturer in keys:
+            for vendor in warmup.vendors:
+                if budget[vendor] <= 0:
+                    continue
+                if part_cache.is_fresh(vendor, mpn, manufacturer):
+                    warmup.counts["cached"] += 1
+                    continue
+                self._wait_for_headroom(vendor)
+                budget[vendor] -= 1
+                warmup.counts["looked_up"] += 1
+                try:
+                    VENDORS[vendor].lookup_part(mpn, manufacturer)
+                except Exception as exc:  # noqa: BLE001 - best effort
+                    warmup.counts["errors"] += 1
+                    logger.debug("Prefetch of %s at %s failed: %s", mpn, vendor, exc)
+            if not any(budget.values()):
+                return
+
+    @staticmethod
+    def _wait_for_headroom(vendor: str) -> None:
+        """Block while *vendor*'s quota is in use by live traffic."""
+        bucket = rate_limiter.bucket(vendor)
+        need = max(1.0, bucket.capacity * settings.PREFETCH_HEADROOM)
+        while bucket.available() < need:
+            cancellation.sleep(HEADROOM_POLL)  # raises once the warm-up is cancelled
+
+    def _prune(self) -> None:
+        finished = [uid for uid, w in self._warmups.items() if w.finished]
+        for upload_id in finished[: max(len(self._warmups) - MAX_TRACKED, 0)]:
+            del self._warmups[upload_id]
+
+
+# --------------------------------------------------------------- singleton #
+prefetcher = _Prefetcher()
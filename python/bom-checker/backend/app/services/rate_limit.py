@@ -0,0 +1,118 @@
+"""
+Token-bucket rate limiting for vendor API calls.
+
+Each vendor gets one bucket, sized from settings
+(``<VENDOR>_RATE_PER_SEC`` / ``<VENDOR>_RATE_BURST``).  Callers block in
+``rate_limiter.acquire(vendor)`` right before a network call, so throughput
+is bounded by the vendor quota rather than by how many workers are running.
+
+Exports a singleton: rate_limiter
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+from core.config import settings
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate <= 0`` means unlimited."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def available(self) -> float:
+        """Tokens that could be taken right now (``inf`` when unlimited)."""
+        if self.rate <= 0:
+            return float("inf")
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take *tokens* if available right now; never blocks."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until *tokens* are available; False if *timeout* expires first."""
+        if self.rate <= 0:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> bool:
+        """Event-loop friendly ``acquire``: awaits instead of sleeping the thread."""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+class _RateLimiter:
+    """Registry of per-vendor token buckets, created lazily from settings."""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, vendor: str) -> TokenBucket:
+        with self._lock:
+            if vendor not in self._buckets:
+                prefix = vendor.upper()
+                self._buckets[vendor] = TokenBucket(
+                    getattr(settings, f"{prefix}_RATE_PER_SEC", 0),
+                    getattr(settings, f"{prefix}_RATE_BURST", 1),
+                )
+            return self._buckets[vendor]
+
+    def configure(self, vendor: str, rate: float, burst: int) -> None:
+        """Replace *vendor*'s bucket (used by tests and ops overrides)."""
+        with self._lock:
+            self._buckets[vendor] = TokenBucket(rate, burst)
+
+    def acquire(self, vendor: str, timeout: Optional[float] = None) -> bool:
+        return self.bucket(vendor).acquire(timeout=timeout)
+
+    async def acquire_async(self, vendor: str) -> bool:
+        return await self.bucket(vendor).acquire_async()
+
+
+# --------------------------------------------------------------- singleton #
+rate_limiter = _RateLimiter()
@@ -0,0 +1,95 @@
+"""
+Pipelined row source for look-up jobs: sheet reader → bounded queue → look-ups.
+
+``RowPipeline`` wraps a lazy row iterator (``excel_service.iter_stream_rows``)
+and reads it on its own thread into a queue of at most
+``PIPELINE_QUEUE_SIZE`` rows.  The scheduler pulls rows from the queue as
+workers free up, so the first look-ups start while later rows are still
+being parsed, and a slow vendor holds the reader back instead of the whole
+BOM piling up in memory.
+
+    • the reader starts on first iteration and stops once the consumer is
+      done with the iterator (job finished, cancelled or failed)
+    • an error raised while reading is re-raised to the consumer
+    • ``len()`` is the number of rows queued so far – the final count once
+      ``done`` – so progress totals grow while the sheet is being read
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from core.config import settings
+
+POLL = 0.1  # seconds between stop checks while the queue is full / empty
+
+_END = object()  # sentinel: the reader has finished (or failed)
+
+
+class RowPipeline:
+    def __init__(self, rows: Iterable[Dict[str, Any]], maxsize: Optional[int] = None) -> None:
+        self._source = rows
+        self._queue: queue.Queue = queue.Queue(maxsize=max(maxsize or settings.PIPELINE_QUEUE_SIZE, 1))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._read = 0  # rows handed to the queue (the reader writes, progress reads)
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._read
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if self._thread is not None:
+            raise RuntimeError("A RowPipeline can only be iterated once")
+        self._thread = threading.Thread(target=self._reader, name="row-pipeline", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                try:
+                    row = self._queue.get(timeout=POLL)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return  # closed by the consumer
+                    continue
+                if row is _END:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield row
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop the reader (rows already queued are dropped)."""
+        self._stop.set()
+
+    # ----------------------------------------------------------- reader ---- #
+    def _reader(self) -> None:
+        rows = iter(self._source)
+        try:
+            for row in rows:
+                if not self._put(row):
+                    return  # stopped: this row was never queued, so not counted
+                with self._lock:
+                    self._read += 1
+        except Exception as exc:  # noqa: BLE001 - handed to the consumer
+            self.error = exc
+        finally:
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()  # e.g. release the workbook when stopped early
+            self.done = True
+            self._put(_END)
+
+    def _put(self, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,193 @@
+"""
+Request coalescing for vendor look-ups.
+
+Two layers keep one ``(vendor, MPN, manufacturer)`` key to one network call:
+
+    • job scope  – ``scope()`` binds a per-job memo (a context variable, like
+                   the cancel token), so a BOM that repeats an MPN on many
+                   lines reuses the first answer even with ``refresh`` on or
+                   the part cache disabled.
+    • in flight  – concurrent callers of ``do()`` with the same key, from any
+                   job or stream, wait for the leader's call and share its
+                   result instead of issuing their own.  A caller that
+                   fetches many keys in one request (Mouser's batch search)
+                   ``claim``s them, ``land``s each answer and ``wait``s for
+                   the keys another call already leads.
+
+Errors are not shared through the memo; a leader that was cancelled (its
+job went away) hands the key to the next waiter instead of failing it.
+
+Exports a singleton: singleflight
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+from services.cancellation import LookupCancelled, check_cancelled
+from services.part_cache import normalize_manufacturer, normalize_mpn
+
+WAIT_SLICE = 0.25  # seconds between cancel checks while following a flight
+
+_scope: contextvars.ContextVar[Optional[Dict[Hashable, Any]]] = contextvars.ContextVar(
+    "lookup_job_memo", default=None
+)
+
+
+def flight_key(vendor: str, mpn: Any, manufacturer: Any = None) -> Tuple[str, str, str]:
+    """Same normalisation as the part cache, so spelling variants coalesce."""
+    return vendor, normalize_mpn(mpn), normalize_manufacturer(manufacturer)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self, done) -> None:
+        self.done = done
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._async_flights: Dict[Hashable, _Flight] = {}  # engine loop thread only
+        self._stats = {"calls": 0, "shared_in_flight": 0, "shared_in_job": 0}
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    # ------------------------------------------------------------- scope ---- #
+    @staticmethod
+    def current_scope() -> Optional[Dict[Hashable, Any]]:
+        return _scope.get()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def scope(memo: Optional[Dict[Hashable, Any]] = None) -> Iterator[Dict[Hashable, Any]]:
+        """Bind a job memo (a fresh one unless *memo* is given)."""
+        memo = {} if memo is None else memo
+        reset = _scope.set(memo)
+        try:
+            yield memo
+        finally:
+            _scope.reset(reset)
+
+    def recall(self, key: Hashable) -> Tuple[bool, Any]:
+        """``(True, answer)`` if the current job already looked *key* up."""
+        memo = _scope.get()
+        if memo is not None and key in memo:
+            self._count("shared_in_job")
+            return True, memo[key]
+        return False, None
+
+    @staticmethod
+    def remember(key: Hashable, result: Any) -> None:
+        """Record *key*'s answer for the rest of the current job."""
+        memo = _scope.get()
+        if memo is not None:
+            memo[key] = result
+
+    # ------------------------------------------------------------- calls ---- #
+    def claim(self, key: Hashable) -> Tuple[bool, _Flight]:
+        """
+        ``(True, new flight)`` – the caller now leads *key* and must ``land``
+        it – or ``(False, flight)`` when another call already leads it.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(threading.Event())
+                self._stats["calls"] += 1
+                return True, flight
+            self._stats["shared_in_flight"] += 1
+            return False, flight
+
+    def land(
+        self, key: Hashable, flight: _Flight, result: Any = None, error: Optional[BaseException] = None
+    ) -> None:
+        """Publish the leader's answer (or *error*) for *key* to its followers."""
+        flight.result, flight.error = result, error
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+        if error is None:
+            self.remember(key, result)
+
+    @staticmethod
+    def wait(flight: _Flight) -> Tuple[bool, Any]:
+        """
+        Follow another call's *flight*: ``(True, result)``, the leader's
+        error raised, or ``(False, None)`` if the leader was cancelled (its
+        job went away) and the key should be claimed again.
+        """
+        while not flight.done.wait(WAIT_SLICE):
+            check_cancelled()
+        if isinstance(flight.error, LookupCancelled):
+            return False, None
+        if flight.error is not None:
+            raise flight.error
+        return True, flight.result
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """``fn()`` – unless this job already has the answer or another call is running."""
+        hit, result = self.recall(key)
+        if hit:
+            return result
+        while True:
+            leader, flight = self.claim(key)
+            if leader:
+                try:
+                    result = fn()
+                except BaseException as exc:
+                    self.land(key, flight, error=exc)
+                    raise
+                self.land(key, flight, result)
+                return result
+            shared, result = self.wait(flight)
+            if shared:
+                self.remember(key, result)
+                return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Asyncio twin of ``do`` for coroutines on the async engine loop."""
+        hit, result = self.recall(key)
+        if hit:
+            return result
+        while True:
+            flight = self._async_flights.get(key)
+            if flight is None:
+                flight = self._async_flights[key] = _Flight(asyncio.Event())
+                self._count("calls")
+                try:
+                    flight.result = await fn()
+                except BaseException as exc:
+                    flight.error = exc
+                    raise
+                finally:
+                    del self._async_flights[key]
+                    flight.done.set()
+                break
+            self._count("shared_in_flight")
+            await flight.done.wait()
+            if isinstance(flight.error, (LookupCancelled, asyncio.CancelledError)):
+                continue
+            if flight.error is not None:
+                raise flight.error
+            break
+        self.remember(key, flight.result)
+        return flight.result
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+# --------------------------------------------------------------- singleton #
+singleflight = _SingleFlight()
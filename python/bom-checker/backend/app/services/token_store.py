@@ -0,0 +1,200 @@
+"""
+OAuth access-token store shared by every worker process.
+
+One JSON file (``access_token``, ``expires_in``, ``created_at``) holds the
+token for all processes of a multi-worker server:
+
+    • reads take no lock – the file is only ever replaced whole (temp file +
+      ``os.replace``), so a reader sees either the old or the new token
+    • a refresh holds an exclusive ``fcntl`` lock on ``<file>.lock`` and
+      re-reads the file first; a token another process just fetched is
+      adopted instead of calling OAuth again
+    • inside a process the refresh is single-flight: threads that find the
+      token stale (or rejected with a 401) wait for the one refreshing
+    • a background thread refreshes ``refresh_ahead`` seconds before expiry,
+      so look-ups keep using the current token and only wait on OAuth when
+      there is no valid token at all (cold start, 401)
+
+Without ``fcntl`` (Windows) only the in-process lock applies.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+Token = Dict[str, Any]
+
+EXPIRY_SKEW = 30   # seconds – a token this close to expiry is not handed out
+RETRY_DELAY = 30   # seconds between failed background refreshes
+
+
+def expires_at(token: Optional[Token]) -> float:
+    if not token:
+        return 0.0
+    return float(token.get("created_at", 0)) + float(token.get("expires_in", 0))
+
+
+class TokenStore:
+    def __init__(
+        self,
+        path: Union[str, Path],
+        fetch: Callable[[], Token],
+        refresh_ahead: float = 300,
+        name: str = "oauth",
+    ) -> None:
+        self.path = Path(path)
+        self.fetch = fetch
+        self.refresh_ahead = refresh_ahead
+        self.name = name
+        self._lock = threading.Lock()
+        self._token: Optional[Token] = None
+        self._source: Optional[Path] = None  # file the in-memory token came from
+        self._rejected: Optional[str] = None
+        self._refresher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._stats = {"fetches": 0, "adopted": 0, "background_refreshes": 0, "refresh_errors": 0}
+
+    # ------------------------------------------------------------ access ---- #
+    def _current(self) -> Optional[Token]:
+        return self._token if self._source == self.path else None
+
+    def _ahead(self, token: Optional[Token]) -> float:
+        """Refresh lead time – at most half the token's lifetime."""
+        lifetime = float((token or {}).get("expires_in", 0))
+        return min(self.refresh_ahead, lifetime / 2)
+
+    def _usable(self, token: Optional[Token], margin: float = EXPIRY_SKEW) -> bool:
+        return (
+            bool(token)
+            and token.get("access_token") != self._rejected
+            and time.time() < expires_at(token) - margin
+        )
+
+    def peek(self) -> Optional[str]:
+        """The current access token if it is still valid – never blocks."""
+        token = self._current()
+        return token["access_token"] if self._usable(token) else None
+
+    def get(self) -> str:
+        """A valid access token; fetches one only if none is usable."""
+        access = self.peek() or self.refresh()
+        self._ensure_refresher()
+        return access
+
+    def invalidate(self, rejected: str) -> None:
+        """Mark *rejected* (a 401) as unusable; a newer token is left alone."""
+        self._rejected = rejected
+
+    # ----------------------------------------------------------- refresh ---- #
+    def refresh(self, ahead: bool = False) -> str:
+        """
+        Single-flight refresh: adopt a newer token from the file or fetch one.
+        With *ahead* a token is replaced once it is within ``refresh_ahead``
+        of expiry (the background refresh).
+        """
+        with self._lock:
+            current = self._current()
+            margin = self._ahead(current) if ahead else EXPIRY_SKEW
+            if self._usable(current, margin):
+                return current["access_token"]  # another thread refreshed meanwhile
+            with self._file_lock():
+                token = self._read()
+                margin = self._ahead(token) if ahead else EXPIRY_SKEW
+                if self._usable(token, margin):
+                    self._count("adopted")  # another process refreshed meanwhile
+                else:
+                    started = int(time.time())
+                    token = {**self.fetch(), "created_at": started}
+                    self._count("fetches")
+                    self._write(token)
+                self._token, self._source = token, self.path
+                return token["access_token"]
+
+    def _ensure_refresher(self) -> None:
+        if self._refresher is not None or self.refresh_ahead <= 0:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name=f"{self.name}-token-refresh", daemon=True
+                )
+                self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._closed.is_set():
+            token = self._current()
+            delay = expires_at(token) - self._ahead(token) - time.time()
+            if delay > 0:
+                self._closed.wait(delay)
+                continue
+            try:
+                self.refresh(ahead=True)
+                self._count("background_refreshes")
+            except Exception:  # noqa: BLE001
+                logger.exception("[%s] Background token refresh failed", self.name)
+                self._count("refresh_errors")
+                self._closed.wait(RETRY_DELAY)
+
+    def close(self) -> None:
+        """Stop the background refresh."""
+        self._closed.set()
+
+    # -------------------------------------------------------------- file ---- #
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _read(self) -> Optional[Token]:
+        try:
+            token = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.exception("[%s] Unreadable token file %s", self.name, self.path)
+            return None
+        return token if isinstance(token, dict) and token.get("access_token") else None
+
+    def _write(self, token: Token) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump(token, fh, indent=2)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    # ------------------------------------------------------------- stats ---- #
+    def _count(self, stat: str) -> None:
+        self._stats[stat] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        token = self._current()
+        return {**self._stats, "expires_in": max(int(expires_at(token) - time.time()), 0)}
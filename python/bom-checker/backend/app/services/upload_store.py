@@ -0,0 +1,345 @@
+"""
+Content-addressed store for uploaded BOM workbooks.
+
+Raw files are kept once per SHA-256 under ``UPLOAD_DIR/blobs/`` and a small
+SQLite index maps each upload (an opaque ``upload_id``) to its blob, so two
+users uploading ``BOM.xlsx`` no longer overwrite each other.  The column
+predictions computed for a blob are stored next to it: re-uploading an
+identical file returns them without parsing or predicting again.
+
+Files never have to fit in memory: ``put_stream`` copies a request body
+to disk in chunks while hashing it, and resumable *sessions* let a client
+send a large workbook as a series of ``MAX_CONTENT_LENGTH``-sized chunks
+(appended at an explicit offset, so an interrupted upload can continue
+where it stopped) up to ``UPLOAD_MAX_FILE_BYTES``.
+
+Disk use is bounded: blobs idle for longer than ``UPLOAD_MAX_AGE`` are
+collected, then least-recently-used ones until the store is under
+``UPLOAD_STORE_MAX_BYTES``.  Uploads pointing at a collected blob are
+dropped with it, and sessions that have received nothing for
+``UPLOAD_SESSION_TTL``.
+
+Exports a singleton: upload_store
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Any, Dict, NamedTuple, Optional, Union
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256       TEXT PRIMARY KEY,
+    size         INTEGER NOT NULL,
+    created      REAL NOT NULL,
+    last_access  REAL NOT NULL,
+    result_json  TEXT
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    upload_id  TEXT PRIMARY KEY,
+    sha256     TEXT NOT NULL REFERENCES blobs (sha256),
+    file_name  TEXT NOT NULL,
+    created    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+CREATE INDEX IF NOT EXISTS uploads_file_name ON uploads (file_name, created);
+"""
+
+
+CHUNK_SIZE = 1 << 20  # bytes copied per read when streaming to disk
+
+
+class UploadTooLarge(ValueError):
+    """The file would exceed ``UPLOAD_MAX_FILE_BYTES``."""
+
+
+class UploadOffsetMismatch(ValueError):
+    """A session chunk did not start where the stored data ends."""
+
+    def __init__(self, offset: int) -> None:
+        super().__init__(f"Upload offset mismatch – expected {offset}")
+        self.offset = offset
+
+
+class Upload(NamedTuple):
+    upload_id: str
+    sha256: str
+    file_name: str
+    path: Path
+    result: Optional[Dict[str, Any]]  # cached /upload response body, if any
+
+
+class _UploadStore:
+    def __init__(
+        self,
+        root: Optional[Union[str, Path]] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[int] = None,
+    ) -> None:
+        self.root = Path(root) if root else settings.UPLOAD_DIR
+        self.max_bytes = max_bytes or settings.UPLOAD_STORE_MAX_BYTES
+        self.max_age = max_age if max_age is not None else settings.UPLOAD_MAX_AGE
+        self.max_file_bytes = settings.UPLOAD_MAX_FILE_BYTES
+        self.session_ttl = settings.UPLOAD_SESSION_TTL
+        self._local = threading.local()
+        self._lock = threading.Lock()  # serialises blob (de)registration
+        self._session_locks: Dict[str, threading.Lock] = {}
+
+    # ------------------------------------------------------------ sqlite ---- #
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "root", None) != self.root:
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.root / "index.sqlite3"), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.root = conn, self.root
+        return conn
+
+    def blob_path(self, sha256: str) -> Path:
+        # no extension: the Excel reader sniffs the format from the bytes
+        return self.root / "blobs" / sha256[:2] / sha256
+
+    @property
+    def incoming(self) -> Path:
+        return self.root / "incoming"
+
+    def _copy(
+        self, stream: IO[bytes], fh: IO[bytes], written: int, digest=None, limit: Optional[int] = None
+    ) -> int:
+        """Copy *stream* into *fh* chunk by chunk; return the new total size."""
+        limit = min(limit or self.max_file_bytes, self.max_file_bytes)
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            written += len(chunk)
+            if written > limit:
+                raise UploadTooLarge(f"File exceeds {limit} bytes")
+            fh.write(chunk)
+            if digest is not None:
+                digest.update(chunk)
+        return written
+
+    # ------------------------------------------------------------ public ---- #
+    def put_bytes(self, raw: bytes, file_name: str) -> Upload:
+        """Store *raw* (once per content hash) and register a new upload of it."""
+        sha256 = hashlib.sha256(raw).hexdigest()
+        path = self.blob_path(sha256)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            tmp.write_bytes(raw)
+            os.replace(tmp, path)
+        return self._register(sha256, len(raw), file_name)
+
+    def put_stream(self, stream: IO[bytes], file_name: str) -> Upload:
+        """Like ``put_bytes`` but copies *stream* to disk, hashing as it goes."""
+        self.incoming.mkdir(parents=True, exist_ok=True)
+        tmp = self.incoming / f"{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as fh:
+                self._copy(stream, fh, 0, digest)
+            return self.put_file(tmp, digest.hexdigest(), file_name)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def put_file(self, tmp_path: Union[str, Path], sha256: str, file_name: str) -> Upload:
+        """Adopt an already hashed file (moved into place, or dropped if a duplicate)."""
+        tmp_path = Path(tmp_path)
+        path = self.blob_path(sha256)
+        size = tmp_path.stat().st_size
+        if path.exists():
+            tmp_path.unlink(missing_ok=True)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+        return self._register(sha256, size, file_name)
+
+    def _register(self, sha256: str, size: int, file_name: str) -> Upload:
+        now = time.time()
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO blobs (sha256, size, created, last_access) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (sha256) DO UPDATE SET last_access=excluded.last_access",
+                (sha256, size, now, now),
+            )
+            conn.execute(
+                "INSERT INTO uploads VALUES (?, ?, ?, ?)", (upload_id, sha256, file_name, now)
+            )
+            (result_json,) = conn.execute(
+                "SELECT result_json FROM blobs WHERE sha256=?", (sha256,)
+            ).fetchone()
+        self.gc()
+        return Upload(
+            upload_id,
+            sha256,
+            file_name,
+            self.blob_path(sha256),
+            json.loads(result_json) if result_json else None,
+        )
+
+    def get(self, upload_id: str) -> Optional[Upload]:
+        """Look an upload up by id (refreshes its blob's LRU stamp)."""
+        return self._find("u.upload_id=?", (upload_id,))
+
+    def latest(self, file_name: str) -> Optional[Upload]:
+        """Most recent upload with this original file name (legacy clients)."""
+        return self._find("u.file_name=? ORDER BY u.created DESC LIMIT 1", (file_name,))
+
+    def _find(self, where: str, params: tuple) -> Optional[Upload]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT u.upload_id, u.sha256, u.file_name, b.result_json "
+            f"FROM uploads u JOIN blobs b ON b.sha256 = u.sha256 WHERE {where}",
+            params,
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE blobs SET last_access=? WHERE sha256=?", (time.time(), row[1]))
+        upload_id, sha256, file_name, result_json = row
+        return Upload(
+            upload_id,
+            sha256,
+            file_name,
+            self.blob_path(sha256),
+            json.loads(result_json) if result_json else None,
+        )
+
+    # ---------------------------------------------------------- sessions ---- #
+    def _session_files(self, session_id: str):
+        if not session_id or not all(c in "0123456789abcdef" for c in session_id):
+            raise FileNotFoundError(f"Unknown upload session: {session_id!r}")
+        return self.incoming / f"{session_id}.json", self.incoming / f"{session_id}.part"
+
+    def begin(self, file_name: str, size: Optional[int] = None) -> Dict[str, Any]:
+        """Open a resumable upload session for *file_name* (*size* optional)."""
+        if size is not None and size > self.max_file_bytes:
+            raise UploadTooLarge(f"File exceeds {self.max_file_bytes} bytes")
+        session_id = uuid.uuid4().hex
+        meta_path, part_path = self._session_files(session_id)
+        self.incoming.mkdir(parents=True, exist_ok=True)
+        part_path.touch()
+        meta = {"session_id": session_id, "file_name": file_name, "size": size, "created": time.time()}
+        meta_path.write_text(json.dumps(meta))
+        return {**meta, "offset": 0}
+
+    def session(self, session_id: str) -> Dict[str, Any]:
+        """Session metadata plus the current ``offset`` (bytes received so far)."""
+        meta_path, part_path = self._session_files(session_id)
+        try:
+            meta = json.loads(meta_path.read_text())
+            return {**meta, "offset": part_path.stat().st_size}
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Unknown upload session: {session_id}") from None
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._lock:
+            return self._session_locks.setdefault(session_id, threading.Lock())
+
+    def append(self, session_id: str, offset: int, stream: IO[bytes]) -> int:
+        """Append a chunk that starts at *offset*; return the new offset."""
+        _, part_path = self._session_files(session_id)
+        with self._session_lock(session_id):
+            meta = self.session(session_id)
+            current = part_path.stat().st_size
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+            with open(part_path, "ab") as fh:
+                try:
+                    return self._copy(stream, fh, current, limit=meta["size"])
+                except UploadTooLarge:
+                    fh.truncate(current)  # drop the rejected chunk, keep the session
+                    raise
+
+    def finish(self, session_id: str) -> Upload:
+        """Close a session and register its file like any other upload."""
+        meta_path, part_path = self._session_files(session_id)
+        with self._session_lock(session_id):  # no chunk is being appended meanwhile
+            meta = self.session(session_id)
+            if meta["size"] is not None and meta["offset"] != meta["size"]:
+                raise UploadOffsetMismatch(meta["offset"])
+            from services.bom_cache import file_hash  # local import to avoid cycle
+
+            upload = self.put_file(part_path, file_hash(part_path), meta["file_name"])
+            meta_path.unlink(missing_ok=True)
+        with self._lock:
+            self._session_locks.pop(session_id, None)
+        return upload
+
+    def set_result(self, sha256: str, result: Dict[str, Any]) -> None:
+        """Remember the column predictions computed for a blob."""
+        self._conn().execute(
+            "UPDATE blobs SET result_json=? WHERE sha256=?", (json.dumps(result), sha256)
+        )
+
+    def gc(self) -> int:
+        """Collect blobs older than ``max_age`` then LRU beyond ``max_bytes``; return count."""
+        with self._lock:
+            conn = self._conn()
+            rows = conn.execute(
+                "SELECT sha256, size, last_access FROM blobs ORDER BY last_access DESC"
+            ).fetchall()
+            cutoff = time.time() - self.max_age if self.max_age else None
+            total, doomed = 0, []
+            for sha256, size, last_access in rows:
+                # the newest blob never counts against the size bound
+                if doomed or (total and total + size > self.max_bytes) or (
+                    cutoff is not None and last_access < cutoff
+                ):
+                    doomed.append(sha256)
+                else:
+                    total += size
+            for sha256 in doomed:
+                conn.execute("DELETE FROM uploads WHERE sha256=?", (sha256,))
+                conn.execute("DELETE FROM blobs WHERE sha256=?", (sha256,))
+                self.blob_path(sha256).unlink(missing_ok=True)
+            if self.incoming.exists():
+                self._collect_sessions()
+        if doomed:
+            logger.info("Upload store GC removed %d blob(s)", len(doomed))
+        return len(doomed)
+
+    def _collect_sessions(self) -> None:
+        """
+        Drop session (and stray temp) files idle for ``session_ttl``, judged by
+        each session's newest file, so a session still receiving chunks stays.
+        """
+        active: Dict[str, float] = {}
+        files = []
+        for p in self.incoming.iterdir():
+            try:
+                mtime = p.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            key = p.name.split(".", 1)[0]
+            active[key] = max(active.get(key, 0.0), mtime)
+            files.append((key, p))
+        stale = time.time() - self.session_ttl
+        for key, p in files:
+            lock = self._session_locks.get(key)
+            if active[key] < stale and not (lock is not None and lock.locked()):
+                p.unlink(missing_ok=True)
+                self._session_locks.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        (blobs, size), (uploads,) = (
+            self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone(),
+            self._conn().execute("SELECT COUNT(*) FROM uploads").fetchone(),
+        )
+        return {"blobs": blobs, "bytes": size, "uploads": uploads}
+
+
+# --------------------------------------------------------------- singleton #
+upload_store = _UploadStore()
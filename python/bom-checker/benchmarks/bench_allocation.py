@@ -0,0 +1,75 @@
+"""
+Benchmark: cross-vendor purchase allocation (``allocator.optimize``) across
+BOM sizes, against buying every line from its cheapest single in-stock vendor.
+
+    python benchmarks/bench_allocation.py [100 1000 5000 20000]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "app"))
+
+from services.allocation import allocator  # noqa: E402
+from services.multi_vendor import unit_price_at  # noqa: E402
+
+VENDORS = ("DigiKey", "Mouser")
+
+
+def make_lines(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(n):
+        need = int(rng.choice([1, 10, 50, 200, 1000, 5000]))
+        offers = []
+        for vendor in VENDORS:
+            qs = sorted(rng.choice([1, 10, 25, 100, 250, 1000, 2500, 10000], rng.integers(1, 8), replace=False))
+            base = float(rng.uniform(0.01, 20))
+            offers.append({
+                "vendor": vendor,
+                "quantity_available": int(rng.choice([0, need // 2, need * 2, 100_000])),
+                "minimum_order_quantity": int(rng.choice([1, 1, 10, 100])),
+                "lead_time_weeks": int(rng.integers(1, 30)),
+                "price_breaks": [{"quantity": int(q), "price": base * 0.9 ** k} for k, q in enumerate(qs)],
+            })
+        lines.append({"row_index": i, "quantity": need, "offers": offers})
+    return lines
+
+
+def cheapest_single(lines: list) -> float:
+    total = 0.0
+    for line in lines:
+        q = line["quantity"]
+        costs = []
+        for o in line["offers"]:
+            if o["quantity_available"] >= q:
+                n = max(q, o["minimum_order_quantity"])
+                costs.append(n * unit_price_at(o["price_breaks"], n))
+        total += min(costs, default=0.0)
+    return total
+
+
+def main(sizes) -> None:
+    print(f"{'lines':>8} {'optimize (ms)':>14} {'split':>6} {'unfilled':>9} {'single-vendor':>14} {'optimized':>12}")
+    for n in sizes:
+        lines = make_lines(n)
+        allocator.optimize(lines[:10])  # warm-up
+        started = time.perf_counter()
+        result = allocator.optimize(lines)
+        elapsed = (time.perf_counter() - started) * 1000
+        # like-for-like: only lines a single vendor can fill
+        single_ok = {
+            line["row_index"] for line in lines
+            if any(o["quantity_available"] >= line["quantity"] for o in line["offers"])
+        }
+        optimized = sum(line["cost"] for line in result["lines"] if line["row_index"] in single_ok)
+        print(
+            f"{n:>8} {elapsed:>14.1f} {result['split_lines']:>6} {len(result['unallocated']):>9} "
+            f"{cheapest_single(lines):>14.2f} {optimized:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 5000, 20000])
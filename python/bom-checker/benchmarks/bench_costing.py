@@ -0,0 +1,63 @@
+"""
+Benchmark: BOM cost sweep (1 … 100k boards) with a per-line Python loop vs
+the vectorised ``costing_engine``.
+
+    python benchmarks/bench_costing.py [500 5000 20000]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "app"))
+
+from services.costing import DEFAULT_BUILD_QUANTITIES, costing_engine  # noqa: E402
+from services.multi_vendor import unit_price_at  # noqa: E402
+
+
+def make_lines(n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    lines = []
+    for _ in range(n):
+        qs = sorted(rng.choice([1, 10, 25, 100, 250, 1000, 2500, 10000], rng.integers(1, 8), replace=False))
+        base = float(rng.uniform(0.01, 20))
+        lines.append({
+            "quantity": int(rng.integers(1, 30)),
+            "minimum_order_quantity": int(rng.choice([1, 10, 100, 2500])),
+            "price_breaks": [{"quantity": int(q), "price": base * 0.9 ** i} for i, q in enumerate(qs)],
+        })
+    return lines
+
+
+def loop_sweep(lines: list) -> list:
+    totals = []
+    for boards in DEFAULT_BUILD_QUANTITIES:
+        total = 0.0
+        for line in lines:
+            order = max(line["quantity"] * boards, line["minimum_order_quantity"])
+            total += order * unit_price_at(line["price_breaks"], order)
+        totals.append(total)
+    return totals
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes) -> None:
+    print(f"{'lines':>8} {'loop (ms)':>10} {'vectorised (ms)':>16} {'speed-up':>9}")
+    for n in sizes:
+        lines = make_lines(n)
+        slow = best_of(lambda: loop_sweep(lines), repeat=1)
+        fast = best_of(lambda: costing_engine.evaluate(lines))
+        print(f"{n:>8} {slow * 1e3:>10.1f} {fast * 1e3:>16.1f} {slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [500, 5_000, 20_000])
@@ -0,0 +1,53 @@
+"""
+Benchmark: time to the first stream row – parse the whole sheet and build
+every row (``clean_excel_file`` + ``build_stream_rows``) vs the lazy
+``iter_stream_rows`` a pipelined stream reads from.
+
+    python benchmarks/bench_pipeline.py [1000 10000 50000]
+"""
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "app"))
+
+from bench_stream_rows import best_of, make_bom  # noqa: E402
+from services.excel_service import (  # noqa: E402
+    build_stream_rows,
+    clean_excel_file,
+    iter_stream_rows,
+)
+
+COLUMNS = ("MPN", "Manufacturer", "Qty", "Reference")
+
+
+def workbook(n: int) -> bytes:
+    buf = io.BytesIO()
+    make_bom(n).to_excel(buf, engine="openpyxl", index=False)
+    return buf.getvalue()
+
+
+def eager_first(raw: bytes) -> dict:
+    return build_stream_rows(clean_excel_file(raw), *COLUMNS)[0]
+
+
+def lazy_first(raw: bytes) -> dict:
+    rows = iter_stream_rows(raw, *COLUMNS)
+    try:
+        return next(rows)
+    finally:
+        rows.close()
+
+
+def main(sizes) -> None:
+    print(f"{'rows':>8} {'whole sheet (s)':>16} {'pipelined (s)':>14}")
+    for n in sizes:
+        raw = workbook(n)
+        eager = best_of(lambda: eager_first(raw), repeat=1 if n > 20000 else 3)
+        lazy = best_of(lambda: lazy_first(raw))
+        print(f"{n:>8} {eager:>16.3f} {lazy:>14.3f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 50_000])
@@ -0,0 +1,102 @@
+"""
+Benchmark: encoding a 10k-row look-up stream.
+
+    before – a ``progress`` event after every row; each stored payload
+             parsed and re-encoded with stdlib json, one chunk per line
+    after  – throttled ``progress`` (``lookup_events``), lines spliced from
+             the stored payload text, one chunk per batch of 500 events
+             (``encode_stream``), optionally gzip-flushed per chunk;
+             MessagePack frames when msgpack is installed, spliced from
+             the logged packed bytes (or parsed from the JSON text)
+
+A second table times turning cache-hit records into job-log text: a
+re-serialised dict vs the ``PreEncoded`` record the part cache returns.
+
+    python benchmarks/bench_stream_encoding.py [10000]
+"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "app"))
+
+from core.config import settings  # noqa: E402
+from services.jobs import lookup_events  # noqa: E402
+from services.event_encoding import (  # noqa: E402
+    MSGPACK,
+    dumps,
+    encode_payload,
+    encode_stream,
+    loads,
+    pack_payload,
+    stream_formats,
+)
+from services.part_cache import _PartCache  # noqa: E402
+
+BATCH = 500  # rows per job-log read (job_manager.events limit)
+
+
+def part(i: int) -> dict:
+    return {
+        "mpn": f"RC0603FR-07{i}KL", "manufacturer": "Yageo", "description": "RES 10K OHM 1% 1/10W 0603",
+        "digikey_pn": f"311-{i}-1-ND", "status": "In Stock", "quantity_available": 1000 + i,
+        "price": 0.1, "minimum_order_quantity": 1, "lead_time_weeks": 12, "row_index": i,
+        "price_breaks": [{"quantity": q, "price": round(0.1 / (k + 1), 4)} for k, q in enumerate((1, 10, 100, 1000))],
+    }
+
+
+def stored_events(n: int, throttled: bool) -> list:
+    """``(seq, event, payload JSON)`` as the job log holds them."""
+    if not throttled:
+        settings.STREAM_PROGRESS_EVERY, settings.STREAM_PROGRESS_INTERVAL = 1, 0
+    rows = [{"row_index": i, "mpns": [f"P{i}"]} for i in range(n)]
+    events = lookup_events(rows, lambda row: iter([("found", part(row["row_index"]))]), "DigiKey")
+    out = [(seq, event, json.dumps(p) if not throttled else dumps(p).decode())
+           for seq, (event, p) in enumerate(events, 1)]
+    settings.STREAM_PROGRESS_EVERY, settings.STREAM_PROGRESS_INTERVAL = 50, 0.25
+    return out
+
+
+def before(log: list):
+    for seq, event, payload in log:
+        yield json.dumps({"event": event, "data": json.loads(payload), "offset": seq}) + "\n"
+
+
+def main(n: int) -> None:
+    old_log, new_log = stored_events(n, False), stored_events(n, True)
+    batches = [new_log[i:i + BATCH] for i in range(0, len(new_log), BATCH)]
+    print(f"{'encoder':<14} {'events':>7} {'chunks':>7} {'bytes':>10} {'cpu (ms)':>9}")
+    encoders = [
+        ("before", lambda: (s.encode() for s in before(old_log))),
+        ("after", lambda: encode_stream(batches, with_offset=True)),
+        ("after + gzip", lambda: encode_stream(batches, with_offset=True, gzip=True)),
+    ]
+    if MSGPACK in stream_formats():
+        packed = [[(seq, event, pack_payload(loads(p))) for seq, event, p in b] for b in batches]
+        encoders += [
+            ("msgpack (json)", lambda: encode_stream(batches, with_offset=True, mimetype=MSGPACK)),
+            ("msgpack", lambda: encode_stream(packed, with_offset=True, mimetype=MSGPACK)),
+        ]
+    for name, make in encoders:
+        started = time.process_time()
+        chunks = list(make())
+        cpu = (time.process_time() - started) * 1000
+        events = len(old_log) if name == "before" else len(new_log)
+        print(f"{name:<14} {events:>7} {len(chunks):>7} {sum(map(len, chunks)):>10} {cpu:>9.1f}")
+
+    cache = _PartCache(path=Path(tempfile.mkdtemp()) / "bench.sqlite3", enabled=True)
+    for i in range(n):
+        cache.put("DigiKey", f"P{i}", None, part(i))
+    hits = [cache.get("DigiKey", f"P{i}").record for i in range(n)]
+    print(f"\n{'cache hit → log':<16} {'cpu (ms)':>9}")
+    for name, records in (("re-serialised", [dict(r) for r in hits]), ("pre-encoded", hits)):
+        started = time.process_time()
+        for record in records:
+            encode_payload(record)
+        print(f"{name:<16} {(time.process_time() - started) * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,81 @@
+"""
+Benchmark: building /api/process-bom rows with ``iterrows()`` vs the
+vectorised ``build_stream_rows``.
+
+    python benchmarks/bench_stream_rows.py [1000 10000 100000]
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend" / "app"))
+
+from services.excel_service import build_stream_rows  # noqa: E402
+
+
+def make_bom(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    mpn = np.array([f"RC0603FR-07{i}L" for i in range(n)], dtype=object)
+    mpn[rng.random(n) < 0.05] = np.nan
+    multi = rng.random(n) < 0.1
+    mpn[multi] = [f"{m}, ALT{i}" for i, m in enumerate(mpn[multi])]
+    qty = rng.integers(0, 50, n).astype(object)
+    qty[rng.random(n) < 0.05] = "10 pcs"
+    return pd.DataFrame(
+        {
+            "MPN": mpn,
+            "Manufacturer": rng.choice(["Yageo", " Texas Instruments ", None], n),
+            "Qty": qty,
+            "Reference": [f"R{i}" for i in range(n)],
+        }
+    )
+
+
+def iterrows_rows(df: pd.DataFrame) -> list:
+    """The pre-vectorisation loop (minus its per-row debug print)."""
+    rows = []
+    for idx, row in df.iterrows():
+        mpn_cell = row.get("MPN")
+        if mpn_cell is None or (isinstance(mpn_cell, float) and np.isnan(mpn_cell)):
+            continue
+        mpns = [m.strip() for m in str(mpn_cell).split(",") if m.strip()]
+        manuf = str(row.get("Manufacturer")).strip() if row.get("Manufacturer") else None
+        qty_val = None
+        if pd.notna(row["Qty"]):
+            try:
+                qty_val = int(float(row["Qty"]))
+            except ValueError:
+                qty_val = None
+        rows.append({
+            "row_index": int(idx),
+            "mpns": mpns,
+            "manufacturer": manuf,
+            "quantity": qty_val or 1,
+            "reference": row["Reference"] if row.get("Reference") is not None else None,
+        })
+    return rows
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(sizes) -> None:
+    print(f"{'rows':>8} {'iterrows (s)':>13} {'vectorised (s)':>15} {'speed-up':>9}")
+    for n in sizes:
+        df = make_bom(n)
+        slow = best_of(lambda: iterrows_rows(df), repeat=1 if n > 20000 else 3)
+        fast = best_of(lambda: build_stream_rows(df, "MPN", "Manufacturer", "Qty", "Reference"))
+        print(f"{n:>8} {slow:>13.3f} {fast:>15.3f} {slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
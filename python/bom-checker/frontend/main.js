@@ -17,9 +17,10 @@ export const API_BASE_URL = isLocal
 // -- App-wide state
 const state = {
   fileName: null,
+  uploadId: null,
   columns: [],
   selectedMappings: {},
-  rows: [],
+  bomId: null,
   progress: {
     digikey: { total: 0, processed: 0, found: 0, not_found: 0 },
     mouser: { total: 0, processed: 0, found: 0, not_found: 0 },
@@ -90,11 +91,16 @@ const api = {
     if (!r.ok) throw new Error((await r.json()).error || "Upload failed");
     return await r.json();
   },
-  async processBOM(fileName, columns) {
+  async processBOM(uploadId, fileName, columns) {
     const r = await fetch(`${API_BASE_URL}/process-bom`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ file_name: fileName, columns }),
+      body: JSON.stringify({
+        upload_id: uploadId,
+        file_name: fileName,
+        columns,
+        include_rows: false, // rows stay server-side; streams take the bom_id
+      }),
     });
     if (!r.ok) throw new Error((await r.json()).error || "Processing failed");
     return await r.json();
@@ -190,6 +196,7 @@ function initUpload() {
     try {
       const res = await api.uploadFile(file);
       state.fileName = res.file_name;
+      state.uploadId = res.upload_id;
       state.columns = res.columns;
       renderColumnCards();
       elements.uploadSection.style.display = "none";
@@ -275,8 +282,8 @@ function initMappingBtns() {
       return;
     }
     try {
-      const res = await api.processBOM(state.fileName, cols);
-      state.rows = res.rows || [];
+      const res = await api.processBOM(state.uploadId, state.fileName, cols);
+      state.bomId = res.bom_id;
       state.results = {
         found: [],
         notFound: [],
@@ -297,7 +304,7 @@ function initMappingBtns() {
 /* ---------- streaming helpers ---------- */
 function streamAllResults() {
   elements.mouserResults.style.display = "block";
-  const req = { rows: state.rows };
+  const req = { bom_id: state.bomId };
 
   /* --- helpers to collect row-level errors --- */
   const dkErrors = [];
@@ -320,6 +327,7 @@ function streamAllResults() {
     progress: (d) => updateAggregate("digikey", d),
     found: (d) => renderPartCard(d, elements.foundPartsContainer),
     not_found: (d) => renderPartCard(d, elements.notFoundPartsContainer, true),
+    substitutes: (d) => attachSubstitutes(d, elements.notFoundPartsContainer),
     error: (d) => {
       // row-level error already includes mpn + error string
       dkErrors.push(d);
@@ -514,83 +522,102 @@ function renderPartCard(part, container, isNotFound = false) {
   }
 
   // Add substitutes if available and not found/out of stock
+  const cardRoot = card.firstElementChild;
+  if (part.digikey_pn) cardRoot.dataset.digikeyPn = part.digikey_pn;
+  if (part.row_index != null) cardRoot.dataset.rowIndex = part.row_index;
   if (isNotFound && part.substitutes && part.substitutes.length > 0) {
-    const substitutesElement = card.querySelector(".part-substitutes");
-    substitutesElement.style.display = "block";
+    renderSubstitutes(cardRoot, part.substitutes);
+  }
 
-    const substitutesContainer = substitutesElement.querySelector(
-      ".substitutes-container"
-    );
+  container.appendChild(card);
+  console.log("Added card to container, new count:", container.children.length);
+}
 
-    part.substitutes.forEach((sub) => {
-      const subCard = elements.substituteCardTemplate.content.cloneNode(true);
-
-      // Set substitute MPN
-      let subMpnValue = "Unknown Part";
-      if (sub.mpn) {
-        subMpnValue = sub.mpn;
-      } else if (sub.manufacturerPN) {
-        subMpnValue = sub.manufacturerPN;
-      } else if (sub.ManufacturerPartNumber) {
-        subMpnValue = sub.ManufacturerPartNumber;
-      }
-      subCard.querySelector(".substitute-mpn").textContent = subMpnValue;
+// Render substitute cards into a part card (inline or from a later `substitutes` event)
+function renderSubstitutes(cardRoot, substitutes) {
+  const substitutesElement = cardRoot.querySelector(".part-substitutes");
+  substitutesElement.style.display = "block";
 
-      const subStatusElement = subCard.querySelector(".substitute-status");
-      subStatusElement.textContent = sub.status || "Unknown";
+  const substitutesContainer = substitutesElement.querySelector(
+    ".substitutes-container"
+  );
 
-      if (sub.status === "In Stock") {
-        subStatusElement.classList.add("in-stock");
-      } else {
-        subStatusElement.classList.add("out-of-stock");
-      }
+  substitutes.forEach((sub) => {
+    const subCard = elements.substituteCardTemplate.content.cloneNode(true);
+
+    // Set substitute MPN
+    let subMpnValue = "Unknown Part";
+    if (sub.mpn) {
+      subMpnValue = sub.mpn;
+    } else if (sub.manufacturerPN) {
+      subMpnValue = sub.manufacturerPN;
+    } else if (sub.ManufacturerPartNumber) {
+      subMpnValue = sub.ManufacturerPartNumber;
+    }
+    subCard.querySelector(".substitute-mpn").textContent = subMpnValue;
 
-      // Set substitute manufacturer
-      let subManufacturerValue = "Not specified";
-      if (sub.manufacturer) {
-        subManufacturerValue = sub.manufacturer;
-      } else if (sub.Manufacturer && sub.Manufacturer.Name) {
-        subManufacturerValue = sub.Manufacturer.Name;
-      } else if (sub.Manufacturer && sub.Manufacturer.Value) {
-        subManufacturerValue = sub.Manufacturer.Value;
-      }
-      subCard.querySelector(".substitute-manufacturer").textContent =
-        subManufacturerValue;
-
-      // Set substitute description
-      let subDescription = "No description available";
-      if (sub.description) {
-        subDescription = sub.description;
-      } else if (sub.Description && sub.Description.ProductDescription) {
-        subDescription = sub.Description.ProductDescription;
-      } else if (sub.ProductDescription) {
-        subDescription = sub.ProductDescription;
-      }
-      subCard.querySelector(".substitute-description").textContent =
-        subDescription;
-
-      // Handle price formatting for substitutes too
-      let subPrice = 0;
-      if (typeof sub.price === "number") {
-        subPrice = sub.price;
-      } else if (
-        typeof sub.price === "string" &&
-        !isNaN(parseFloat(sub.price))
-      ) {
-        subPrice = parseFloat(sub.price);
-      } else if (sub.UnitPrice !== undefined) {
-        subPrice = sub.UnitPrice;
-      }
-      subCard.querySelector(
-        ".substitute-price"
-      ).textContent = `$${subPrice.toFixed(2)}`;
+    const subStatusElement = subCard.querySelector(".substitute-status");
+    subStatusElement.textContent = sub.status || "Unknown";
 
-      substitutesContainer.appendChild(subCard);
-    });
-  }
+    if (sub.status === "In Stock") {
+      subStatusElement.classList.add("in-stock");
+    } else {
+      subStatusElement.classList.add("out-of-stock");
+    }
 
-  container.appendChild(card);
-  console.log("Added card to container, new count:", container.children.length);
+    // Set substitute manufacturer
+    let subManufacturerValue = "Not specified";
+    if (sub.manufacturer) {
+      subManufacturerValue = sub.manufacturer;
+    } else if (sub.Manufacturer && sub.Manufacturer.Name) {
+      subManufacturerValue = sub.Manufacturer.Name;
+    } else if (sub.Manufacturer && sub.Manufacturer.Value) {
+      subManufacturerValue = sub.Manufacturer.Value;
+    }
+    subCard.querySelector(".substitute-manufacturer").textContent =
+      subManufacturerValue;
+
+    // Set substitute description
+    let subDescription = "No description available";
+    if (sub.description) {
+      subDescription = sub.description;
+    } else if (sub.Description && sub.Description.ProductDescription) {
+      subDescription = sub.Description.ProductDescription;
+    } else if (sub.ProductDescription) {
+      subDescription = sub.ProductDescription;
+    }
+    subCard.querySelector(".substitute-description").textContent =
+      subDescription;
+
+    // Handle price formatting for substitutes too
+    let subPrice = 0;
+    if (typeof sub.price === "number") {
+      subPrice = sub.price;
+    } else if (
+      typeof sub.price === "string" &&
+      !isNaN(parseFloat(sub.price))
+    ) {
+      subPrice = parseFloat(sub.price);
+    } else if (sub.UnitPrice !== undefined) {
+      subPrice = sub.UnitPrice;
+    }
+    subCard.querySelector(
+      ".substitute-price"
+    ).textContent = `$${subPrice.toFixed(2)}`;
+
+    substitutesContainer.appendChild(subCard);
+  });
+}
+
+// `substitutes` arrives after the row's `not_found`; attach it to that row's
+// card (a BOM can list the same Digi-Key part on several rows)
+function attachSubstitutes(d, container) {
+  if (!d.substitutes || !d.substitutes.length) return;
+  const cardRoot = container.querySelector(
+    `[data-row-index="${CSS.escape(String(d.row_index))}"]` +
+      `[data-digikey-pn="${CSS.escape(d.digikey_pn)}"]`
+  );
+  if (cardRoot) renderSubstitutes(cardRoot, d.substitutes);
 }
 
 // Initialize tab switching
@@ -7,8 +7,9 @@ backend_root = Path(__file__).resolve().parents[1] / "backend" / "app"
 sys.path.insert(0, str(backend_root))
 # ------------------------------------------------------
 
+import json
 from pathlib import Path
-from typing import Iterator
+from typing import Any, Dict, Iterator, List
 
 import pytest
 from faker import Faker
@@ -17,6 +18,12 @@ from flask import Flask
 from backend.app.main import app as flask_app          # your real Flask app
 from backend.app.services.digikey_service import digikey_service
 from backend.app.services.mouser_service import mouser_service
+from services.bom_cache import bom_cache
+from services.bom_sessions import bom_sessions
+from services.digikey_service import digikey_service as services_digikey  # the instance main.py uses
+from services.jobs import job_manager
+from services.part_cache import part_cache  # the instance the services import
+from services.upload_store import upload_store
 
 
 @pytest.fixture(scope="session")
@@ -39,5 +46,52 @@ def _isolate_tokens(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     """
     tmp_tokens = tmp_path / "tokens"
     tmp_tokens.mkdir()
-    monkeypatch.setattr(digikey_service, "TOKEN_FILE", tmp_tokens / "dk_token.json", raising=False)
+    for dk in (digikey_service, services_digikey):
+        monkeypatch.setattr(dk.tokens, "path", tmp_tokens / "dk_token.json")
     monkeypatch.setattr(mouser_service, "TOKEN_FILE", tmp_tokens / "ms_token.json", raising=False)
+
+
+@pytest.fixture(autouse=True)
+def _isolate_part_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Give every test its own empty on-disk part cache."""
+    monkeypatch.setattr(part_cache, "path", tmp_path / "part_cache.sqlite3")
+
+
+@pytest.fixture(autouse=True)
+def _isolate_bom_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep parsed-BOM artifacts in a per-test directory."""
+    monkeypatch.setattr(bom_cache, "root", tmp_path / "boms")
+
+
+@pytest.fixture(autouse=True)
+def _isolate_upload_store(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Uploads land in a per-test content-addressed store."""
+    monkeypatch.setattr(upload_store, "root", tmp_path / "uploads")
+
+
+@pytest.fixture(autouse=True)
+def _isolate_jobs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Job event logs go to a per-test database."""
+    monkeypatch.setattr(job_manager, "path", tmp_path / "jobs.sqlite3")
+
+
+@pytest.fixture(autouse=True)
+def _isolate_bom_sessions(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Processed-BOM sessions go to a per-test database."""
+    monkeypatch.setattr(bom_sessions, "path", tmp_path / "bom_sessions.sqlite3")
+
+
+# ------------------------------------------------------- shared helpers ---- #
+def make_rows(n: int) -> List[Dict[str, Any]]:
+    """*n* one-MPN stream rows (``P0`` … ``P{n-1}``), numbered from 0."""
+    return [{"row_index": i, "mpns": [f"P{i}"], "manufacturer": None} for i in range(n)]
+
+
+def ndjson_lines(resp) -> List[Dict[str, Any]]:
+    """The events of an NDJSON stream response (reads the whole body)."""
+    return [json.loads(line) for line in resp.data.decode().splitlines() if line.strip()]
+
+
+def found_handler(row: Dict[str, Any]) -> Iterator:
+    """Row handler that finds the row's first MPN at once."""
+    yield "found", {"mpn": row["mpns"][0], "row_index": row["row_index"], "source": "DigiKey"}
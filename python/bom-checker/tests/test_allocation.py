@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+import pytest
+
+from services.allocation import allocator
+from services.multi_vendor import unit_price_at
+from services.part_cache import part_cache
+
+
+def _offer(vendor, stock, breaks, moq=1, lead=None):
+    return {
+        "vendor": vendor,
+        "quantity_available": stock,
+        "minimum_order_quantity": moq,
+        "lead_time_weeks": lead,
+        "price_breaks": [{"quantity": q, "price": p} for q, p in breaks],
+    }
+
+
+def _cost(offer, x):
+    if x == 0:
+        return 0.0
+    if x > offer["quantity_available"]:
+        return float("inf")
+    n = max(x, offer["minimum_order_quantity"])
+    return n * unit_price_at(offer["price_breaks"], n)
+
+
+def test_matches_brute_force_over_every_split():
+    rng = np.random.default_rng(3)
+    lines = []
+    for i in range(60):
+        offers = []
+        for vendor in ("DigiKey", "Mouser"):
+            qs = sorted(rng.choice([1, 5, 10, 25, 50], rng.integers(1, 4), replace=False))
+            breaks = [(int(q), round(float(rng.uniform(0.5, 2)) * 0.8 ** k, 3)) for k, q in enumerate(qs)]
+            offers.append(_offer(vendor, int(rng.integers(0, 60)), breaks, int(rng.choice([1, 5, 20]))))
+        lines.append({"row_index": i, "quantity": int(rng.integers(1, 50)), "offers": offers})
+
+    out = allocator.optimize(lines, vendors=["DigiKey", "Mouser"])
+
+    got = {line["row_index"]: line["cost"] for line in out["lines"]}
+    for line in lines:
+        dk, mo = line["offers"]
+        q = line["quantity"]
+        best = min(_cost(dk, x) + _cost(mo, q - x) for x in range(q + 1))
+        if best == float("inf"):
+            assert line["row_index"] in {u["row_index"] for u in out["unallocated"]}
+        else:
+            assert got[line["row_index"]] == pytest.approx(best, abs=1e-6)
+
+
+def test_split_when_no_vendor_has_enough_stock():
+    line = {"quantity": 100, "offers": [
+        _offer("DigiKey", 60, [(1, 1.0)]), _offer("Mouser", 70, [(1, 2.0)]),
+    ]}
+    out = allocator.optimize([line], vendors=["DigiKey", "Mouser"])
+    allocations = out["lines"][0]["allocations"]
+    assert out["split_lines"] == 1
+    assert [(a["vendor"], a["quantity"]) for a in allocations] == [("DigiKey", 60), ("Mouser", 40)]
+    assert out["total_cost"] == 140.0
+
+
+def test_backorders_respect_lead_time_limit():
+    line = {"quantity": 10, "offers": [
+        _offer("DigiKey", 0, [(1, 1.0)], lead=12), _offer("Mouser", 0, [(1, 2.0)], lead=4),
+    ]}
+    vendors = ["DigiKey", "Mouser"]
+    assert allocator.optimize([line], vendors)["unallocated"][0]["reason"] == "no usable offers"
+
+    out = allocator.optimize([line], vendors, max_lead_time_weeks=8, allow_backorder=True)
+    (alloc,) = out["lines"][0]["allocations"]
+    assert (alloc["vendor"], alloc["from_stock"]) == ("Mouser", False)
+
+
+def test_vendor_fee_consolidates_orders():
+    lines = [
+        {"quantity": 10, "offers": [_offer("DigiKey", 100, [(1, 1.0)]), _offer("Mouser", 100, [(1, 0.9)])]},
+        {"quantity": 10, "offers": [_offer("DigiKey", 100, [(1, 1.0)]), _offer("Mouser", 100, [(1, 1.1)])]},
+    ]
+    vendors = ["DigiKey", "Mouser"]
+    assert set(allocator.optimize(lines, vendors)["vendor_totals"]) == {"DigiKey", "Mouser"}
+
+    out = allocator.optimize(lines, vendors, vendor_fees={"Mouser": 5})
+    assert out["vendor_totals"] == {"DigiKey": 20.0}
+    assert out["fees"] == 0
+
+
+def test_offers_default_to_part_cache():
+    part_cache.put("DigiKey", "ABC", None, {
+        "mpn": "ABC", "digikey_pn": "ABC-ND", "quantity_available": 500,
+        "price_breaks": [{"quantity": 1, "price": 0.2}], "minimum_order_quantity": 1,
+    })
+    out = allocator.optimize([{"mpns": ["XYZ", "ABC"], "quantity": 5}], vendors=["DigiKey", "Mouser"])
+    (alloc,) = out["lines"][0]["allocations"]
+    assert (alloc["vendor"], alloc["vendor_pn"], alloc["extended_cost"]) == ("DigiKey", "ABC-ND", 1.0)
+
+
+def test_thousands_of_lines_within_budget():
+    rng = np.random.default_rng(0)
+    lines = [
+        {"quantity": int(q), "offers": [
+            _offer("DigiKey", int(s), [(1, 0.1), (100, 0.05), (1000, 0.03)], 10),
+            _offer("Mouser", 5000, [(1, 0.12), (500, 0.04)], 1, lead=6),
+        ]}
+        for q, s in zip(rng.integers(1, 3000, 5000), rng.integers(0, 2000, 5000))
+    ]
+    allocator.optimize(lines[:10])  # warm-up
+    start = time.perf_counter()
+    out = allocator.optimize(lines, vendors=["DigiKey", "Mouser"])
+    assert len(out["lines"]) + len(out["unallocated"]) == 5000
+    assert time.perf_counter() - start < 1.0  # typically ~0.2 s
+
+
+def test_allocate_endpoint(test_client):
+    body = {"lines": [{"row_index": 7, "quantity": 10, "offers": [
+        _offer("DigiKey", 100, [(1, 1.0)]), _offer("Mouser", 100, [(1, 0.5)]),
+    ]}]}
+    r = test_client.post("/api/allocate", json=body)
+    assert r.status_code == 200
+    assert r.json["lines"][0]["row_index"] == 7
+    assert r.json["vendor_totals"] == {"Mouser": 5.0}
+    assert test_client.post("/api/allocate", json={}).status_code == 400
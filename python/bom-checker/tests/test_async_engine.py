@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+from backend.app.services import mouser_service as mouser_module
+from backend.app.services.async_engine import _AsyncLookupEngine
+from backend.app.services.mouser_service import mouser_service
+from core.config import settings  # the instance the services read
+from tests.conftest import make_rows
+
+
+def test_hundreds_of_lookups_share_one_loop():
+    async def handler(row):
+        await asyncio.sleep(0.2)
+        yield "found", {"mpn": row["mpns"][0]}
+
+    start = time.monotonic()
+    events = list(_AsyncLookupEngine().run(make_rows(300), handler, "TestVendor"))
+    assert len(events) == 300
+    assert time.monotonic() - start < 2  # serial would be 60 s
+
+
+def test_bounded_queue_applies_backpressure(monkeypatch):
+    monkeypatch.setattr(settings, "ASYNC_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "ASYNC_MAX_IN_FLIGHT", 4)
+    started = []
+
+    async def handler(row):
+        started.append(row["row_index"])
+        yield "found", {"mpn": row["mpns"][0]}
+
+    stream = _AsyncLookupEngine().run(make_rows(100), handler, "TestVendor")
+    next(stream)
+    time.sleep(0.2)  # slow client: producers should stall on the full queue
+    assert len(started) < 10
+    stream.close()
+
+
+def test_mouser_async_handler_matches_sync(monkeypatch):
+    monkeypatch.setattr(mouser_service, "api_key", "")
+    row = {"row_index": 0, "mpns": ["ABC123", "DEF456"], "manufacturer": "Acme"}
+
+    async def collect():
+        return [e async for e in mouser_service.row_handler_async(row)]
+
+    assert asyncio.run(collect()) == list(mouser_service.row_handler(row))
+
+
+def test_async_lookups_keep_part_cache_io_off_the_loop(monkeypatch):
+    threads = []
+
+    class _Cache:
+        def get(self, *key):
+            threads.append(threading.current_thread())
+            return None
+
+        def put(self, *key_and_record):
+            threads.append(threading.current_thread())
+
+    async def search(mpns):
+        return {"SearchResults": {"Parts": []}}
+
+    monkeypatch.setattr(mouser_module, "part_cache", _Cache())
+    monkeypatch.setattr(mouser_service, "api_key", "dummy-key")
+    monkeypatch.setattr(mouser_service, "search_by_part_numbers_async", search)
+
+    async def look_up():
+        return threading.current_thread(), await mouser_service.lookup_part_async("X1")
+
+    loop_thread, record = asyncio.run(look_up())
+    assert record is None
+    assert len(threads) == 2 and loop_thread not in threads
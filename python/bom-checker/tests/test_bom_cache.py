@@ -0,0 +1,57 @@
+import io
+import os
+
+import pandas as pd
+
+from backend.app.services import excel_service
+from services.bom_cache import _BomCache, bom_cache
+
+
+def _xlsx(n=3):
+    buf = io.BytesIO()
+    pd.DataFrame(
+        {"MPN": [f"P{i}" for i in range(n)], "Manufacturer": ["Acme"] * n, "Qty": list(range(1, n + 1))}
+    ).to_excel(buf, engine="openpyxl", index=False)
+    return buf.getvalue()
+
+
+def test_upload_artifact_skips_reparse_in_process_bom(test_client, monkeypatch):
+    r = test_client.post(
+        "/api/upload",
+        data={"file": (io.BytesIO(_xlsx()), "cached.xlsx")},
+        content_type="multipart/form-data",
+    )
+    assert r.status_code == 200
+    upload_id = r.json["upload_id"]
+
+    import services.excel_service as live_excel  # the module bom_cache imports lazily
+
+    def boom(*_a, **_kw):
+        raise AssertionError("workbook parsed again")
+
+    monkeypatch.setattr(live_excel, "clean_excel_file", boom)
+    monkeypatch.setattr(excel_service, "clean_excel_file", boom)
+
+    cols = [{"name": "MPN", "mapping": "ManufacturerPN"}, {"name": "Qty", "mapping": "Quantity"}]
+    for body in ({"upload_id": upload_id}, {"file_name": "cached.xlsx"}):
+        r_map = test_client.post("/api/process-bom", json={**body, "columns": cols})
+        assert r_map.status_code == 200, r_map.json
+        assert [row["mpns"] for row in r_map.json["rows"]] == [["P0"], ["P1"], ["P2"]]
+    assert bom_cache.stats()["hits"] >= 2
+
+
+def test_bom_cache_evicts_least_recently_used(tmp_path):
+    cache = _BomCache(root=tmp_path, max_bytes=10 ** 9)
+    small = pd.DataFrame({"a": [1]})
+    cache.put("aa", small)
+    size = (tmp_path / "aa.pkl").stat().st_size
+    cache.max_bytes = size * 2
+
+    cache.put("bb", small)
+    os.utime(tmp_path / "aa.pkl", (1, 1))
+    os.utime(tmp_path / "bb.pkl", (2, 2))
+    assert cache.get("aa") is not None  # touch → "bb" is now the oldest
+    cache.put("cc", small)
+
+    assert sorted(p.name for p in tmp_path.glob("*.pkl")) == ["aa.pkl", "cc.pkl"]
+    assert cache.get("bb") is None
@@ -0,0 +1,108 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from core.config import settings
+from services import cancellation
+from services.cancellation import CancelToken, LookupCancelled, bind, cancel_metrics
+from services.digikey_service import digikey_service  # the instance main.py uses
+from services.http_transport import VendorTransport
+from services.jobs import job_manager, lookup_events
+from tests.conftest import make_rows, ndjson_lines
+
+
+def _slow_handler(calls):
+    def handler(row):
+        calls.append(row["row_index"])
+        cancellation.sleep(0.2)  # a vendor call that notices cancellation
+        yield "found", {"mpn": row["mpns"][0], "source": "DigiKey"}
+
+    return handler
+
+
+def _wait_for(job_id, status, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if job_manager.get(job_id)["status"] == status:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_cancel_endpoint_stops_vendor_calls(test_client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(digikey_service, "row_handler", _slow_handler(calls))
+    before = cancel_metrics.stats().get("rows_skipped", 0)
+
+    r = test_client.post("/api/jobs", json={"rows": make_rows(200), "source": "DigiKey"})
+    job_id = r.json["job_id"]
+    r = test_client.post(f"/api/jobs/{job_id}/cancel")
+    assert r.status_code == 202
+
+    assert _wait_for(job_id, "cancelled")
+    events = ndjson_lines(test_client.get(f"/api/jobs/{job_id}/events"))
+    assert events[-1]["event"] == "cancelled"
+    assert events[-1]["data"]["reason"] == "cancelled by client"
+    assert len(calls) < 200
+    assert cancel_metrics.stats()["rows_skipped"] - before == 200 - events[-1]["data"]["processed"]
+
+    assert test_client.post(f"/api/jobs/{job_id}/cancel").status_code == 409
+    assert test_client.post("/api/jobs/nope/cancel").status_code == 404
+    assert test_client.get("/api/metrics").json["cancellation"]["reason_cancelled_by_client"] >= 1
+
+
+def test_stream_job_cancelled_when_client_disconnects(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_DETACH_GRACE", 0)
+    calls = []
+    handler = _slow_handler(calls)
+    job_id = job_manager.start(
+        "DigiKey", 100, lambda: lookup_events(make_rows(100), handler, "DigiKey"), cancel_on_detach=True
+    )
+    follower = job_manager.follow(job_id)
+    assert next(follower)[1] == "ready"
+    follower.close()  # client went away
+
+    assert _wait_for(job_id, "cancelled")
+    assert job_manager.events(job_id)[-1][2]["reason"] == "client disconnected"
+    assert len(calls) < 100
+
+
+def test_detached_job_survives_without_auto_cancel(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_DETACH_GRACE", 0)
+    job_id = job_manager.start("DigiKey", 1, lambda: iter([("found", {"mpn": "A"})]))
+    follower = job_manager.follow(job_id)
+    next(follower)
+    follower.close()
+    assert _wait_for(job_id, "complete")
+
+
+def test_deadline_cancels_job(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_DEADLINE", 0.3)
+    handler = _slow_handler([])
+    job_id = job_manager.start("DigiKey", 100, lambda: lookup_events(make_rows(100), handler, "DigiKey"))
+    assert _wait_for(job_id, "cancelled")
+    assert job_manager.get(job_id)["error"] == "deadline"
+
+
+def test_transport_makes_no_request_once_cancelled():
+    token = CancelToken()
+    token.cancel("test")
+    transport = VendorTransport("TestVendor")
+    before = cancel_metrics.stats().get("requests_avoided", 0)
+    with patch.object(requests.Session, "request") as req, bind(token):
+        with pytest.raises(LookupCancelled):
+            transport.get("https://example.invalid/x")
+    req.assert_not_called()
+    assert cancel_metrics.stats()["requests_avoided"] == before + 1
+
+
+def test_backoff_sleep_wakes_on_cancel():
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+    started = time.monotonic()
+    with bind(token), pytest.raises(LookupCancelled):
+        cancellation.sleep(5)
+    assert time.monotonic() - started < 1
@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+import pytest
+
+from services.costing import costing_engine
+from services.multi_vendor import unit_price_at
+
+
+def _line(qty, breaks, moq=0):
+    return {
+        "quantity": qty,
+        "minimum_order_quantity": moq,
+        "price_breaks": [{"quantity": q, "price": p} for q, p in breaks],
+    }
+
+
+def test_costs_match_scalar_price_break_rule():
+    rng = np.random.default_rng(1)
+    lines = []
+    for _ in range(50):
+        qs = sorted(rng.choice([1, 10, 25, 100, 500, 1000, 5000], rng.integers(1, 5), replace=False))
+        breaks = [(int(q), round(1 / (i + 1), 3)) for i, q in enumerate(qs)]
+        lines.append(_line(int(rng.integers(0, 8)), breaks, int(rng.choice([0, 1, 10, 250]))))
+    builds = [1, 3, 10, 100, 2500]
+
+    out = costing_engine.evaluate(lines, builds, include_lines=True)
+
+    for j, boards in enumerate(builds):
+        expected = 0.0
+        for line, got in zip(lines, out["lines"]):
+            order = max(line["quantity"] * boards, line["minimum_order_quantity"]) if line["quantity"] else 0
+            unit = unit_price_at(line["price_breaks"], order)
+            assert got["order_quantity"][j] == order
+            assert got["unit_price"][j] == pytest.approx(unit)
+            expected += order * unit
+        assert out["total_cost"][j] == pytest.approx(expected, abs=1e-3)
+        assert out["cost_per_board"][j] == pytest.approx(expected / boards, rel=1e-5)
+
+
+def test_flat_price_and_unpriced_lines():
+    out = costing_engine.evaluate([{"price": 0.5, "quantity": 2}, {"quantity": 1}], [10])
+    assert out["total_cost"] == [10.0]
+    assert out["unpriced_lines"] == [1]
+    with pytest.raises(ValueError):
+        costing_engine.evaluate([], [0])
+
+
+def test_five_thousand_lines_full_sweep_is_interactive():
+    rng = np.random.default_rng(0)
+    breaks = [(1, 0.1), (10, 0.08), (100, 0.05), (1000, 0.03), (5000, 0.02)]
+    per_board, moq = rng.integers(1, 20, 5000), rng.choice([1, 100], 5000)
+    lines = [_line(int(q), breaks, int(m)) for q, m in zip(per_board, moq)]
+    costing_engine.evaluate(lines[:10])  # warm-up
+    start = time.perf_counter()
+    out = costing_engine.evaluate(lines)
+    assert len(out["total_cost"]) == 16
+    assert time.perf_counter() - start < 0.5  # typically a few tens of ms
+
+
+def test_costing_endpoint(test_client):
+    body = {"lines": [_line(2, [(1, 1.0), (100, 0.5)])], "build_quantities": [10, 50]}
+    r = test_client.post("/api/costing", json=body)
+    assert r.status_code == 200
+    assert r.json["total_cost"] == [20.0, 50.0]
+    assert test_client.post("/api/costing", json={}).status_code == 400
@@ -0,0 +1,138 @@
+import gzip
+import json
+import struct
+import zlib
+
+import pytest
+
+import services.event_encoding as event_encoding
+from core.config import settings
+from services.digikey_service import digikey_service  # the instance main.py uses
+from services.event_encoding import PreEncoded, dumps, encode_payload, encode_stream
+from services.jobs import job_manager, lookup_events
+from services.part_cache import part_cache
+from tests.conftest import found_handler, make_rows
+
+
+def test_progress_is_throttled_and_final(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_PROGRESS_INTERVAL", 60)
+    monkeypatch.setattr(settings, "STREAM_PROGRESS_EVERY", 50)
+    events = list(lookup_events(make_rows(200), found_handler, "DigiKey"))
+
+    progress = [p for e, p in events if e == "progress"]
+    assert len(progress) == 5  # first event, every 50, and the tail
+    assert events[-2] == ("progress", progress[-1]) and progress[-1]["processed"] == 200
+    assert events[-1][0] == "complete"
+
+
+def test_batch_becomes_one_chunk_spliced_from_stored_payloads(monkeypatch):
+    batch = [(i, "found", dumps({"row_index": i}).decode()) for i in range(3)]
+    (chunk,) = encode_stream([batch], with_offset=True)
+    lines = [json.loads(line) for line in chunk.splitlines()]
+    assert lines[2] == {"event": "found", "data": {"row_index": 2}, "offset": 2}
+
+    monkeypatch.setattr(settings, "STREAM_CHUNK_BYTES", 60)
+    assert len(list(encode_stream([batch]))) == 3  # split at the size cap, never mid-line
+
+
+def test_gzip_chunks_are_flushed_per_batch():
+    batches = [[(0, "found", '{"a":1}')], [(1, "complete", '{"b":2}')]]
+    chunks = list(encode_stream(batches, gzip=True))
+    unzip = zlib.decompressobj(31)
+    assert unzip.decompress(chunks[0]) == b'{"event":"found","data":{"a":1}}\n'  # readable at once
+    assert gzip.decompress(b"".join(chunks)).count(b"\n") == 2
+
+
+def test_stream_endpoint_gzip_when_accepted(test_client, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_GZIP", True)
+    monkeypatch.setattr(digikey_service, "row_handler", found_handler)
+    body = {"rows": make_rows(20), "source": "DigiKey"}
+
+    job_id = test_client.post("/api/jobs", json=body).json["job_id"]
+    zipped = test_client.get(f"/api/jobs/{job_id}/events", headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    zipped_body = zipped.data
+    plain = test_client.get(f"/api/jobs/{job_id}/events")
+    assert "Content-Encoding" not in plain.headers
+    assert gzip.decompress(zipped_body) == plain.data
+    assert len(zipped_body) < len(plain.data)
+
+
+def test_pre_encoded_text_is_dropped_on_mutation():
+    record = PreEncoded({"a": 1}, '{"a":1}')
+    assert encode_payload(record) == '{"a":1}'
+    record.setdefault("a", 2)
+    assert record.json == '{"a":1}'  # no change, text kept
+    record["b"] = 2
+    assert record.json is None
+    assert json.loads(encode_payload(record)) == {"a": 1, "b": 2}
+
+
+def test_cache_hits_reach_the_job_log_without_reencoding(test_client, monkeypatch):
+    part_cache.put("DigiKey", "P0", None, {"mpn": "P0", "quantity_available": 5, "price": 0.5})
+    entry = part_cache.get("DigiKey", "P0")
+    assert isinstance(entry.record, PreEncoded)
+    assert json.loads(entry.record.json) == entry.record
+
+    def cached(row):
+        yield "found", part_cache.get("DigiKey", row["mpns"][0]).record
+
+    monkeypatch.setattr(digikey_service, "row_handler", cached)
+    job_id = test_client.post("/api/jobs", json={"rows": make_rows(1), "source": "DigiKey"}).json["job_id"]
+    test_client.get(f"/api/jobs/{job_id}/events").data  # wait for the job to finish
+    logged = {event: payload for _, event, payload in job_manager.events(job_id, raw=True)}
+    assert logged["found"] == entry.record.json
+
+
+def test_msgpack_frames_carry_the_same_events():
+    msgpack = pytest.importorskip("msgpack")
+    batch = [(0, "found", '{"row_index":0}'), (1, "complete", '{"processed":1}')]
+    data = b"".join(encode_stream([batch], with_offset=True, mimetype=event_encoding.MSGPACK))
+    frames = []
+    while data:
+        (size,) = struct.unpack(">I", data[:4])
+        frames.append(msgpack.unpackb(data[4:4 + size]))
+        data = data[4 + size:]
+    assert frames == [
+        {"event": "found", "data": {"row_index": 0}, "offset": 0},
+        {"event": "complete", "data": {"processed": 1}, "offset": 1},
+    ]
+
+
+def test_msgpack_frames_are_spliced_from_the_logged_bytes(test_client, monkeypatch):
+    msgpack = pytest.importorskip("msgpack")
+    part_cache.put("DigiKey", "P0", None, {"mpn": "P0", "quantity_available": 5, "price": 0.5})
+
+    def cached(row):
+        yield "found", part_cache.get("DigiKey", row["mpns"][0]).record
+
+    monkeypatch.setattr(digikey_service, "row_handler", cached)
+    job_id = test_client.post("/api/jobs", json={"rows": make_rows(1), "source": "DigiKey"}).json["job_id"]
+    test_client.get(f"/api/jobs/{job_id}/events").data  # wait for the job to finish
+    logged = job_manager.events(job_id, packed=True)
+    assert all(isinstance(payload, bytes) for _, _, payload in logged)
+
+    monkeypatch.setattr(event_encoding, "loads", None)  # a parse would fail
+    data = b"".join(encode_stream([logged], with_offset=True, mimetype=event_encoding.MSGPACK))
+    (size,) = struct.unpack(">I", data[:4])
+    assert msgpack.unpackb(data[4:4 + size]) == {"event": "ready", "data": {"job_id": job_id}, "offset": 0}
+    found = [msgpack.unpackb(payload) for _, event, payload in logged if event == "found"]
+    assert found == [{"mpn": "P0", "quantity_available": 5, "price": 0.5}]
+
+
+def test_stream_endpoint_negotiates_format(test_client, monkeypatch):
+    monkeypatch.setattr(digikey_service, "row_handler", found_handler)
+    job_id = test_client.post("/api/jobs", json={"rows": make_rows(2), "source": "DigiKey"}).json["job_id"]
+    accept = {"Accept": "application/x-msgpack"}
+
+    with monkeypatch.context() as m:
+        m.setattr(event_encoding, "msgpack", None)
+        r = test_client.get(f"/api/jobs/{job_id}/events", headers=accept)
+        assert r.mimetype == "application/x-ndjson"  # not installed: NDJSON stays the default
+        assert {json.loads(line)["event"] for line in r.data.splitlines()} >= {"found", "complete"}
+
+    msgpack = pytest.importorskip("msgpack")
+    r = test_client.get(f"/api/jobs/{job_id}/events", headers=accept)
+    assert r.mimetype == "application/x-msgpack"
+    (size,) = struct.unpack(">I", r.data[:4])
+    assert msgpack.unpackb(r.data[4:4 + size])["event"] == "ready"
@@ -1,7 +1,15 @@
 import io
+
+import numpy as np
+import openpyxl
 import pandas as pd
 
-from backend.app.services.excel_service import clean_excel_file, create_training_data
+from backend.app.services import excel_service
+from backend.app.services.excel_service import (
+    build_stream_rows,
+    clean_excel_file,
+    create_training_data,
+)
 
 
 def test_clean_excel_detects_header(tmp_path):
@@ -16,7 +24,51 @@ def test_clean_excel_detects_header(tmp_path):
     assert list(df_out.columns) == ["MPN", "Manufacturer", "Qty"]
 
 
+def test_clean_excel_reads_workbook_once(monkeypatch):
+    wb = openpyxl.Workbook()
+    wb.active.title = "Notes"
+    ws = wb.create_sheet("Final BOM")
+    for row in (["Project X"], [], ["Part", "Qty", None, "Reference"],
+                ["RC0603", 10, None, "R1"], [12345, None], [None], ["LM317", "NA"]):
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+
+    loads = []
+    real = openpyxl.load_workbook
+    monkeypatch.setattr(excel_service, "CalamineWorkbook", None)
+    monkeypatch.setattr(
+        excel_service.openpyxl, "load_workbook", lambda *a, **kw: loads.append(1) or real(*a, **kw)
+    )
+    monkeypatch.setattr(excel_service.pd, "read_excel", None)  # no second pass
+
+    df = clean_excel_file(buf.getvalue())
+    assert loads == [1]
+    assert list(df.columns) == ["Part", "Qty", "nan", "Reference"]
+    assert df["Part"].tolist() == ["RC0603", 12345, "LM317"]
+    assert pd.isna(df["Qty"].iloc[-1])
+
+
 def test_training_rows(fake):
     df = pd.DataFrame({fake.word(): [fake.word() for _ in range(3)] for _ in range(4)})
     rows = create_training_data(df, source_file="dummy.xlsx")
     assert rows.shape[0] == len(df.columns)
+
+
+def test_build_stream_rows():
+    df = pd.DataFrame(
+        {
+            "MPN": ["A1", np.nan, "B2, C3 ,", 12345],
+            "Mfr": [" Acme ", "x", np.nan, ""],
+            "Qty": ["10 pcs", 3, 2.9, 0],
+            "Ref": ["R1", "R2", np.nan, 7],
+        },
+        index=[2, 3, 5, 8],
+    )
+    rows = build_stream_rows(df, "MPN", "Mfr", "Qty", "Ref")
+    assert rows == [
+        {"row_index": 2, "mpns": ["A1"], "manufacturer": "Acme", "quantity": 1, "reference": "R1"},
+        {"row_index": 5, "mpns": ["B2", "C3"], "manufacturer": None, "quantity": 2, "reference": None},
+        {"row_index": 8, "mpns": ["12345"], "manufacturer": None, "quantity": 1, "reference": 7},
+    ]
+    assert build_stream_rows(df, "Missing") == []
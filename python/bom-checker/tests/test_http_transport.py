@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from backend.app.services import digikey_service as dk_module
+from backend.app.services.http_transport import VendorTransport, parse_retry_after
+
+
+def _resp(status, headers=None):
+    r = MagicMock(status_code=status, headers=headers or {})
+    r.json.return_value = {"status": status}
+    return r
+
+
+def test_retries_5xx_and_honours_retry_after():
+    transport = VendorTransport("TestVendor")
+    with patch.object(requests.Session, "request") as req, patch("time.sleep") as sleep:
+        req.side_effect = [_resp(503, {"Retry-After": "2"}), _resp(429), _resp(200)]
+        r = transport.get("https://example.invalid/x")
+
+    assert r.status_code == 200
+    assert req.call_count == 3
+    assert sleep.call_args_list[0].args == (2.0,)
+    assert req.call_args.kwargs["timeout"] == transport.timeout
+
+
+def test_gives_up_after_max_retries():
+    transport = VendorTransport("TestVendor")
+    transport.max_retries = 1
+    with patch.object(requests.Session, "request", return_value=_resp(500)) as req, patch("time.sleep"):
+        assert transport.get("https://example.invalid/x").status_code == 500
+    assert req.call_count == 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_concurrent_401s_refresh_token_once(monkeypatch, tmp_path):
+    svc = dk_module._DigiKeyService()
+    svc.client_id, svc.client_secret = "id", "secret"
+    svc.tokens.path = tmp_path / "dk_token.json"
+    svc.tokens.path.write_text(json.dumps({"access_token": "old", "expires_in": 3600, "created_at": time.time()}))
+
+    refreshes = []
+    barrier = threading.Barrier(4)
+
+    def fake_request(method, url, **kwargs):
+        if url.endswith("/oauth2/token"):
+            refreshes.append(1)
+            r = _resp(200)
+            r.json.return_value = {"access_token": "new", "expires_in": 3600}
+            return r
+        if kwargs["headers"]["Authorization"] == "Bearer old":
+            barrier.wait(timeout=5)
+            return _resp(401)
+        return _resp(200)
+
+    monkeypatch.setattr(svc._http, "request", fake_request)
+    threads = [threading.Thread(target=svc.search_by_part_number, args=(f"P{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(refreshes) == 1
+    assert svc.tokens.peek() == "new"
+    svc.tokens.close()
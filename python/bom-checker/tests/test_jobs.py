@@ -0,0 +1,86 @@
+import threading
+import time
+
+from core.config import settings
+from services.digikey_service import digikey_service  # the instance main.py uses
+from services.jobs import job_manager
+from tests.conftest import make_rows, ndjson_lines
+
+
+def test_job_log_replays_from_offset_without_vendor_calls(test_client, monkeypatch):
+    calls = []
+
+    def handler(row):
+        calls.append(row["row_index"])
+        yield "found", {"mpn": row["mpns"][0], "source": "DigiKey"}
+
+    monkeypatch.setattr(digikey_service, "row_handler", handler)
+    r = test_client.post("/api/jobs", json={"rows": make_rows(3), "source": "DigiKey"})
+    assert r.status_code == 202
+    job_id = r.json["job_id"]
+
+    live = ndjson_lines(test_client.get(f"/api/jobs/{job_id}/events"))
+    assert [e["offset"] for e in live] == list(range(len(live)))
+    assert live[0] == {"event": "ready", "data": {"job_id": job_id}, "offset": 0}
+    assert live[-1]["event"] == "complete" and live[-1]["data"]["found"] == 3
+    assert sorted(calls) == [0, 1, 2]
+
+    # resume after the third event – same tail, no new look-ups
+    tail = ndjson_lines(test_client.get(f"/api/jobs/{job_id}/events?offset=3"))
+    assert tail == live[3:]
+    assert len(calls) == 3
+    assert test_client.get(f"/api/jobs/{job_id}").json["status"] == "complete"
+    assert test_client.get("/api/jobs/nope/events").status_code == 404
+
+
+def test_job_keeps_running_after_client_detaches(monkeypatch):
+    gate = threading.Event()
+
+    def events():
+        yield "found", {"mpn": "A"}
+        gate.wait(5)
+        yield "found", {"mpn": "B"}
+
+    job_id = job_manager.start("DigiKey", 2, events)
+    follower = job_manager.follow(job_id)
+    assert next(follower)[1] == "ready"
+    assert next(follower)[2] == {"mpn": "A"}
+    follower.close()  # client went away
+
+    gate.set()
+    replay = list(job_manager.follow(job_id))
+    assert [e for _, e, _ in replay] == ["ready", "found", "found"]
+    assert job_manager.get(job_id)["status"] == "complete"
+
+
+def test_legacy_stream_announces_job_id(test_client):
+    r = test_client.post("/api/stream-digikey-results", json={"rows": make_rows(1)})
+    events = ndjson_lines(r)
+    assert events[0]["event"] == "ready"
+    assert events[0]["data"]["job_id"] == r.headers["X-Job-Id"]
+    assert events[-1]["event"] == "complete"
+
+
+def test_quiet_job_heart_beats_instead_of_going_stale(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_STALE_AFTER", 0.3)
+    gate = threading.Event()
+
+    def events():
+        gate.wait(5)  # e.g. every row waiting on a Retry-After
+        yield "found", {"mpn": "A"}
+
+    job_id = job_manager.start("DigiKey", 1, events)
+    time.sleep(0.8)
+    job = job_manager.get(job_id)
+    assert job["status"] == "running"
+    assert job["updated"] > job["created"] + 0.3  # refreshed without a new event
+    gate.set()
+    assert [e for _, e, _ in job_manager.follow(job_id)] == ["ready", "found"]
+    assert job_manager.get(job_id)["status"] == "complete"
+
+    # a running job nobody heart-beats (its server went away) is interrupted
+    old = time.time() - 10
+    job_manager._conn().execute(
+        "INSERT INTO jobs VALUES ('gone', 'DigiKey', 'running', 1, NULL, ?, ?)", (old, old)
+    )
+    assert job_manager.get("gone")["status"] == "interrupted"
@@ -0,0 +1,82 @@
+import json
+import logging
+import queue
+import time
+
+from core import logging as app_logging
+from core.logging import JsonFormatter, SampledDebug, apply_levels, queue_stats, setup_logging
+
+
+class _Loud:
+    """An argument that fails the test if it is ever rendered."""
+
+    def __str__(self):
+        raise AssertionError("formatted while DEBUG is off")
+
+    __repr__ = __str__
+
+
+def test_root_logs_through_one_queue_handler():
+    root = setup_logging()
+    assert setup_logging() is root  # idempotent
+    queue_handlers = [h for h in root.handlers if isinstance(h, logging.handlers.QueueHandler)]
+    assert len(queue_handlers) == 1
+    assert app_logging._listener is not None
+    assert set(queue_stats()) == {"queued", "dropped"}
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = app_logging._DroppingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.makeLogRecord({"msg": "x"})
+    started = time.perf_counter()
+    for _ in range(5):
+        handler.emit(record)
+    assert time.perf_counter() - started < 0.1
+    assert handler.dropped == 4
+
+
+def test_records_are_queued_unformatted():
+    handler = app_logging._DroppingQueueHandler(queue.Queue())
+    args = ("X", 3, None)
+    handler.emit(logging.makeLogRecord({"msg": "part %s x%s %s", "args": args}))
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "part %s x%s %s" and queued.args is args
+
+
+def test_mutable_args_are_rendered_at_the_call():
+    handler = app_logging._DroppingQueueHandler(queue.Queue())
+    result = {"status": "In Stock"}
+    handler.emit(logging.makeLogRecord({"msg": "part %s", "args": (result,)}))
+    result.update({"mpn": "X1", "source": "Mouser"})  # what the caller does next
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "part {'status': 'In Stock'}"
+
+
+def test_sampled_debug_keeps_one_in_n(caplog):
+    log = logging.getLogger("tests.sampled.parts")
+    trace = SampledDebug(log, every=3)
+
+    log.setLevel(logging.INFO)
+    trace("part %s", _Loud())  # debug off: not even formatted
+    assert not caplog.records
+
+    with caplog.at_level(logging.DEBUG, logger="tests.sampled.parts"):
+        for i in range(9):
+            trace("part %s", i)
+    assert [r.getMessage() for r in caplog.records] == ["part 0", "part 3", "part 6"]
+
+
+def test_per_logger_levels():
+    apply_levels("tests.levels.a=DEBUG, tests.levels.b=warning")
+    assert logging.getLogger("tests.levels.a").level == logging.DEBUG
+    assert logging.getLogger("tests.levels.b").level == logging.WARNING
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.makeLogRecord(
+        {"name": "svc", "levelname": "INFO", "msg": "row %d", "args": (3,), "job_id": "abc"}
+    )
+    out = json.loads(JsonFormatter().format(record))
+    assert out["msg"] == "row 3"
+    assert out["job_id"] == "abc"
+    assert out["logger"] == "svc"
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from backend.app.services.multi_vendor import merge_offers, unit_price_at
+
+
+def _offer(source, status, breaks):
+    return {"mpn": "X1", "source": source, "status": status, "price": breaks[0]["price"], "price_breaks": breaks}
+
+
+def test_unit_price_at_picks_largest_break_not_above_quantity():
+    breaks = [{"quantity": 10, "price": 0.8}, {"quantity": 1, "price": 1.0}, {"quantity": 100, "price": 0.5}]
+    assert unit_price_at(breaks, 1) == 1.0
+    assert unit_price_at(breaks, 50) == 0.8
+    assert unit_price_at(breaks, 1000) == 0.5
+    assert unit_price_at([], 5, default=0.3) == 0.3
+
+
+def test_merge_picks_cheapest_in_stock_at_row_quantity():
+    dk = _offer("DigiKey", "In Stock", [{"quantity": 1, "price": 1.0}, {"quantity": 100, "price": 0.4}])
+    ms = _offer("Mouser", "In Stock", [{"quantity": 1, "price": 0.9}, {"quantity": 100, "price": 0.6}])
+    oos = _offer("Other", "Out of Stock", [{"quantity": 1, "price": 0.1}])
+    err = ("error", {"mpn": "X1", "error": "boom", "source": "Other"})
+    results = {"DigiKey": [("found", dk)], "Mouser": [("found", ms)], "Other": [err, ("not_found", oos)]}
+
+    events = merge_offers({"row_index": 3, "quantity": 200}, results)
+    assert events[0] == err
+    event, merged = events[-1]
+    assert event == "found" and merged["source"] == "DigiKey"
+    assert merged["row_index"] == 3 and merged["unit_price"] == 0.4
+    assert [a["source"] for a in merged["alternatives"]] == ["Mouser", "Other"]
+
+    _, small = merge_offers({"row_index": 3, "quantity": 1}, results)[-1]
+    assert small["source"] == "Mouser"
+
+
+def test_merge_without_stock_is_not_found():
+    placeholder = {"mpn": "X1", "status": "Not Found", "price_breaks": [], "source": "DigiKey"}
+    oos = _offer("Mouser", "Out of Stock", [{"quantity": 1, "price": 2.0}])
+    event, merged = merge_offers(
+        {"row_index": 0}, {"DigiKey": [("not_found", placeholder)], "Mouser": [("not_found", oos)]}
+    )[-1]
+    assert event == "not_found" and merged["source"] == "Mouser"
+
+
+@pytest.mark.e2e
+def test_combined_stream_emits_one_event_per_row(test_client):
+    rows = [{"row_index": i, "mpns": [f"PN{i}"], "manufacturer": None, "quantity": 1} for i in range(3)]
+    r = test_client.post("/api/stream-results", json={"rows": rows})
+    assert r.status_code == 200
+
+    events = [json.loads(line) for line in r.data.decode().splitlines() if line.strip()]
+    row_events = [e for e in events if e["event"] in ("found", "not_found")]
+    assert sorted(e["data"]["row_index"] for e in row_events) == [0, 1, 2]
+    assert all(len(e["data"]["alternatives"]) == 1 for e in row_events)
+    assert events[-1]["event"] == "complete" and events[-1]["data"]["processed"] == 3
+
+    assert test_client.post("/api/stream-results", json={"rows": rows, "vendors": ["Nope"]}).status_code == 400
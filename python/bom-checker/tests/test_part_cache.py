@@ -0,0 +1,131 @@
+import json
+import time
+
+import pytest
+import requests
+
+from backend.app.services import digikey_service as dk_module
+from backend.app.services.part_cache import _PartCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return _PartCache(path=tmp_path / "parts.sqlite3", static_ttl=60, volatile_ttl=60, enabled=True)
+
+
+PART = {
+    "mpn": "ABC123",
+    "manufacturer": "Acme",
+    "description": "Widget",
+    "status": "In Stock",
+    "quantity_available": 42,
+    "price": 0.25,
+    "price_breaks": [{"quantity": 1, "price": 0.25}],
+    "source": "DigiKey",
+}
+
+
+def test_hit_after_put_with_normalised_key(cache):
+    assert cache.get("DigiKey", "ABC123", "Acme") is None
+    cache.put("DigiKey", "ABC123", "Acme", PART)
+
+    entry = cache.get("DigiKey", " abc 123", "ACME ")
+    assert entry.fresh and entry.record == PART
+    assert cache.get("Mouser", "ABC123", "Acme") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_volatile_expiry_keeps_static_half(cache):
+    cache.volatile_ttl = 0
+    cache.put("DigiKey", "ABC123", None, PART)
+    entry = cache.get("DigiKey", "ABC123", None)
+    assert entry is not None and not entry.fresh
+    assert entry.record["description"] == "Widget"
+
+
+def test_negative_results_are_cached(cache):
+    cache.put("Mouser", "NOPE", None, None)
+    entry = cache.get("Mouser", "NOPE", None)
+    assert entry.fresh and entry.record is None
+
+
+def test_lru_eviction(cache):
+    cache.max_entries = 2
+    for mpn in ("A", "B", "C"):
+        cache.put("DigiKey", mpn, None, PART)
+        time.sleep(0.01)
+    cache.get("DigiKey", "A", None)  # touch A so B is the oldest
+    assert cache.evict() == 1
+    assert cache.get("DigiKey", "B", None) is None
+    assert cache.get("DigiKey", "A", None) is not None
+
+
+def test_digikey_lookup_part_uses_cache_and_refresh(cache, monkeypatch):
+    calls = []
+
+    def fake_search(mpn, manufacturer=None):
+        calls.append(mpn)
+        return {"Products": [{"ManufacturerProductNumber": mpn, "QuantityAvailable": 5}]}
+
+    svc = dk_module.digikey_service
+    monkeypatch.setattr(dk_module, "part_cache", cache)
+    monkeypatch.setattr(svc, "get_token", lambda: "real_token")
+    monkeypatch.setattr(svc, "search_by_part_number", fake_search)
+
+    first = svc.lookup_part("XYZ1")
+    second = svc.lookup_part("XYZ1")
+    assert first == second and first["source"] == "DigiKey"
+    assert calls == ["XYZ1"]
+
+    svc.lookup_part("XYZ1", refresh=True)
+    assert calls == ["XYZ1", "XYZ1"]
+
+
+def test_substitutes_cached_per_digikey_pn(cache, monkeypatch):
+    calls = []
+
+    def fake_get(method, url, **kwargs):
+        calls.append(url)
+        r = requests.Response()
+        r.status_code = 200
+        r._content = json.dumps({"ProductSubstitutes": [{"ManufacturerProductNumber": "SUB1"}]}).encode()
+        return r
+
+    svc = dk_module.digikey_service
+    monkeypatch.setattr(dk_module, "part_cache", cache)
+    monkeypatch.setattr(svc, "get_token", lambda: "real_token")
+    monkeypatch.setattr(svc, "_authorized", fake_get)
+
+    first = svc.search_substitute("296-1234-ND")
+    assert svc.search_substitute("296-1234-ND") == first
+    assert first[0]["mpn"] == "SUB1" and len(calls) == 1
+
+    cache.substitute_ttl = 0  # expired lists are fetched again
+    cache.put_substitutes("DigiKey", "296-1234-ND", first)
+    svc.search_substitute("296-1234-ND")
+    assert len(calls) == 2
+    assert cache.stats()["substitute_hits"] == 1
+
+
+def test_digikey_error_status_is_not_cached_and_serves_stale(cache, monkeypatch):
+    def unavailable(method, url, **kwargs):
+        r = requests.Response()
+        r.status_code = 503  # what the transport hands back once retries run out
+        r._content = b'{"ErrorMessage": "Service Unavailable"}'
+        return r
+
+    svc = dk_module.digikey_service
+    monkeypatch.setattr(dk_module, "part_cache", cache)
+    monkeypatch.setattr(svc, "get_token", lambda: "real_token")
+    monkeypatch.setattr(svc, "_authorized", unavailable)
+
+    with pytest.raises(requests.HTTPError):
+        svc.lookup_part("XYZ1")
+    assert cache.get("DigiKey", "XYZ1", None) is None
+
+    cache.volatile_ttl = 0
+    cache.put("DigiKey", "XYZ1", None, PART)
+    assert svc.lookup_part("XYZ1") == PART
+    assert not cache.get("DigiKey", "XYZ1", None).fresh  # still the stale entry
@@ -0,0 +1,116 @@
+import io
+import time
+
+import pandas as pd
+import pytest
+
+from core.config import settings
+from services import multi_vendor
+from services.part_cache import part_cache
+from services.prediction_service import prediction_service
+from services.prefetch import prefetcher
+from services.rate_limit import TokenBucket, rate_limiter
+from services.upload_store import upload_store
+
+
+class _FakeVendor:
+    def __init__(self):
+        self.calls = []
+
+    def lookup_part(self, mpn, manufacturer=None, refresh=False):
+        self.calls.append((mpn, manufacturer))
+        record = {"mpn": mpn, "manufacturer": manufacturer, "quantity_available": 1}
+        part_cache.put("DigiKey", mpn, manufacturer, record)
+        return record
+
+
+def _columns(mpn_conf=0.95, manu_conf=0.9):
+    return [
+        {"name": "MPN", "prediction": {"primary_category": "ManufacturerPN", "primary_confidence": mpn_conf}},
+        {"name": "Maker", "prediction": {"primary_category": "Manufacturer", "primary_confidence": manu_conf}},
+        {"name": "Qty", "prediction": {"primary_category": "Quantity", "primary_confidence": 0.99}},
+    ]
+
+
+def _upload(mpns):
+    buf = io.BytesIO()
+    pd.DataFrame({"MPN": mpns, "Maker": ["Acme"] * len(mpns), "Qty": [1] * len(mpns)}).to_excel(
+        buf, engine="openpyxl", index=False
+    )
+    return upload_store.put_bytes(buf.getvalue(), "bom.xlsx")
+
+
+def _wait(upload_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = prefetcher.status(upload_id)
+        if status["state"] in ("done", "cancelled", "failed"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"prefetch still {status['state']}")
+
+
+@pytest.fixture
+def vendor(monkeypatch):
+    fake = _FakeVendor()
+    monkeypatch.setattr(settings, "PREFETCH_ENABLED", True)
+    monkeypatch.setattr(settings, "ENABLED_VENDORS", ["DigiKey"])
+    monkeypatch.setitem(multi_vendor.VENDORS, "DigiKey", fake)
+    monkeypatch.setitem(rate_limiter._buckets, "DigiKey", TokenBucket(0, 1))
+    return fake
+
+
+def test_only_confident_predictions_start_a_warmup():
+    assert prefetcher.pick_columns(_columns()) == ("MPN", "Maker")
+    assert prefetcher.pick_columns(_columns(manu_conf=0.3)) == ("MPN", None)
+    assert prefetcher.pick_columns(_columns(mpn_conf=0.5)) is None
+
+
+def test_warms_distinct_mpns_within_budget(vendor, monkeypatch):
+    monkeypatch.setattr(settings, "PREFETCH_BUDGET", 2)
+    part_cache.put("DigiKey", "B2", "Acme", {"mpn": "B2"})
+    upload = _upload(["A1", "A1", "B2", "C3, C4", "D5"])
+
+    assert prefetcher.start(upload, _columns())["column"] == "MPN"
+    status = _wait(upload.upload_id)
+
+    assert status["state"] == "done"
+    assert vendor.calls == [("A1", "Acme"), ("C3", "Acme")]  # first MPN per row, B2 was fresh
+    assert (status["keys"], status["cached"], status["looked_up"]) == (4, 1, 2)
+    assert part_cache.is_fresh("DigiKey", "C3", "Acme")
+
+
+def test_waits_for_quota_headroom_and_cancels_on_other_mapping(vendor, monkeypatch):
+    busy = TokenBucket(0.001, 4)
+    busy.try_acquire(4)  # live traffic has drained the bucket
+    monkeypatch.setitem(rate_limiter._buckets, "DigiKey", busy)
+    upload = _upload(["A1", "B2"])
+
+    prefetcher.start(upload, _columns())
+    time.sleep(0.2)
+    assert prefetcher.status(upload.upload_id)["state"] == "running"
+    assert vendor.calls == []
+
+    prefetcher.settle(upload.upload_id, {"ManufacturerPN": "MPN", "Manufacturer": "Maker"})
+    assert prefetcher.status(upload.upload_id)["state"] == "running"  # mapping as predicted
+    prefetcher.settle(upload.upload_id, {"ManufacturerPN": "Qty"})
+    assert _wait(upload.upload_id)["state"] == "cancelled"
+    assert vendor.calls == []
+
+
+def test_upload_endpoint_reports_the_warmup(test_client, vendor, monkeypatch):
+    predictions = {c["name"]: c["prediction"] for c in _columns()}
+    monkeypatch.setattr(
+        prediction_service,
+        "get_predictions",
+        lambda samples: [predictions.get(s.split(":")[0].strip(), {}) for s in samples],
+    )
+    buf = io.BytesIO()
+    pd.DataFrame({"MPN": ["A1", "B2"], "Maker": ["Acme", "Acme"]}).to_excel(
+        buf, engine="openpyxl", index=False
+    )
+    buf.seek(0)
+    r = test_client.post("/api/upload", data={"file": (buf, "bom.xlsx")}, content_type="multipart/form-data")
+    assert r.status_code == 200
+    assert r.json["prefetch"]["column"] == "MPN"
+    assert _wait(r.json["upload_id"])["looked_up"] == 2
@@ -0,0 +1,122 @@
+import io
+import threading
+
+import pandas as pd
+import pytest
+
+from services.digikey_service import digikey_service  # the instance main.py uses
+from services.prediction_service import prediction_service
+from services.excel_service import build_stream_rows, clean_excel_file, iter_stream_rows
+from services.row_pipeline import RowPipeline
+from tests.conftest import found_handler, ndjson_lines
+
+
+def _workbook(n):
+    buf = io.BytesIO()
+    pd.DataFrame(
+        {
+            "MPN": [f"P{i}, Q{i}" if i % 7 == 0 else f"P{i}" for i in range(n)],
+            "Maker": ["Acme"] * n,
+            "Qty": [i % 5 for i in range(n)],
+        }
+    ).to_excel(buf, engine="openpyxl", index=False)
+    return buf.getvalue()
+
+
+def test_lazy_rows_match_the_eager_builder():
+    raw = _workbook(300)
+    eager = build_stream_rows(clean_excel_file(raw), "MPN", manu_col="Maker", qty_col="Qty")
+    lazy = list(iter_stream_rows(raw, "MPN", manu_col="Maker", qty_col="Qty", max_chunk=16))
+    assert lazy == eager
+
+
+def test_reader_is_bounded_and_stops_with_the_consumer():
+    produced = []
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(1000):
+                produced.append(i)
+                yield {"row_index": i}
+        finally:
+            closed.set()
+
+    pipeline = RowPipeline(source(), maxsize=4)
+    rows = iter(pipeline)
+    assert next(rows) == {"row_index": 0}
+    assert not closed.wait(0.2)
+    assert len(produced) <= 6  # queue + the row in hand, not the whole source
+    rows.close()
+    assert closed.wait(2)
+    assert len(pipeline) < 1000
+
+
+def test_rows_never_queued_are_not_counted():
+    closed, holding_last = threading.Event(), threading.Event()
+
+    def source():
+        try:
+            yield {"row_index": 0}
+            yield {"row_index": 1}
+            holding_last.set()
+            yield {"row_index": 2}
+        finally:
+            closed.set()
+
+    pipeline = RowPipeline(source(), maxsize=1)
+    rows = iter(pipeline)
+    next(rows)  # row 0 taken, row 1 queued, the reader holds row 2
+    assert holding_last.wait(2)
+    rows.close()
+    assert closed.wait(2)
+    assert len(pipeline) == 2
+
+
+def test_reader_errors_reach_the_consumer():
+    def source():
+        yield {"row_index": 1}
+        raise ValueError("bad sheet")
+
+    pipeline = RowPipeline(source())
+    with pytest.raises(ValueError, match="bad sheet"):
+        list(pipeline)
+    assert pipeline.done and len(pipeline) == 1
+
+
+def test_stream_straight_from_the_upload(test_client, monkeypatch):
+    monkeypatch.setattr(digikey_service, "row_handler", found_handler)
+    buf = io.BytesIO(_workbook(40))
+    upload_id = test_client.post(
+        "/api/upload", data={"file": (buf, "bom.xlsx")}, content_type="multipart/form-data"
+    ).json["upload_id"]
+    cols = [{"name": "MPN", "mapping": "ManufacturerPN"}, {"name": "Maker", "mapping": "Manufacturer"}]
+
+    events = ndjson_lines(
+        test_client.post("/api/stream-digikey-results", json={"upload_id": upload_id, "columns": cols})
+    )
+    assert [e["data"]["mpn"] for e in events if e["event"] == "found"] == [f"P{i}" for i in range(40)]
+    assert events[-1]["event"] == "complete" and events[-1]["data"]["total"] == 40
+
+    r = test_client.post("/api/stream-digikey-results", json={"upload_id": "nope", "columns": cols})
+    assert r.status_code == 404
+    r = test_client.post(
+        "/api/stream-digikey-results",
+        json={"upload_id": upload_id, "columns": [{"name": "Maker", "mapping": "Manufacturer"}]},
+    )
+    assert r.status_code == 400
+    r = test_client.post(
+        "/api/stream-digikey-results",
+        json={"upload_id": upload_id, "columns": [{"name": "Part No", "mapping": "ManufacturerPN"}]},
+    )
+    assert r.status_code == 400 and "Part No" in r.json["error"]  # not in the sheet header
+
+
+def test_bad_source_is_rejected_before_the_sheet_is_opened(test_client, monkeypatch):
+    opened = []
+    monkeypatch.setattr(prediction_service, "iter_rows_for_stream", lambda *a, **kw: opened.append(a))
+    body = {"upload_id": "u1", "columns": [{"name": "MPN", "mapping": "ManufacturerPN"}]}
+
+    assert test_client.post("/api/jobs", json={**body, "source": "Farnell"}).status_code == 400
+    assert test_client.post("/api/stream-results", json={**body, "vendors": ["Farnell"]}).status_code == 400
+    assert opened == []
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from backend.app.services.lookup_scheduler import _LookupScheduler
+from backend.app.services.rate_limit import TokenBucket
+from core.config import settings  # the instance the services read
+from services.cancellation import CancelToken, LookupCancelled, bind  # the module the scheduler reads
+from tests.conftest import make_rows
+
+
+def test_scheduler_runs_rows_concurrently(monkeypatch):
+    monkeypatch.setattr(settings, "TESTVENDOR_MAX_CONCURRENCY", 8, raising=False)
+
+    def handler(row):
+        time.sleep(0.2)
+        yield "found", {"mpn": row["mpns"][0]}
+
+    start = time.monotonic()
+    events = list(_LookupScheduler().run(make_rows(8), handler, "TestVendor"))
+    elapsed = time.monotonic() - start
+
+    assert sorted(p["mpn"] for _, p in events) == [f"P{i}" for i in range(8)]
+    assert elapsed < 0.8  # serial execution would take 1.6 s
+
+
+def test_scheduler_turns_handler_crash_into_error_event():
+    def handler(row):
+        if row["row_index"] == 1:
+            raise RuntimeError("boom")
+        yield "found", {"mpn": row["mpns"][0]}
+
+    events = list(_LookupScheduler().run(make_rows(3), handler, "TestVendor"))
+    assert [e for e, _ in events].count("found") == 2
+    assert ("error", {"mpn": "P1", "error": "boom", "source": "TestVendor"}) in events
+
+
+def test_token_bucket_throttles_after_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    start = time.monotonic()
+    assert bucket.acquire()
+    assert time.monotonic() - start >= 0.03
+    assert TokenBucket(rate=0, burst=1).try_acquire()
+
+
+def test_run_batched_groups_rows(monkeypatch):
+    monkeypatch.setattr(settings, "TESTVENDOR_BATCH_SIZE", 4, raising=False)
+    batches = []
+
+    def handler(batch):
+        batches.append([row["row_index"] for row in batch])
+        if batch[0]["row_index"] == 8:
+            raise RuntimeError("boom")
+        for row in batch:
+            yield "found", {"mpn": row["mpns"][0]}
+
+    events = list(_LookupScheduler().run_batched(iter(make_rows(10)), handler, "TestVendor"))
+
+    assert sorted(batches) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert sorted(e for e, _ in events) == ["error"] * 2 + ["found"] * 8
+
+
+def test_parallel_alternates_keep_bom_order(monkeypatch):
+    monkeypatch.setattr(settings, "TESTVENDOR_ALTERNATES", "parallel", raising=False)
+    stock = {"A": False, "B": False, "C": True, "D": True}
+
+    def lookup(mpn):
+        time.sleep(0.2)
+        return {"mpn": mpn, "in_stock": stock[mpn]}
+
+    start = time.monotonic()
+    for mpn, answer in _LookupScheduler().alternates("TestVendor", lookup, list(stock)):
+        if answer()["in_stock"]:
+            winner = mpn
+            break
+    assert winner == "C"  # first in stock in BOM order, not first to answer
+    assert time.monotonic() - start < 0.6  # sequential would take 0.6 s to reach C
+
+
+def test_deferred_events_do_not_hold_a_row_worker(monkeypatch):
+    monkeypatch.setattr(settings, "TESTVENDOR_MAX_CONCURRENCY", 1, raising=False)
+    scheduler = _LookupScheduler()
+
+    def slow_extra(row):
+        time.sleep(0.3)
+        return {"row_index": row["row_index"]}
+
+    def handler(row):
+        yield "not_found", {"mpn": row["mpns"][0]}
+        yield "substitutes", scheduler.defer("TestVendor", slow_extra, row)
+
+    start = time.monotonic()
+    seen = [(e, time.monotonic() - start) for e, _ in scheduler.run(make_rows(3), handler, "TestVendor")]
+    assert [e for e, _ in seen] == ["not_found"] * 3 + ["substitutes"] * 3
+    assert seen[2][1] < 0.2  # every row answered before the first extra resolved
+
+
+def test_slow_row_source_does_not_hold_back_events_or_cancel():
+    release, closed = threading.Event(), threading.Event()
+
+    def rows():  # like a RowPipeline still reading the sheet
+        try:
+            yield {"row_index": 0, "mpns": ["P0"]}
+            release.wait(5)
+            yield {"row_index": 1, "mpns": ["P1"]}
+        finally:
+            closed.set()
+
+    def handler(row):
+        yield "found", {"mpn": row["mpns"][0]}
+
+    token = CancelToken()
+    with bind(token):
+        events = _LookupScheduler().run(rows(), handler, "TestVendor")
+        assert next(events) == ("found", {"mpn": "P0"})  # while the source is blocked
+        threading.Timer(0.1, token.cancel, args=("stop",)).start()
+        start = time.monotonic()
+        with pytest.raises(LookupCancelled):
+            next(events)
+        assert time.monotonic() - start < 1
+    release.set()
+    assert closed.wait(2)
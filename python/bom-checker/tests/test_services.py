@@ -4,6 +4,8 @@
 # ---------------------------------------------------------------------------
 from __future__ import annotations
 
+import json
+
 import pytest
 import requests
 from unittest.mock import patch
@@ -62,7 +64,7 @@ def test_digikey_process_product(dk_ok_response):
     assert out["product_status"] == "Active" 
 
 
-@patch.object(requests, "post")
+@patch.object(requests.Session, "request")
 def test_digikey_search(mon_post, dk_ok_response):
     mon_post.return_value.status_code = 200
     mon_post.return_value.json.return_value = dk_ok_response
@@ -98,7 +100,7 @@ def test_process_product_includes_new_fields(monkeypatch, dk_ok_response):
 # ---------------------------------------------------------------------------
 # Mouser (unchanged)
 # ---------------------------------------------------------------------------
-@patch.object(requests, "post")
+@patch.object(requests.Session, "request")
 def test_mouser_keyword(mon_post):
     fake_api = {
     "SearchResults": {
@@ -128,3 +130,135 @@ def test_mouser_keyword(mon_post):
     assert mouser_service.process_product(part)["minimum_order_quantity"] == 5
     assert mouser_service.process_product(part)["lead_time_weeks"] == 8
     assert mouser_service.process_product(part)["product_status"] == "Active"
+
+
+def _mouser_part(mpn, qty):
+    return {
+        "ManufacturerPartNumber": mpn,
+        "MouserPartNumber": f"595-{mpn}",
+        "Manufacturer": "Foo",
+        "Availability": f"{qty} In Stock",
+        "PriceBreaks": [{"Quantity": 1, "Price": "$0.50"}],
+    }
+
+
+@patch.object(requests.Session, "request")
+def test_mouser_batch_rows_share_part_number_requests(mon_post, monkeypatch):
+    monkeypatch.setattr(mouser_service, "api_key", "dummy-key")
+
+    def reply(method, url, **kwargs):
+        requested = kwargs["json"]["SearchByPartRequest"]["mouserPartNumber"].split("|")
+        stock = {"A1": 0, "A2": 40, "B1": 7}
+        r = requests.Response()
+        r.status_code = 200
+        r._content = json.dumps(
+            {"SearchResults": {"Parts": [_mouser_part(m, stock[m]) for m in requested if m in stock]}}
+        ).encode()
+        return r
+
+    mon_post.side_effect = reply
+    rows = [
+        {"row_index": 0, "mpns": ["A1", "A2"], "manufacturer": None},
+        {"row_index": 1, "mpns": ["B1"], "manufacturer": None},
+        {"row_index": 2, "mpns": ["C1"], "manufacturer": None},
+        {"row_index": 3, "mpns": [], "manufacturer": None},
+    ]
+    events = list(mouser_service.batch_row_handler(rows))
+
+    sent = [c.kwargs["json"]["SearchByPartRequest"]["mouserPartNumber"] for c in mon_post.call_args_list]
+    assert sent == ["A1|B1|C1", "A2"]  # one request per round, not one per MPN
+    by_mpn = {p["mpn"]: e for e, p in events}
+    assert by_mpn == {"Unknown": "not_found", "B1": "found", "C1": "not_found", "A2": "found"}
+
+    # second pass is served from the part cache
+    list(mouser_service.batch_row_handler(rows))
+    assert mon_post.call_count == 2
+
+
+@patch.object(requests.Session, "request")
+def test_mouser_parallel_alternates_use_one_request(mon_post, monkeypatch):
+    from core.config import settings
+
+    monkeypatch.setattr(mouser_service, "api_key", "dummy-key")
+    monkeypatch.setattr(settings, "MOUSER_ALTERNATES", "parallel")
+    r = requests.Response()
+    r.status_code = 200
+    r._content = json.dumps(
+        {"SearchResults": {"Parts": [_mouser_part("X1", 0), _mouser_part("X3", 9)]}}
+    ).encode()
+    mon_post.return_value = r
+
+    row = {"row_index": 0, "mpns": ["X1", "X2", "X3"], "manufacturer": None}
+    events = list(mouser_service.row_handler(row))
+
+    assert mon_post.call_count == 1
+    assert mon_post.call_args.kwargs["json"]["SearchByPartRequest"]["mouserPartNumber"] == "X1|X2|X3"
+    assert events == [("found", events[0][1])] and events[0][1]["mpn"] == "X3"
+
+
+def test_digikey_not_found_carries_row_index(monkeypatch):
+    oos = {"mpn": "ABC123", "digikey_pn": "296-1-ND", "status": "Out of Stock"}
+    monkeypatch.setattr(digikey_service, "lookup_part", lambda *_a, **_k: oos)
+
+    payloads = []
+    for i in (4, 9):  # the same out-of-stock part on two BOM rows
+        events = digikey_service.row_handler({"row_index": i, "mpns": ["ABC123"], "manufacturer": None})
+        event, payload = next(events)
+        events.close()
+        assert event == "not_found"
+        payloads.append(payload)
+
+    assert [p["row_index"] for p in payloads] == [4, 9]
+    assert "row_index" not in oos  # the shared record is not modified
+
+
+@patch.object(requests.Session, "request")
+def test_mouser_lookups_use_the_exact_part_number_search(mon_post, monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(mouser_service, "api_key", "dummy-key")
+    r = requests.Response()
+    r.status_code = 200
+    # a fuzzy keyword search would put the similar part first
+    r._content = json.dumps(
+        {"SearchResults": {"Parts": [_mouser_part("X10", 5), _mouser_part("X1", 3)]}}
+    ).encode()
+    mon_post.return_value = r
+
+    record = mouser_service.lookup_part("x1", refresh=True)
+    assert mon_post.call_args.args[1].startswith(mouser_service.PART_SEARCH_URL)
+    assert record["mouser_pn"] == "595-X1" and record["mpn"] == "x1"
+
+    async def from_loop(payload):
+        return payload
+
+    monkeypatch.setattr(
+        mouser_service, "search_by_part_numbers_async", lambda mpns: from_loop(r.json())
+    )
+    assert asyncio.run(mouser_service.lookup_part_async("x1", refresh=True)) == record
+
+
+@patch.object(requests.Session, "request")
+def test_mouser_parallel_and_sequential_pick_the_same_part(mon_post, monkeypatch):
+    from core.config import settings
+
+    stock = {"X1": 0, "X2": 4, "X3": 9}
+
+    def reply(method, url, **kwargs):
+        requested = kwargs["json"]["SearchByPartRequest"]["mouserPartNumber"].split("|")
+        r = requests.Response()
+        r.status_code = 200
+        r._content = json.dumps(
+            {"SearchResults": {"Parts": [_mouser_part(m, stock[m]) for m in requested if m in stock]}}
+        ).encode()
+        return r
+
+    monkeypatch.setattr(mouser_service, "api_key", "dummy-key")
+    mon_post.side_effect = reply
+    row = {"row_index": 0, "mpns": ["X0", "X1", "X3", "X2"], "manufacturer": None, "refresh": True}
+    picks = {}
+    for mode in ("sequential", "parallel"):
+        monkeypatch.setattr(settings, "MOUSER_ALTERNATES", mode)
+        picks[mode] = list(mouser_service.row_handler(row))
+    assert picks["parallel"] == picks["sequential"]
+    assert picks["parallel"][0][1]["mpn"] == "X3"
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from services.cancellation import CancelToken, LookupCancelled, bind
+from services.digikey_service import digikey_service  # the instance main.py uses
+from services.mouser_service import mouser_service
+from services.singleflight import _SingleFlight, singleflight
+from tests.conftest import ndjson_lines
+
+
+def test_concurrent_callers_share_one_call():
+    sf = _SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"mpn": "A"}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(sf.do(("DigiKey", "A", ""), fetch)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"mpn": "A"}] * 5
+    assert sf.stats()["shared_in_flight"] == 4
+
+
+def test_cancelled_leader_hands_the_key_to_a_waiter():
+    sf = _SingleFlight()
+    token = CancelToken()
+    started = threading.Event()
+
+    def cancelled_fetch():
+        started.set()
+        time.sleep(0.1)
+        raise LookupCancelled("client disconnected")
+
+    def leader():
+        with bind(token):
+            try:
+                sf.do("k", cancelled_fetch)
+            except LookupCancelled:
+                pass
+
+    t = threading.Thread(target=leader)
+    t.start()
+    started.wait(1)
+    assert sf.do("k", lambda: "fresh") == "fresh"  # retried rather than failed
+    t.join()
+
+
+def test_job_collapses_repeated_mpns(test_client, monkeypatch):
+    calls = []
+
+    def fake_search(mpn, manufacturer=None):
+        calls.append(mpn)
+        return {"Products": [{"ManufacturerProductNumber": mpn, "QuantityAvailable": 5}]}
+
+    monkeypatch.setattr(digikey_service, "get_token", lambda: "real_token")
+    monkeypatch.setattr(digikey_service, "search_by_part_number", fake_search)
+    rows = [
+        {"row_index": i, "mpns": [mpn], "manufacturer": "Acme"}
+        for i, mpn in enumerate(["R1", "r1", "C7", "R1", "C7", "R1"])
+    ]
+    # refresh bypasses the part cache, so only the job memo / in-flight sharing can help
+    r = test_client.post("/api/stream-digikey-results", json={"rows": rows, "refresh": True})
+    events = ndjson_lines(r)
+
+    assert events[-1]["event"] == "complete" and events[-1]["data"]["found"] == 6
+    assert sorted(c.upper() for c in calls) == ["C7", "R1"]  # "r1" may be the one that goes out
+    assert test_client.get("/api/metrics").json["singleflight"]["calls"] >= 2
+
+
+def test_mouser_batches_share_in_flight_keys_across_jobs(monkeypatch):
+    sent, gate = [], threading.Event()
+
+    def search(chunk):
+        sent.append(list(chunk))
+        if "A1" in chunk:
+            gate.wait(5)  # hold the first job's request in flight
+        parts = [{"ManufacturerPartNumber": m, "Availability": "5 In Stock"} for m in chunk]
+        return {"SearchResults": {"Parts": parts}}
+
+    monkeypatch.setattr(mouser_service, "api_key", "dummy-key")
+    monkeypatch.setattr(mouser_service, "search_by_part_numbers", search)
+    answers = {}
+
+    def job(name, mpns):
+        with singleflight.scope():
+            answers[name] = mouser_service.lookup_parts([(m, None, True) for m in mpns])
+
+    first = threading.Thread(target=job, args=("first", ["A1", "B2"]))
+    first.start()
+    while not sent:
+        time.sleep(0.01)
+    second = threading.Thread(target=job, args=("second", ["A1", "C3"]))
+    second.start()
+    time.sleep(0.2)
+    gate.set()
+    first.join(5)
+    second.join(5)
+
+    assert sent == [["A1", "B2"], ["C3"]]  # A1 went out once
+    assert answers["second"][("A1", None)]["quantity_available"] == 5
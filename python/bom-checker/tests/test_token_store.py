@@ -0,0 +1,103 @@
+import json
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from services.token_store import TokenStore
+
+
+def _fetcher(calls, token="fresh", expires_in=3600, delay=0.0):
+    def fetch():
+        calls.append(1)
+        time.sleep(delay)
+        return {"access_token": f"{token}{len(calls)}", "expires_in": expires_in}
+
+    return fetch
+
+
+def _write(path, token, expires_in=3600, created_at=None):
+    path.write_text(json.dumps({
+        "access_token": token, "expires_in": expires_in, "created_at": created_at or time.time(),
+    }))
+
+
+def test_adopts_token_from_file_without_fetching(tmp_path):
+    calls = []
+    path = tmp_path / "token.json"
+    _write(path, "shared")
+    store = TokenStore(path, _fetcher(calls), refresh_ahead=0)
+    assert store.get() == "shared"
+    assert calls == []
+    assert store.stats()["adopted"] == 1
+
+
+def test_concurrent_callers_fetch_once_and_write_atomically(tmp_path):
+    calls = []
+    store = TokenStore(tmp_path / "token.json", _fetcher(calls, delay=0.1), refresh_ahead=0)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(store.get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert set(got) == {"fresh1"}
+    assert json.loads((tmp_path / "token.json").read_text())["access_token"] == "fresh1"
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []  # no temp left over
+
+
+def test_rejected_token_is_replaced_once(tmp_path):
+    calls = []
+    path = tmp_path / "token.json"
+    _write(path, "old")
+    store = TokenStore(path, _fetcher(calls), refresh_ahead=0)
+    assert store.get() == "old"
+    store.invalidate("old")
+    assert store.get() == "fresh1"
+    store.invalidate("old")  # a late 401 for the previous token
+    assert store.get() == "fresh1"
+    assert len(calls) == 1
+
+
+def test_background_refresh_runs_before_expiry(tmp_path):
+    calls = []
+    path = tmp_path / "token.json"
+    _write(path, "old", created_at=time.time() - 3400)  # 200 s left, inside refresh_ahead
+    store = TokenStore(path, _fetcher(calls), refresh_ahead=300)
+    try:
+        assert store.get() == "old"
+        deadline = time.time() + 3
+        while not calls and time.time() < deadline:
+            time.sleep(0.02)
+        assert calls and store.peek() == "fresh1"
+        assert store.stats()["background_refreshes"] >= 1
+    finally:
+        store.close()
+
+
+def _worker(path, counter, barrier, out):
+    def fetch():
+        with open(counter, "a") as fh:
+            fh.write("x")
+        time.sleep(0.2)
+        return {"access_token": "from-worker", "expires_in": 3600}
+
+    barrier.wait()
+    out.put(TokenStore(path, fetch, refresh_ahead=0).get())
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_worker_processes_share_one_fetch(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    path, counter = tmp_path / "token.json", tmp_path / "fetches"
+    barrier, out = ctx.Barrier(4), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, counter, barrier, out)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    tokens = [out.get(timeout=10) for _ in procs]
+    for p in procs:
+        p.join(timeout=10)
+    assert tokens == ["from-worker"] * 4
+    assert counter.read_text() == "x"
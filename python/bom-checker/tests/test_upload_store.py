@@ -0,0 +1,125 @@
+import io
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from services.prediction_service import prediction_service  # the instance main.py uses
+from services.upload_store import UploadTooLarge, _UploadStore, upload_store
+
+
+def _xlsx():
+    buf = io.BytesIO()
+    pd.DataFrame({"MPN": ["A1", "B2"], "Qty": [1, 2]}).to_excel(buf, engine="openpyxl", index=False)
+    return buf.getvalue()
+
+
+def _upload(client, raw, name):
+    return client.post(
+        "/api/upload", data={"file": (io.BytesIO(raw), name)}, content_type="multipart/form-data"
+    )
+
+
+def test_identical_upload_reuses_blob_and_predictions(test_client, monkeypatch):
+    raw = _xlsx()
+    first = _upload(test_client, raw, "BOM.xlsx").json
+
+    def boom(*_a, **_kw):
+        raise AssertionError("predicted again")
+
+    monkeypatch.setattr(prediction_service, "get_predictions", boom)
+    second = _upload(test_client, raw, "other-name.xlsx").json
+
+    assert second["upload_id"] != first["upload_id"]
+    assert second["file_hash"] == first["file_hash"]
+    assert second["file_name"] == "other-name.xlsx"
+    assert second["columns"] == first["columns"]
+    assert upload_store.stats() == {"blobs": 1, "bytes": len(raw), "uploads": 2}
+
+
+def test_same_name_uploads_do_not_overwrite(tmp_path):
+    store = _UploadStore(root=tmp_path, max_bytes=10 ** 6, max_age=0)
+    a = store.put_bytes(b"first", "BOM.xlsx")
+    b = store.put_bytes(b"second", "BOM.xlsx")
+
+    assert store.get(a.upload_id).path.read_bytes() == b"first"
+    assert store.get(b.upload_id).path.read_bytes() == b"second"
+    assert store.latest("BOM.xlsx").upload_id == b.upload_id
+
+
+def test_gc_by_size_and_age(tmp_path):
+    store = _UploadStore(root=tmp_path, max_bytes=10, max_age=0)
+    old = store.put_bytes(b"123456", "a.xlsx")
+    new = store.put_bytes(b"abcdef", "b.xlsx")  # 12 bytes > 10 → LRU "a" goes
+
+    assert store.get(old.upload_id) is None and not old.path.exists()
+    assert store.get(new.upload_id) is not None
+
+    store.max_bytes, store.max_age = 10 ** 6, 60
+    store._conn().execute("UPDATE blobs SET last_access=?", (time.time() - 120,))
+    assert store.gc() == 1
+    assert store.stats()["blobs"] == 0 and not new.path.exists()
+
+
+def test_chunked_resumable_upload(test_client):
+    raw = _xlsx()
+    r = test_client.post("/api/uploads", json={"file_name": "big.xlsx", "size": len(raw)})
+    assert r.status_code == 201
+    sid = r.json["session_id"]
+
+    half = len(raw) // 2
+    r = test_client.patch(f"/api/uploads/{sid}", data=raw[:half], headers={"Upload-Offset": "0"})
+    assert r.json["offset"] == half
+
+    # a retried / out-of-order chunk is rejected with the resume point
+    r = test_client.patch(f"/api/uploads/{sid}", data=raw[:half], headers={"Upload-Offset": "0"})
+    assert r.status_code == 409 and r.json["offset"] == half
+    assert test_client.post(f"/api/uploads/{sid}/complete").status_code == 409
+
+    assert test_client.get(f"/api/uploads/{sid}").json["offset"] == half
+    r = test_client.patch(f"/api/uploads/{sid}", data=raw[half:], headers={"Upload-Offset": str(half)})
+    assert r.json["offset"] == len(raw)
+
+    r = test_client.post(f"/api/uploads/{sid}/complete")
+    assert r.status_code == 200
+    assert r.json["file_name"] == "big.xlsx"
+    assert [c["name"] for c in r.json["columns"]] == ["MPN", "Qty"]
+    assert test_client.get(f"/api/uploads/{sid}").status_code == 404
+
+
+def test_gc_keeps_sessions_still_receiving_chunks(tmp_path):
+    store = _UploadStore(root=tmp_path)
+    store.session_ttl = 60
+    active, idle = store.begin("a.xlsx")["session_id"], store.begin("b.xlsx")["session_id"]
+    long_ago = time.time() - 120
+    for p in (tmp_path / "incoming").iterdir():
+        os.utime(p, (long_ago, long_ago))
+    store.append(active, 0, io.BytesIO(b"1234"))  # meta untouched since begin
+
+    store.gc()
+    assert store.session(active)["offset"] == 4
+    with pytest.raises(FileNotFoundError):
+        store.session(idle)
+
+
+def test_finish_waits_for_a_chunk_being_appended(tmp_path):
+    store = _UploadStore(root=tmp_path)
+    sid = store.begin("a.xlsx")["session_id"]
+    finished = []
+    with store._session_lock(sid):  # as append holds it while writing
+        worker = threading.Thread(target=lambda: finished.append(store.finish(sid)))
+        worker.start()
+        worker.join(0.2)
+        assert not finished
+    worker.join(2)
+    assert finished and finished[0].file_name == "a.xlsx"
+
+
+def test_streamed_upload_enforces_file_limit(tmp_path):
+    store = _UploadStore(root=tmp_path)
+    store.max_file_bytes = 4
+    with pytest.raises(UploadTooLarge):
+        store.put_stream(io.BytesIO(b"12345"), "x.xlsx")
+    assert list((tmp_path / "incoming").iterdir()) == []